@@ -0,0 +1,206 @@
+import errno
+import json
+import logging
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from manifest import hash_file
+from output import OutputFile
+
+logger = logging.getLogger(__name__)
+
+LINK_MODES = ("copy", "hardlink", "reflink", "auto")
+FICLONE = 0x40049409  # Linux ioctl to share extents between files (btrfs, XFS)
+COPY_CHUNK = 1 << 30
+FINGERPRINT_LENGTH = 8
+ASSET_MANIFEST = "asset-manifest.json"
+
+try:
+  import fcntl
+except ImportError:
+  fcntl = None
+
+
+def reflink_file(src_path, dest_path):
+  """Clone src_path to dest_path, sharing extents where the filesystem can.
+
+  Tries a FICLONE reflink, then an in-kernel os.copy_file_range, then a
+  plain byte copy, and finally copies the source's mtime and permissions.
+  """
+  with open(src_path, "rb") as src, open(dest_path, "wb") as dest:
+    cloned = False
+    if fcntl is not None:
+      try:
+        fcntl.ioctl(dest.fileno(), FICLONE, src.fileno())
+        cloned = True
+      except OSError:
+        pass
+    if not cloned and hasattr(os, "copy_file_range"):
+      try:
+        while os.copy_file_range(src.fileno(), dest.fileno(), COPY_CHUNK):
+          pass
+        cloned = True
+      except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+          raise
+        dest.seek(0)
+        dest.truncate()
+    if not cloned:
+      shutil.copyfileobj(src, dest)
+  shutil.copystat(src_path, dest_path)
+
+
+def place_file(src_path, dest_path, link_mode="copy"):
+  """Put a copy of src_path at dest_path using the given link mode.
+
+  'hardlink' shares the inode with the source, falling back to a reflink
+  copy across filesystems. 'reflink' and 'auto' clone where possible.
+  'copy' always makes an independent copy. The file is placed under a
+  temporary name and renamed over dest_path, so it is never seen half
+  copied.
+  """
+  tmp_path = f"{dest_path}.{os.getpid()}.tmp"
+  if os.path.lexists(tmp_path):
+    os.remove(tmp_path)
+  try:
+    if link_mode == "hardlink":
+      try:
+        os.link(src_path, tmp_path)
+        os.replace(tmp_path, dest_path)
+        return
+      except OSError:
+        pass
+    if link_mode == "copy":
+      shutil.copy2(src_path, tmp_path)
+    else:
+      reflink_file(src_path, tmp_path)
+    os.replace(tmp_path, dest_path)
+  finally:
+    if os.path.lexists(tmp_path):
+      os.remove(tmp_path)
+
+
+def fingerprint_name(relpath, digest):
+  """Insert a content digest before a file's extension: index.css -> index.3f9a1c0b.css."""
+  root, ext = os.path.splitext(relpath)
+  return f"{root}.{digest[:FINGERPRINT_LENGTH]}{ext}"
+
+
+def load_asset_manifest(path):
+  """Read an asset manifest (static path -> fingerprinted path), or return {}."""
+  try:
+    with open(path, "r") as f:
+      return json.load(f)
+  except (FileNotFoundError, json.JSONDecodeError):
+    return {}
+
+
+def write_asset_manifest(path, assets):
+  """Write the asset manifest for other tools, leaving it alone if unchanged."""
+  with OutputFile(path) as f:
+    f.write(json.dumps(assets, indent=2, sort_keys=True) + "\n")
+  return f.changed
+
+
+def is_in_sync(src_path, dest_path, verify_hash=False):
+  """Compare a source and its copy by size and mtime, and optionally by hash."""
+  try:
+    src_stat = os.stat(src_path)
+    dest_stat = os.stat(dest_path)
+  except FileNotFoundError:
+    return False
+  if src_stat.st_size != dest_stat.st_size:
+    return False
+  if verify_hash:
+    return hash_file(src_path) == hash_file(dest_path)
+  return src_stat.st_mtime_ns == dest_stat.st_mtime_ns
+
+
+def sync_directory(src_dir, dest_dir, manifest=None, link_mode="copy", verify_hash=False, workers=8, assets=None, index=None):
+  """Mirror src_dir into dest_dir, copying only files that changed.
+
+  With a manifest, freshness is judged against the recorded source stat and
+  hash, and stale outputs are left for Manifest.prune to delete. Without one,
+  files are compared with their existing copies, and destination files with
+  no source are deleted.
+
+  Args:
+      src_dir: Source directory path
+      dest_dir: Destination directory path
+      manifest: Optional Manifest used for incremental copies
+      link_mode: One of LINK_MODES
+      verify_hash: Compare content hashes even when size and mtime match
+      workers: Number of threads copying files
+      assets: Optional dict of static path to fingerprinted path (forward
+          slashes, relative to the directories). If given, every file is
+          also copied under a name carrying its content hash, and the dict
+          is updated in place to describe this build. The original name
+          stays, so references that pages and templates don't rewrite
+          (CSS url(), script fetches) still resolve. With a manifest, files
+          whose source is unchanged keep their name without being hashed.
+      index: Optional DirectoryIndex covering src_dir, used instead of
+          walking and stating the source tree again.
+
+  Returns:
+      Number of files copied.
+  """
+  if link_mode not in LINK_MODES:
+    raise ValueError(f"Unknown link mode: {link_mode}")
+  src_dir = os.path.abspath(src_dir)
+  dest_dir = os.path.abspath(dest_dir)
+
+  stale = []
+  expected = set()
+  previous_assets = dict(assets) if assets is not None else None
+  if assets is not None:
+    assets.clear()
+  walk = index.walk(src_dir) if index is not None else ((dirpath, filenames) for dirpath, _, filenames in os.walk(src_dir))
+  for dirpath, filenames in walk:
+    target_dir = os.path.join(dest_dir, os.path.relpath(dirpath, src_dir))
+    os.makedirs(target_dir, exist_ok=True)
+    for filename in filenames:
+      src_path = os.path.join(dirpath, filename)
+      dest_paths = [os.path.normpath(os.path.join(target_dir, filename))]
+      src_stat = index.stat(src_path) if index is not None else None
+      if assets is not None:
+        relpath = os.path.relpath(src_path, src_dir).replace(os.sep, "/")
+        name = previous_assets.get(relpath)
+        # An unchanged source keeps its name; otherwise hash it for the new one.
+        if manifest is None or name is None or not manifest.is_fresh(
+          src_path, os.path.join(dest_dir, name), verify_hash=verify_hash, mark=False, src_stat=src_stat
+        ):
+          name = fingerprint_name(relpath, hash_file(src_path))
+        assets[relpath] = name
+        dest_paths.append(os.path.normpath(os.path.join(dest_dir, name)))
+      for dest_path in dest_paths:
+        expected.add(dest_path)
+        if manifest is not None:
+          fresh = manifest.is_fresh(src_path, dest_path, verify_hash=verify_hash, src_stat=src_stat)
+        else:
+          fresh = is_in_sync(src_path, dest_path, verify_hash)
+        if not fresh:
+          stale.append((src_path, dest_path))
+
+  def copy(paths):
+    logger.debug("Copying file: %s -> %s", *paths)
+    place_file(*paths, link_mode)
+
+  if workers > 1 and len(stale) > 1:
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+      list(executor.map(copy, stale))
+  else:
+    for paths in stale:
+      copy(paths)
+
+  if manifest is not None:
+    for src_path, dest_path in stale:
+      manifest.record(src_path, dest_path)
+  else:
+    for dirpath, _, filenames in os.walk(dest_dir):
+      for filename in filenames:
+        dest_path = os.path.join(dirpath, filename)
+        if dest_path not in expected:
+          logger.debug("Removing stale file: %s", dest_path)
+          os.remove(dest_path)
+  return len(stale)
@@ -0,0 +1,102 @@
+import hashlib
+import logging
+import marshal
+import os
+import shutil
+import zlib
+from array import array
+
+import util
+from flat import FlatDocument
+from manifest import hash_text
+from store import atomic_write
+
+logger = logging.getLogger(__name__)
+
+ARRAY_FIELDS = ("kinds", "tags", "starts", "ends", "prop_entries", "prop_keys", "prop_starts", "prop_ends")
+
+
+def encode_entry(context, document):
+  """Pack a page's header context and FlatDocument into compressed marshal bytes.
+
+  The columns are stored as raw array bytes; the cheapest zlib level still
+  brings an entry to about half the size of its markdown source.
+  """
+  arrays = tuple((getattr(document, name).typecode, getattr(document, name).tobytes()) for name in ARRAY_FIELDS)
+  return zlib.compress(marshal.dumps((context, arrays, document.text, tuple(document.names))), 1)
+
+
+def decode_entry(data):
+  context, arrays, text, names = marshal.loads(zlib.decompress(data))
+  columns = []
+  for typecode, raw in arrays:
+    column = array(typecode)
+    column.frombytes(raw)
+    columns.append(column)
+  return context, FlatDocument(*columns, text, list(names))
+
+
+class AstCache:
+  """Parsed pages on disk, keyed by the hash of their source and the parser version.
+
+  Each entry holds the page's front matter and title plus its FlatDocument
+  arrays, so a page whose markdown hasn't changed is re-rendered (for a new
+  template or basepath) without parsing it again. Entries are written
+  atomically, so worker processes can share one directory. The key also
+  names the registered block handlers, so registering a custom one never
+  serves pages parsed without it.
+  """
+  def __init__(self, directory):
+    self.directory = directory
+    self.hits = 0
+    self.misses = 0
+
+  def key(self, source):
+    """Return the cache key of a page's raw source bytes."""
+    return self.key_for_hash(hashlib.sha256(source).hexdigest())
+
+  def key_for_hash(self, source_hash):
+    """Return the cache key of a page whose source has this sha256 hex digest, as in the manifest."""
+    return hash_text(f"ssg-ast\0{util.renderer_signature()}\0{source_hash}")
+
+  def path_for(self, key):
+    return os.path.join(self.directory, key[:2], f"{key}.bin")
+
+  def get(self, key):
+    """Return (context, FlatDocument) for key, or None if it isn't cached."""
+    try:
+      with open(self.path_for(key), "rb") as f:
+        entry = decode_entry(f.read())
+    except FileNotFoundError:
+      self.misses += 1
+      return None
+    except (OSError, EOFError, ValueError, TypeError, zlib.error) as e:
+      logger.warning("Ignoring unreadable AST cache entry %s: %s", key, e)
+      self.misses += 1
+      return None
+    self.hits += 1
+    return entry
+
+  def put(self, key, context, document):
+    with atomic_write(self.path_for(key), "wb") as f:
+      f.write(encode_entry(context, document))
+
+  def prune(self, source_hashes):
+    """Delete the entries of every source not in source_hashes, returning how many were removed.
+
+    Run after a build with the source hashes of the manifest's pages, so
+    entries for edited or deleted pages and for older parsers don't pile
+    up. Leftover temporary files from interrupted writes go too.
+    """
+    live = {f"{self.key_for_hash(source_hash)}.bin" for source_hash in source_hashes}
+    removed = 0
+    for dirpath, _, names in os.walk(self.directory):
+      for name in names:
+        if name not in live:
+          os.remove(os.path.join(dirpath, name))
+          removed += 1
+    return removed
+
+  def clear(self):
+    if os.path.exists(self.directory):
+      shutil.rmtree(self.directory)
@@ -0,0 +1,326 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+from util import (
+  copy_files_from_to_directory,
+  generate_pages_recursive,
+  markdown_to_html_batch,
+  markdown_to_html_node,
+  text_to_textnodes,
+  text_to_textnodes_multipass,
+)
+
+HISTORY_PATH = os.path.join(".ssg-cache", "bench-history.jsonl")
+DEFAULT_BLOCK_MIX = "paragraph=6,heading=2,code=1,quote=1,unordered_list=2,ordered_list=1"
+BATCH_ITEMS = 2000
+BATCH_BLOCKS_PER_ITEM = 4
+
+# Minimum throughputs the suite is expected to reach on one core of a
+# typical development machine; run_suite flags any metric that falls short.
+# markdown_to_html_batch must keep up with CMS-style workloads: thousands
+# of short comments (BATCH_BLOCKS_PER_ITEM blocks each) per second.
+THROUGHPUT_TARGETS = {
+  "markdown_batch_items_per_s": 5000.0,
+}
+
+WORDS = (
+  "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+  "incididunt ut labore et dolore magna aliqua ut enim ad minim veniam quis nostrud"
+).split()
+
+INLINE_FRAGMENTS = [
+  "Lorem ipsum dolor sit amet, ", "**consectetur adipiscing** ", "elit, sed do ", "_eiusmod tempor_ ",
+  "incididunt ut `labore` et ", "[dolore](https://example.com/dolore) ", "magna aliqua. ",
+  "![ut enim](/images/enim.png) ", "ad minim veniam. ",
+]
+
+TEMPLATE = """<!doctype html>
+<html>
+  <head>
+    <title>{{ Title }}</title>
+    <link href="/index.css" rel="stylesheet" />
+  </head>
+  <body>
+    <article>{{ Content }}</article>
+  </body>
+</html>
+"""
+
+
+def make_paragraph(lines, seed=0):
+  """Build a paragraph of inline-heavy markdown with the given number of lines."""
+  rng = random.Random(seed)
+  return "\n".join(
+    "".join(rng.choice(INLINE_FRAGMENTS) for _ in range(8)).strip()
+    for _ in range(lines)
+  )
+
+
+def parse_block_mix(spec):
+  """Parse 'paragraph=6,code=1,...' into a dict of block kind to weight."""
+  mix = {}
+  for item in spec.split(","):
+    kind, _, weight = item.partition("=")
+    mix[kind.strip()] = int(weight or 1)
+  return mix
+
+
+class CorpusGenerator:
+  """Generates synthetic markdown documents and content trees.
+
+  Args:
+      block_mix: Dict of block kind to relative weight.
+      blocks_per_page: Number of blocks after the title in each page.
+      inline_density: Probability that a word is wrapped in inline markup.
+      seed: Seed for the random generator, so corpora are reproducible.
+  """
+  def __init__(self, block_mix=None, blocks_per_page=40, inline_density=0.2, seed=0):
+    self.block_mix = block_mix or parse_block_mix(DEFAULT_BLOCK_MIX)
+    self.blocks_per_page = blocks_per_page
+    self.inline_density = inline_density
+    self.rng = random.Random(seed)
+
+  def inline(self, words):
+    parts = []
+    for _ in range(words):
+      word = self.rng.choice(WORDS)
+      if self.rng.random() < self.inline_density:
+        style = self.rng.randrange(6)
+        if style == 0:
+          word = f"**{word}**"
+        elif style == 1:
+          word = f"_{word}_"
+        elif style == 2:
+          word = f"`{word}`"
+        elif style == 3:
+          word = f"[{word}](/pages/{word})"
+        elif style == 4:
+          word = f"![{word}](/images/{word}.png)"
+        else:
+          word = f"[{word}](https://example.com/{word})"
+      parts.append(word)
+    return " ".join(parts)
+
+  def block(self, kind):
+    rng = self.rng
+    if kind == "heading":
+      return f"{'#' * rng.randint(2, 6)} {self.inline(rng.randint(2, 6))}"
+    if kind == "code":
+      lines = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 8))) for _ in range(rng.randint(2, 10))]
+      return "```\n" + "\n".join(lines) + "\n```"
+    if kind == "quote":
+      return "\n".join(f"> {self.inline(rng.randint(5, 15))}" for _ in range(rng.randint(1, 4)))
+    if kind == "unordered_list":
+      return "\n".join(f"- {self.inline(rng.randint(3, 10))}" for _ in range(rng.randint(2, 8)))
+    if kind == "ordered_list":
+      return "\n".join(f"{i}. {self.inline(rng.randint(3, 10))}" for i in range(1, rng.randint(3, 9)))
+    return "\n".join(self.inline(rng.randint(8, 20)) for _ in range(rng.randint(1, 5)))
+
+  def document(self, title="Benchmark page"):
+    kinds = list(self.block_mix)
+    weights = [self.block_mix[kind] for kind in kinds]
+    blocks = [f"# {title}"]
+    blocks.extend(self.block(kind) for kind in self.rng.choices(kinds, weights, k=self.blocks_per_page))
+    return "\n\n".join(blocks) + "\n"
+
+  def write_site(self, root, pages=100, depth=3, fanout=4, assets=20, asset_size=4096):
+    """Write content/, static/ and template.html for a synthetic site under root.
+
+    Pages are spread over a directory tree up to depth levels deep with at
+    most fanout subdirectories per level.
+    """
+    content = os.path.join(root, "content")
+    for i in range(pages):
+      parts = [f"section{self.rng.randrange(fanout)}" for _ in range(self.rng.randint(0, depth))]
+      directory = os.path.join(content, *parts, f"page{i}")
+      os.makedirs(directory, exist_ok=True)
+      with open(os.path.join(directory, "index.md"), "w") as f:
+        f.write(self.document(f"Page {i}"))
+
+    images = os.path.join(root, "static", "images")
+    os.makedirs(images, exist_ok=True)
+    for i in range(assets):
+      with open(os.path.join(images, f"image{i}.png"), "wb") as f:
+        f.write(self.rng.randbytes(asset_size))
+    with open(os.path.join(root, "static", "index.css"), "w") as f:
+      f.write("body { margin: 0 auto; max-width: 40em; }\n")
+    with open(os.path.join(root, "template.html"), "w") as f:
+      f.write(TEMPLATE)
+
+
+def best_time(func, repeat, number):
+  return min(timeit.repeat(func, repeat=repeat, number=number)) / number
+
+
+def bench_inline(lines=2000, repeat=5, number=3):
+  """Time the single-pass tokenizer against the chained split_nodes_* passes."""
+  text = make_paragraph(lines)
+  multipass = best_time(lambda: text_to_textnodes_multipass(text), repeat, number)
+  single_pass = best_time(lambda: text_to_textnodes(text), repeat, number)
+  print(f"inline tokenizer, {lines} lines ({len(text)} chars)")
+  print(f"  multipass:   {multipass * 1000:8.2f} ms")
+  print(f"  single pass: {single_pass * 1000:8.2f} ms")
+  print(f"  speedup:     {multipass / single_pass:8.2f}x")
+
+
+def measure_memory(func):
+  """Return (result, bytes still allocated by func's result, peak bytes) under tracemalloc."""
+  tracemalloc.start()
+  try:
+    result = func()
+    current, peak = tracemalloc.get_traced_memory()
+  finally:
+    tracemalloc.stop()
+  return result, current, peak
+
+
+def bench_memory(blocks=20000):
+  """Compare the memory held by the node tree and the flat document for one large page."""
+  document = CorpusGenerator(blocks_per_page=blocks, seed=1).document()
+  _, tree_bytes, tree_peak = measure_memory(lambda: markdown_to_html_node(document))
+  _, flat_bytes, flat_peak = measure_memory(lambda: markdown_to_html_node(document, flat=True))
+  print(f"document memory, {blocks} blocks ({len(document) / 1e6:.1f} MB of markdown)")
+  print(f"  node tree:     {tree_bytes / 1e6:8.1f} MB held, {tree_peak / 1e6:8.1f} MB peak")
+  print(f"  flat document: {flat_bytes / 1e6:8.1f} MB held, {flat_peak / 1e6:8.1f} MB peak")
+  print(f"  reduction:     {tree_bytes / flat_bytes:8.2f}x")
+
+
+def bench_suite(pages=200, depth=3, blocks_per_page=40, inline_density=0.2, block_mix=DEFAULT_BLOCK_MIX, repeat=3):
+  """Time each build stage on a synthetic site.
+
+  Returns:
+      Dict with the parameters used and a 'metrics' dict of throughputs,
+      where higher is always better.
+  """
+  params = {
+    "pages": pages, "depth": depth, "blocks_per_page": blocks_per_page,
+    "inline_density": inline_density, "block_mix": block_mix,
+  }
+  generator = CorpusGenerator(parse_block_mix(block_mix), blocks_per_page, inline_density)
+  metrics = {}
+
+  with tempfile.TemporaryDirectory() as root:
+    generator.write_site(root, pages=pages, depth=depth)
+    documents = [generator.document(f"Doc {i}") for i in range(20)]
+    total_bytes = sum(len(document) for document in documents)
+
+    seconds = best_time(lambda: [markdown_to_html_node(document) for document in documents], repeat, 1)
+    metrics["markdown_to_html_node_mb_per_s"] = total_bytes / seconds / 1e6
+
+    comments = CorpusGenerator(parse_block_mix(block_mix), BATCH_BLOCKS_PER_ITEM, inline_density, seed=1)
+    items = [comments.document(f"Comment {i}") for i in range(BATCH_ITEMS)]
+    seconds = best_time(lambda: markdown_to_html_batch(items), repeat, 1)
+    metrics["markdown_batch_items_per_s"] = len(items) / seconds
+
+    nodes = [markdown_to_html_node(document) for document in documents]
+    seconds = best_time(lambda: [node.to_html() for node in nodes], repeat, 1)
+    metrics["to_html_mb_per_s"] = total_bytes / seconds / 1e6
+
+    content = os.path.join(root, "content")
+    template = os.path.join(root, "template.html")
+    docs = os.path.join(root, "docs")
+    seconds = best_time(lambda: generate_pages_recursive(content, template, docs, "/site/"), repeat, 1)
+    metrics["generate_pages_per_s"] = pages / seconds
+
+    static = os.path.join(root, "static")
+    seconds = best_time(lambda: copy_files_from_to_directory(static, docs), repeat, 1)
+    metrics["copy_files_per_s"] = sum(len(files) for _, _, files in os.walk(static)) / seconds
+
+  return {"params": params, "metrics": metrics}
+
+
+def git_revision():
+  try:
+    return subprocess.run(
+      ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+    ).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+def load_history(path):
+  if not os.path.exists(path):
+    return []
+  with open(path, "r") as f:
+    return [json.loads(line) for line in f if line.strip()]
+
+
+def append_history(path, result):
+  os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+  with open(path, "a") as f:
+    f.write(json.dumps(result, sort_keys=True) + "\n")
+
+
+def find_regressions(previous, current, threshold=0.1):
+  """Return (metric, previous, current) for metrics that dropped by more than threshold."""
+  regressions = []
+  for metric, value in current["metrics"].items():
+    before = previous["metrics"].get(metric)
+    if before and value < before * (1 - threshold):
+      regressions.append((metric, before, value))
+  return regressions
+
+
+def find_missed_targets(result, targets=THROUGHPUT_TARGETS):
+  """Return (metric, target, value) for metrics below their documented target."""
+  return [
+    (metric, target, result["metrics"][metric])
+    for metric, target in targets.items()
+    if metric in result["metrics"] and result["metrics"][metric] < target
+  ]
+
+
+def run_suite(args):
+  result = bench_suite(args.pages, args.depth, args.blocks or 40, args.inline_density, args.block_mix, args.repeat)
+  result["revision"] = git_revision()
+  result["timestamp"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+
+  previous = [entry for entry in load_history(args.history) if entry["params"] == result["params"]]
+  print(f"benchmark suite at {result['revision']}: {result['params']}")
+  for metric, value in sorted(result["metrics"].items()):
+    change = ""
+    if previous and previous[-1]["metrics"].get(metric):
+      change = f"  ({value / previous[-1]['metrics'][metric] - 1:+.1%} vs {previous[-1]['revision']})"
+    print(f"  {metric:<34}{value:12.2f}{change}")
+
+  append_history(args.history, result)
+  regressions = find_regressions(previous[-1], result, args.threshold) if previous else []
+  for metric, before, after in regressions:
+    print(f"REGRESSION: {metric} dropped from {before:.2f} to {after:.2f}")
+  for metric, target, value in find_missed_targets(result):
+    print(f"BELOW TARGET: {metric} is {value:.2f}, target {target:.2f}")
+  return 1 if regressions and args.fail_on_regression else 0
+
+
+def parse_args(argv=None):
+  parser = argparse.ArgumentParser(description="Run the site generator benchmarks.")
+  parser.add_argument("benchmark", nargs="?", choices=["suite", "inline", "memory"], default="suite")
+  parser.add_argument("--pages", type=int, default=200, help="pages in the synthetic site")
+  parser.add_argument("--depth", type=int, default=3, help="maximum directory nesting depth")
+  parser.add_argument("--blocks", type=int, help="blocks per page (default 40, or 20000 for the memory benchmark)")
+  parser.add_argument("--inline-density", type=float, default=0.2, help="share of words with inline markup")
+  parser.add_argument("--block-mix", default=DEFAULT_BLOCK_MIX, help="weights per block kind")
+  parser.add_argument("--repeat", type=int, default=3, help="runs per measurement; the best is kept")
+  parser.add_argument("--lines", type=int, default=2000, help="lines in the inline benchmark paragraph")
+  parser.add_argument("--history", default=HISTORY_PATH, help="JSON lines file results are appended to")
+  parser.add_argument("--threshold", type=float, default=0.1, help="throughput drop flagged as a regression")
+  parser.add_argument("--fail-on-regression", action="store_true", help="exit non-zero when a regression is flagged")
+  return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+  args = parse_args()
+  if args.benchmark == "inline":
+    bench_inline(args.lines)
+  elif args.benchmark == "memory":
+    bench_memory(args.blocks or 20000)
+  else:
+    sys.exit(run_suite(args))
@@ -0,0 +1,86 @@
+class BlockHandler:
+  """Recognizes and converts one kind of markdown block.
+
+  Subclasses set block_type (any hashable, such as a BlockType member or
+  a string) and first_chars (the characters the block's first line can
+  start with, or None for any), and implement match and to_html_node.
+
+  match(lines) scans the stripped lines once and returns None if they
+  aren't this kind of block, or else whatever to_html_node needs so it
+  doesn't have to scan them again (a heading level, item offsets, True).
+  """
+  block_type = None
+  first_chars = None
+
+  def match(self, lines):
+    raise NotImplementedError()
+
+  def to_html_node(self, lines, match):
+    """Return the block's HTMLNode, or None if it produces nothing."""
+    raise NotImplementedError()
+
+
+class BlockRegistry:
+  """Ordered block handlers, dispatched on the first character of a block.
+
+  Only the handlers whose first_chars contain that character are tried,
+  in registration order, followed by the handlers that accept any first
+  character. If none match, the fallback handler (paragraphs) is used.
+  """
+  def __init__(self, handlers=(), fallback=None):
+    self.handlers = []
+    self.fallback = fallback
+    self.by_type = {}
+    self.by_char = {}
+    self.any_char = ()
+    for handler in handlers:
+      self.register(handler)
+
+  def register(self, handler, first=False):
+    """Add a handler, after the existing ones unless first is set.
+
+    A handler registered with first=True is tried before the built-in
+    handlers for the same characters, so it can take over their blocks.
+    """
+    if first:
+      self.handlers.insert(0, handler)
+    else:
+      self.handlers.append(handler)
+    self.index()
+
+  def unregister(self, handler):
+    self.handlers.remove(handler)
+    self.index()
+
+  def index(self):
+    by_char = {}
+    any_char = []
+    self.by_type = {}
+    for handler in self.handlers:
+      self.by_type.setdefault(handler.block_type, handler)
+      if handler.first_chars is None:
+        any_char.append(handler)
+      else:
+        for char in handler.first_chars:
+          by_char.setdefault(char, []).append(handler)
+    self.any_char = tuple(any_char)
+    self.by_char = {char: tuple(handlers) + self.any_char for char, handlers in by_char.items()}
+
+  def classify(self, lines):
+    """Return (handler, match) for a block's stripped lines."""
+    for handler in self.by_char.get(lines[0][:1], self.any_char):
+      match = handler.match(lines)
+      if match is not None:
+        return handler, match
+    return self.fallback, self.fallback.match(lines)
+
+  def handler_for(self, block_type):
+    """Return the handler for block_type, or None if none is registered."""
+    if self.fallback is not None and block_type == self.fallback.block_type:
+      return self.fallback
+    return self.by_type.get(block_type)
+
+  def signature(self):
+    """Name every handler in order, so caches of parsed output can tell registries apart."""
+    handlers = self.handlers + [self.fallback]
+    return ",".join(f"{type(handler).__module__}.{type(handler).__qualname__}" for handler in handlers)
@@ -0,0 +1,120 @@
+import os
+import re
+
+from store import JsonStore
+
+ATTR_URL_PATTERN = re.compile(r'\b(?:href|src)="([^"]*)"')
+
+
+def url_target(url):
+  """Return the site path a root-relative URL points at, or None for other URLs.
+
+  The query string and fragment are dropped, so "/blog/tom#top" and
+  "/blog/tom" both give "blog/tom".
+  """
+  if not url.startswith("/") or url.startswith("//"):
+    return None
+  return url.split("#", 1)[0].split("?", 1)[0].strip("/")
+
+
+def output_candidates(target):
+  """List the output paths, relative to the build directory, a site path may be served from."""
+  if not target:
+    return ["index.html"]
+  return [target, f"{target}/index.html", f"{target}.html"]
+
+
+def output_key(dest_path, dest_dir):
+  """Return dest_path relative to dest_dir with forward slashes."""
+  return os.path.relpath(dest_path, dest_dir).replace(os.sep, "/")
+
+
+class DependencyGraph(JsonStore):
+  """Persistent record of what every page was built from and refers to.
+
+  Each page (keyed by source path) has edges to the template it was
+  rendered with and to the site paths its content links to or embeds.
+  References are resolved against the current set of outputs only when
+  they are used (check, or the fingerprinted assets in a page's config),
+  so a page's edges stay valid until the page itself changes. Templates
+  get their own edges for the assets they reference, and dependents
+  finds the pages to re-render when a template changes.
+  """
+  VERSION = 1
+  FIELDS = ("pages", "templates")
+
+  def __init__(self, path=None, pages=None, templates=None):
+    self.path = path
+    self.pages = pages if pages is not None else {}
+    self.templates = templates if templates is not None else {}
+
+  def __contains__(self, src_path):
+    return os.path.relpath(src_path) in self.pages
+
+  def record_page(self, src_path, dest_path, dest_dir, template_path, urls):
+    """Replace a page's edges with those from its latest render."""
+    targets = {url_target(url) for url in urls}
+    targets.discard(None)
+    self.pages[os.path.relpath(src_path)] = {
+      "output": output_key(dest_path, dest_dir),
+      "template": os.path.relpath(template_path),
+      "refs": sorted(targets),
+    }
+
+  def refs(self, src_path):
+    """Return the site paths a page referenced when last rendered, or None if it is unknown."""
+    entry = self.pages.get(os.path.relpath(src_path))
+    return entry["refs"] if entry is not None else None
+
+  def record_template(self, template_path):
+    with open(template_path, "r") as f:
+      urls = ATTR_URL_PATTERN.findall(f.read())
+    targets = {url_target(url) for url in urls}
+    targets.discard(None)
+    self.templates[os.path.relpath(template_path)] = sorted(targets)
+
+  def remove_page(self, src_path):
+    self.pages.pop(os.path.relpath(src_path), None)
+
+  def retain(self, src_paths):
+    """Drop the pages whose sources are not in src_paths.
+
+    Returns:
+        List of dropped page keys.
+    """
+    keep = {os.path.relpath(path) for path in src_paths}
+    dropped = sorted(key for key in self.pages if key not in keep)
+    for key in dropped:
+      del self.pages[key]
+    return dropped
+
+  def resolve(self, target, outputs):
+    """Return the output a site path is served from, or None if it is missing."""
+    for candidate in output_candidates(target):
+      if candidate in outputs:
+        return candidate
+    return None
+
+  def dependents(self, template_path):
+    """Return the source keys of the pages rendered with template_path."""
+    key = os.path.relpath(template_path)
+    return sorted(page for page, entry in self.pages.items() if entry["template"] == key)
+
+  def check(self, outputs):
+    """Find references to site paths that no output provides.
+
+    One set lookup per edge; nothing is re-read or re-crawled.
+
+    Args:
+        outputs: Set of output paths relative to the build directory, with
+            forward slashes (e.g. "images/logo.png", "blog/index.html").
+
+    Returns:
+        Sorted list of (page or template key, broken site path) pairs.
+    """
+    broken = []
+    for owner, targets in self.templates.items():
+      broken.extend((owner, f"/{target}") for target in targets if self.resolve(target, outputs) is None)
+    for owner, entry in self.pages.items():
+      broken.extend((owner, f"/{target}") for target in entry["refs"] if self.resolve(target, outputs) is None)
+    return sorted(broken)
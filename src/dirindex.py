@@ -0,0 +1,91 @@
+import os
+
+from store import JsonStore
+
+
+class DirectoryIndex(JsonStore):
+  """Every file and directory under a set of roots, found with os.scandir.
+
+  files maps each file's path (relative to the working directory, like
+  manifest keys) to its [size, mtime_ns]; dirs maps each directory to its
+  mtime_ns and the names of its files and subdirectories. One scan at the
+  start of a build answers every later "which files are there, and how
+  big and how old are they" question, so no stage walks or stats the
+  tree again.
+
+  The index is persisted between builds. A directory whose mtime is
+  unchanged still has the same entries, so its listing is reused instead
+  of being read again. File stats are always refreshed, because editing a
+  file in place doesn't touch its directory.
+  """
+  VERSION = 1
+  FIELDS = ("files", "dirs")
+
+  def __init__(self, path=None, files=None, dirs=None):
+    self.path = path
+    self.files = files if files is not None else {}
+    self.dirs = dirs if dirs is not None else {}
+
+  @classmethod
+  def scan(cls, roots, previous=None):
+    """Index the trees under roots, reusing the listings of unchanged directories from previous.
+
+    Missing roots are skipped. The new index keeps previous's path.
+    """
+    index = cls(previous.path if previous is not None else None)
+    for root in roots:
+      try:
+        index.scan_dir(os.path.relpath(root), os.stat(root).st_mtime_ns, previous)
+      except FileNotFoundError:
+        continue
+    return index
+
+  def scan_dir(self, dir_key, mtime_ns, previous):
+    cached = previous.dirs.get(dir_key) if previous is not None else None
+    if cached is not None and cached["mtime"] == mtime_ns:
+      files, subdirs = cached["files"], []
+      for name in cached["files"]:
+        key = os.path.join(dir_key, name)
+        try:
+          stat = os.stat(key)
+        except FileNotFoundError:
+          continue
+        self.files[key] = [stat.st_size, stat.st_mtime_ns]
+      for name in cached["dirs"]:
+        key = os.path.join(dir_key, name)
+        try:
+          self.scan_dir(key, os.stat(key).st_mtime_ns, previous)
+        except FileNotFoundError:
+          continue
+        subdirs.append(name)
+    else:
+      files, subdir_stats = [], []
+      with os.scandir(dir_key) as entries:
+        for entry in entries:
+          # The entry type comes from the directory listing; only stat() costs a syscall.
+          if entry.is_dir():
+            subdir_stats.append((entry.name, entry.stat().st_mtime_ns))
+          elif entry.is_file():
+            stat = entry.stat()
+            files.append(entry.name)
+            self.files[os.path.join(dir_key, entry.name)] = [stat.st_size, stat.st_mtime_ns]
+      files.sort()
+      subdir_stats.sort()
+      subdirs = [name for name, _ in subdir_stats]
+      for name, subdir_mtime_ns in subdir_stats:
+        self.scan_dir(os.path.join(dir_key, name), subdir_mtime_ns, previous)
+    self.dirs[dir_key] = {"mtime": mtime_ns, "files": files, "dirs": subdirs}
+
+  def stat(self, path):
+    """Return the indexed [size, mtime_ns] of a file, or None if it isn't indexed."""
+    return self.files.get(os.path.relpath(path))
+
+  def walk(self, root):
+    """Yield (dirpath, filenames) for root and every directory under it, like os.walk."""
+    key = os.path.relpath(root)
+    entry = self.dirs.get(key)
+    if entry is None:
+      return
+    yield root, [name for name in entry["files"] if os.path.join(key, name) in self.files]
+    for name in entry["dirs"]:
+      yield from self.walk(os.path.join(root, name))
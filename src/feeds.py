@@ -0,0 +1,186 @@
+import datetime
+import email.utils
+import json
+import os
+import re
+from xml.sax.saxutils import escape
+
+from output import OutputFile
+from store import JsonStore
+
+TERM_PATTERN = re.compile(r"[^\W_]{2,}")
+SEARCH_DIR = "search"
+SEARCH_PREFIX_LENGTH = 2
+FEED_ITEMS = 20
+
+
+def index_terms(text):
+  """Return the sorted distinct lowercase words of text that the search index keeps."""
+  return sorted({term.casefold() for term in TERM_PATTERN.findall(text)})
+
+
+def search_shard(term):
+  """Name the search index shard a term is stored in: its first letters, made filename-safe."""
+  prefix = term[:SEARCH_PREFIX_LENGTH]
+  return "".join(char if char.isascii() and char.isalnum() else "_" for char in prefix)
+
+
+def page_url(output, basepath="/"):
+  """Return the URL a page is served at from its output path relative to the build directory."""
+  if output == "index.html":
+    return basepath
+  if output.endswith("/index.html"):
+    return f"{basepath}{output[:-len('index.html')]}"
+  return f"{basepath}{output}"
+
+
+def parse_date(value):
+  """Parse a front matter date (ISO 8601), or return None."""
+  try:
+    date = datetime.datetime.fromisoformat(value)
+  except (TypeError, ValueError):
+    return None
+  if date.tzinfo is None:
+    date = date.replace(tzinfo=datetime.timezone.utc)
+  return date
+
+
+def write_output(path, text):
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+  with OutputFile(path) as f:
+    f.write(text)
+  return f.changed
+
+
+class SiteIndex(JsonStore):
+  """Per-page metadata for the artifacts built from the whole site.
+
+  Pages report their front matter and the words of their content while
+  they are rendered, so the sitemap, RSS feed and search index are
+  written without reading the generated HTML back. Entries persist
+  between builds, so pages skipped as up to date still appear.
+  """
+  VERSION = 1
+  FIELDS = ("pages",)
+
+  def __init__(self, path=None, pages=None):
+    self.path = path
+    self.pages = pages if pages is not None else {}
+
+  def __contains__(self, src_path):
+    return os.path.relpath(src_path) in self.pages
+
+  def record(self, src_path, output, metadata, terms):
+    """Store a rendered page's output path, front matter and search terms."""
+    self.pages[os.path.relpath(src_path)] = {"output": output, "metadata": metadata, "terms": terms}
+
+  def remove(self, src_path):
+    self.pages.pop(os.path.relpath(src_path), None)
+
+  def retain(self, src_paths):
+    """Drop the pages whose sources are not in src_paths."""
+    keep = {os.path.relpath(path) for path in src_paths}
+    for key in [key for key in self.pages if key not in keep]:
+      del self.pages[key]
+
+  def entries(self, basepath="/"):
+    """Return (url, metadata, terms) for every page, sorted by URL."""
+    return sorted(
+      (page_url(entry["output"], basepath), entry["metadata"], entry["terms"]) for entry in self.pages.values()
+    )
+
+  def sitemap(self, site_url, basepath="/"):
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+    for url, metadata, _ in self.entries(basepath):
+      lines.append("  <url>")
+      lines.append(f"    <loc>{escape(site_url + url)}</loc>")
+      date = parse_date(metadata.get("date"))
+      if date is not None:
+        lines.append(f"    <lastmod>{date.date().isoformat()}</lastmod>")
+      lines.append("  </url>")
+    lines.append("</urlset>")
+    return "\n".join(lines) + "\n"
+
+  def feed(self, site_url, basepath="/"):
+    """Format an RSS 2.0 feed of the newest pages that have a front matter date."""
+    dated = []
+    site_title = "Site"
+    for url, metadata, _ in self.entries(basepath):
+      if url == basepath:
+        site_title = metadata.get("title", site_title)
+      date = parse_date(metadata.get("date"))
+      if date is not None:
+        dated.append((date, url, metadata))
+    dated.sort(key=lambda item: (item[0], item[1]), reverse=True)
+
+    lines = [
+      '<?xml version="1.0" encoding="UTF-8"?>',
+      '<rss version="2.0">',
+      "<channel>",
+      f"  <title>{escape(site_title)}</title>",
+      f"  <link>{escape(site_url + basepath)}</link>",
+      f"  <description>{escape(site_title)}</description>",
+    ]
+    for date, url, metadata in dated[:FEED_ITEMS]:
+      lines.append("  <item>")
+      lines.append(f"    <title>{escape(metadata.get('title', url))}</title>")
+      lines.append(f"    <link>{escape(site_url + url)}</link>")
+      lines.append(f"    <guid>{escape(site_url + url)}</guid>")
+      lines.append(f"    <pubDate>{email.utils.format_datetime(date)}</pubDate>")
+      if "description" in metadata:
+        lines.append(f"    <description>{escape(metadata['description'])}</description>")
+      lines.append("  </item>")
+    lines.extend(["</channel>", "</rss>"])
+    return "\n".join(lines) + "\n"
+
+  def search_index(self, basepath="/"):
+    """Build the search index files as a dict of relative path to JSON text.
+
+    search/index.json lists the pages as [url, title] pairs, plus the shard
+    names. Each search/<prefix>.json maps the terms starting with that
+    prefix to the positions of the pages containing them, so a browser
+    only fetches the shard for what is being typed.
+    """
+    pages = []
+    shards = {}
+    for doc_id, (url, metadata, terms) in enumerate(self.entries(basepath)):
+      pages.append([url, metadata.get("title", url)])
+      for term in terms:
+        shards.setdefault(search_shard(term), {}).setdefault(term, []).append(doc_id)
+
+    files = {
+      f"{SEARCH_DIR}/index.json": json.dumps(
+        {"prefix_length": SEARCH_PREFIX_LENGTH, "pages": pages, "shards": sorted(shards)}, separators=(",", ":")
+      ),
+    }
+    for shard, postings in shards.items():
+      files[f"{SEARCH_DIR}/{shard}.json"] = json.dumps(postings, separators=(",", ":"), sort_keys=True)
+    return files
+
+  def write(self, dest_dir, basepath="/", site_url=None, search=False, manifest=None):
+    """Write the sitemap and feed (if site_url is set) and the search index (if search is set).
+
+    Unchanged files are left alone. Every file is recorded in manifest if
+    given, so Manifest.prune deletes the ones a later build no longer asks
+    for, such as search shards whose terms are gone. Nothing else under
+    dest_dir is touched: pages and static files may live in search/ too.
+
+    Returns:
+        Number of files written.
+    """
+    files = {}
+    if site_url is not None:
+      site_url = site_url.rstrip("/")
+      files["sitemap.xml"] = self.sitemap(site_url, basepath)
+      files["feed.xml"] = self.feed(site_url, basepath)
+    if search:
+      files.update(self.search_index(basepath))
+
+    changed = 0
+    for name, text in files.items():
+      path = os.path.join(dest_dir, name)
+      written = write_output(path, text)
+      if manifest is not None:
+        manifest.record_output(path, written)
+      changed += written
+    return changed
@@ -0,0 +1,198 @@
+import io
+from array import array
+
+from htmlnode import URL_PROPS, LeafNode, ParentNode, props_to_html
+
+OPEN, CLOSE, LEAF = 0, 1, 2
+
+
+class FlatDocument:
+  """An HTML node tree flattened into parallel arrays.
+
+  Entry i is kinds[i] (OPEN, CLOSE or LEAF) with tag names[tags[i]] (index
+  0 means no tag). A leaf's text is text[starts[i]:ends[i]], sliced from
+  one shared string instead of one object per node. Attributes are rows
+  of their own, ordered by entry: prop_entries[j] is the entry row j
+  belongs to, names[prop_keys[j]] its name and text[prop_starts[j]:prop_ends[j]]
+  its value.
+  """
+  __slots__ = ("kinds", "tags", "starts", "ends", "prop_entries", "prop_keys", "prop_starts", "prop_ends", "text", "names")
+
+  def __init__(self, kinds, tags, starts, ends, prop_entries, prop_keys, prop_starts, prop_ends, text, names):
+    self.kinds = kinds
+    self.tags = tags
+    self.starts = starts
+    self.ends = ends
+    self.prop_entries = prop_entries
+    self.prop_keys = prop_keys
+    self.prop_starts = prop_starts
+    self.prop_ends = prop_ends
+    self.text = text
+    self.names = names
+
+  def __len__(self):
+    return len(self.kinds)
+
+  def iter_props(self):
+    """Yield (entry index, props dict) for every entry with attributes, in order."""
+    names = self.names
+    text = self.text
+    entry = None
+    props = None
+    for j, row_entry in enumerate(self.prop_entries):
+      if row_entry != entry:
+        if props is not None:
+          yield entry, props
+        entry = row_entry
+        props = {}
+      props[names[self.prop_keys[j]]] = text[self.prop_starts[j]:self.prop_ends[j]]
+    if props is not None:
+      yield entry, props
+
+  def iter_urls(self):
+    """Yield every href and src value, like HTMLNode.iter_urls."""
+    url_keys = {i for i, name in enumerate(self.names) if name in URL_PROPS}
+    for j, key in enumerate(self.prop_keys):
+      if key in url_keys:
+        yield self.text[self.prop_starts[j]:self.prop_ends[j]]
+
+  def iter_text(self):
+    """Yield the text of every leaf, like HTMLNode.iter_text."""
+    text = self.text
+    for i, kind in enumerate(self.kinds):
+      if kind == LEAF and self.ends[i] > self.starts[i]:
+        yield text[self.starts[i]:self.ends[i]]
+
+  def iter_html(self, basepath=None):
+    """Yield the document's HTML in chunks, like HTMLNode.iter_html."""
+    names = self.names
+    tags = self.tags
+    text = self.text
+    starts = self.starts
+    ends = self.ends
+    props = self.iter_props()
+    next_entry, next_props = next(props, (-1, None))
+    for i, kind in enumerate(self.kinds):
+      tag = names[tags[i]]
+      if kind == CLOSE:
+        yield f"</{tag}>"
+        continue
+      if i == next_entry:
+        start_tag = f"<{tag} {props_to_html(next_props, basepath)}>"
+        next_entry, next_props = next(props, (-1, None))
+      else:
+        start_tag = f"<{tag}>"
+      if kind == OPEN:
+        yield start_tag
+      elif tag is None:
+        yield text[starts[i]:ends[i]]
+      else:
+        yield f"{start_tag}{text[starts[i]:ends[i]]}</{tag}>"
+
+  def to_html(self, basepath=None):
+    return "".join(self.iter_html(basepath))
+
+  def write_html(self, fp, basepath=None):
+    fp.writelines(self.iter_html(basepath))
+
+  def to_node(self):
+    """Rebuild the equivalent HTMLNode tree."""
+    all_props = dict(self.iter_props())
+    stack = [[]]
+    opened = []
+    for i, kind in enumerate(self.kinds):
+      tag = self.names[self.tags[i]]
+      if kind == OPEN:
+        opened.append((tag, all_props.get(i)))
+        stack.append([])
+      elif kind == CLOSE:
+        tag, props = opened.pop()
+        children = stack.pop()
+        stack[-1].append(ParentNode(tag, children, props))
+      else:
+        stack[-1].append(LeafNode(tag, self.text[self.starts[i]:self.ends[i]], all_props.get(i)))
+    return stack[0][0]
+
+
+class FlatDocumentBuilder:
+  """Appends nodes to the arrays of a FlatDocument in document order."""
+  def __init__(self):
+    self.kinds = array("B")
+    self.tags = array("H")
+    self.starts = array("I")
+    self.ends = array("I")
+    self.prop_entries = array("I")
+    self.prop_keys = array("H")
+    self.prop_starts = array("I")
+    self.prop_ends = array("I")
+    self.text = io.StringIO()
+    self.length = 0
+    self.names = [None]
+    self.name_ids = {None: 0}
+    self.open_tags = []
+
+  def name_id(self, name):
+    name_id = self.name_ids.get(name)
+    if name_id is None:
+      name_id = self.name_ids[name] = len(self.names)
+      self.names.append(name)
+    return name_id
+
+  def write_text(self, value):
+    start = self.length
+    if value:
+      self.text.write(value)
+      self.length += len(value)
+    return start, self.length
+
+  def add(self, kind, tag, props=None, value=""):
+    if props:
+      entry = len(self.kinds)
+      for key, prop_value in props.items():
+        start, end = self.write_text(prop_value)
+        self.prop_entries.append(entry)
+        self.prop_keys.append(self.name_id(key))
+        self.prop_starts.append(start)
+        self.prop_ends.append(end)
+    start, end = self.write_text(value)
+    self.kinds.append(kind)
+    self.tags.append(self.name_id(tag))
+    self.starts.append(start)
+    self.ends.append(end)
+
+  def open(self, tag, props=None):
+    self.open_tags.append(tag)
+    self.add(OPEN, tag, props)
+
+  def close(self):
+    self.add(CLOSE, self.open_tags.pop())
+
+  def leaf(self, tag, value, props=None):
+    self.add(LEAF, tag, props, value)
+
+  def append_node(self, node):
+    """Append an HTMLNode tree, raising the same errors its to_html would."""
+    if isinstance(node, ParentNode):
+      if node.tag is None:
+        raise ValueError("Parent nodes must have a tag")
+      if not node.children:
+        raise ValueError("Parent nodes must have children")
+      self.open(node.tag, node.props)
+      for child in node.children:
+        self.append_node(child)
+      self.close()
+    else:
+      if node.value is None:
+        raise ValueError("Leaf nodes must have a value")
+      self.leaf(node.tag, node.value, node.props)
+
+  def build(self):
+    if self.open_tags:
+      raise ValueError(f"Unclosed tags: {self.open_tags}")
+    if len(self.kinds) == 2 and self.kinds[0] == OPEN:
+      raise ValueError("Parent nodes must have children")
+    return FlatDocument(
+      self.kinds, self.tags, self.starts, self.ends,
+      self.prop_entries, self.prop_keys, self.prop_starts, self.prop_ends,
+      self.text.getvalue(), self.names,
+    )
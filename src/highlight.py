@@ -0,0 +1,207 @@
+import functools
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+
+from store import atomic_write
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever a lexer's output changes; it is part of every cache key.
+HIGHLIGHT_VERSION = 1
+
+# Entries HighlightCache.prune keeps on disk; the least recently used go first.
+HIGHLIGHT_CACHE_SIZE = 10000
+
+# HighlightCache consulted by highlight_tokens, or None.
+highlight_cache = None
+
+
+class Lexer:
+  """Splits code into (token class, text) pairs with one precompiled pattern.
+
+  rules is a list of (token class, regex) pairs. They are joined into a
+  single alternation and matched left to right in one pass, so the
+  leftmost token wins and earlier rules win ties (a string containing
+  "#" is a string, not a comment). Text between tokens gets class None.
+  Token classes are the short names Pygments stylesheets use (k, s, c...).
+  """
+  def __init__(self, rules):
+    self.classes = [token_class for token_class, _ in rules]
+    self.pattern = re.compile("|".join(f"(?P<t{i}>{regex})" for i, (_, regex) in enumerate(rules)), re.MULTILINE)
+
+  def tokenize(self, code):
+    tokens = []
+    last_end = 0
+    for match in self.pattern.finditer(code):
+      start = match.start()
+      if start == match.end():
+        continue
+      if start > last_end:
+        tokens.append((None, code[last_end:start]))
+      tokens.append((self.classes[int(match.lastgroup[1:])], match.group()))
+      last_end = match.end()
+    if last_end < len(code):
+      tokens.append((None, code[last_end:]))
+    return tokens
+
+
+def words(*names):
+  return r"\b(?:" + "|".join(names) + r")\b"
+
+
+DOUBLE_QUOTED = r'"(?:\\.|[^"\\\n])*"'
+SINGLE_QUOTED = r"'(?:\\.|[^'\\\n])*'"
+NUMBER = r"\b(?:0[xX][0-9a-fA-F_]+|0[bB][01_]+|0[oO][0-7_]+|\d[\d_]*(?:\.\d*)?(?:[eE][+-]?\d+)?)\b"
+
+PYTHON = Lexer([
+  ("c", r"#[^\n]*"),
+  ("s", r"(?:\b[rRbBuUfF]{1,2})?(?:\"\"\"[\s\S]*?\"\"\"|'''[\s\S]*?'''|" + DOUBLE_QUOTED + "|" + SINGLE_QUOTED + ")"),
+  ("nd", r"(?<![\w)\]])@[\w.]+"),
+  ("k", words(
+    "False", "None", "True", "and", "as", "assert", "async", "await", "break", "class", "continue", "def", "del",
+    "elif", "else", "except", "finally", "for", "from", "global", "if", "import", "in", "is", "lambda", "match",
+    "case", "nonlocal", "not", "or", "pass", "raise", "return", "try", "while", "with", "yield",
+  )),
+  ("nb", words(
+    "abs", "all", "any", "bool", "bytes", "dict", "enumerate", "filter", "float", "getattr", "hasattr", "int",
+    "isinstance", "iter", "len", "list", "map", "max", "min", "next", "open", "print", "range", "repr", "reversed",
+    "set", "setattr", "sorted", "str", "sum", "super", "tuple", "type", "zip", "self",
+  )),
+  ("m", NUMBER),
+])
+
+JAVASCRIPT = Lexer([
+  ("c", r"//[^\n]*|/\*[\s\S]*?\*/"),
+  ("s", DOUBLE_QUOTED + "|" + SINGLE_QUOTED + r"|`(?:\\.|[^`\\])*`"),
+  ("k", words(
+    "async", "await", "break", "case", "catch", "class", "const", "continue", "default", "delete", "do", "else",
+    "export", "extends", "false", "finally", "for", "from", "function", "if", "import", "in", "instanceof", "let",
+    "new", "null", "of", "return", "static", "super", "switch", "this", "throw", "true", "try", "typeof",
+    "undefined", "var", "void", "while", "yield",
+  )),
+  ("m", NUMBER),
+])
+
+BASH = Lexer([
+  ("c", r"(?<![\w$])#[^\n]*"),
+  ("s", DOUBLE_QUOTED + "|" + r"'[^']*'"),
+  ("nv", r"\$(?:\{[^}\n]*\}|\w+|[@#?$!*-])"),
+  ("k", words(
+    "case", "do", "done", "elif", "else", "esac", "export", "fi", "for", "function", "if", "in", "local",
+    "return", "select", "then", "until", "while",
+  )),
+  ("nb", words("cd", "echo", "exit", "printf", "read", "set", "shift", "source", "test", "unset")),
+])
+
+JSON = Lexer([
+  ("na", DOUBLE_QUOTED + r"(?=\s*:)"),
+  ("s", DOUBLE_QUOTED),
+  ("k", words("true", "false", "null")),
+  ("m", r"-?\b\d+(?:\.\d+)?(?:[eE][+-]?\d+)?\b"),
+])
+
+LEXERS = {
+  "python": PYTHON, "py": PYTHON,
+  "javascript": JAVASCRIPT, "js": JAVASCRIPT,
+  "bash": BASH, "sh": BASH, "shell": BASH,
+  "json": JSON,
+}
+
+
+def register_lexer(names, lexer):
+  """Highlight code blocks tagged with any of names using lexer."""
+  for name in names:
+    LEXERS[name.lower()] = lexer
+  highlight_tokens.cache_clear()
+
+
+def set_highlight_cache(cache):
+  """Install the HighlightCache used by highlight_tokens, returning the previous one."""
+  global highlight_cache
+  previous = highlight_cache
+  highlight_cache = cache
+  return previous
+
+
+@functools.lru_cache(maxsize=1024)
+def highlight_tokens(language, code):
+  """Return the (token class, text) pairs for code, or None if language has no lexer.
+
+  Results are remembered per process, and in the installed HighlightCache
+  across builds, so an unchanged snippet is only tokenized once.
+  """
+  lexer = LEXERS.get(language.lower())
+  if lexer is None:
+    return None
+  cache = highlight_cache
+  if cache is None:
+    return tuple(lexer.tokenize(code))
+  key = cache.key(language.lower(), code)
+  tokens = cache.get(key)
+  if tokens is None:
+    tokens = lexer.tokenize(code)
+    cache.put(key, tokens)
+  return tuple(tokens)
+
+
+class HighlightCache:
+  """Tokenized code snippets on disk, keyed by language and a hash of the code.
+
+  Entries are small JSON files written atomically, so worker processes
+  can share one directory, like AstCache. A hit touches its entry, so
+  prune can drop the least recently used ones.
+  """
+  def __init__(self, directory):
+    self.directory = directory
+    self.hits = 0
+    self.misses = 0
+
+  def key(self, language, code):
+    digest = hashlib.sha256(f"ssg-highlight-{HIGHLIGHT_VERSION}\0{language}\0".encode())
+    digest.update(code.encode("utf-8"))
+    return digest.hexdigest()
+
+  def path_for(self, key):
+    return os.path.join(self.directory, key[:2], f"{key}.json")
+
+  def get(self, key):
+    """Return the cached tokens for key, or None if they aren't cached."""
+    path = self.path_for(key)
+    try:
+      with open(path, "r") as f:
+        tokens = [(token_class, text) for token_class, text in json.load(f)]
+      os.utime(path)
+    except FileNotFoundError:
+      self.misses += 1
+      return None
+    except (OSError, ValueError, TypeError) as e:
+      logger.warning("Ignoring unreadable highlight cache entry %s: %s", key, e)
+      self.misses += 1
+      return None
+    self.hits += 1
+    return tokens
+
+  def put(self, key, tokens):
+    with atomic_write(self.path_for(key)) as f:
+      json.dump(tokens, f, separators=(",", ":"))
+
+  def prune(self, max_entries=HIGHLIGHT_CACHE_SIZE):
+    """Delete the least recently used entries beyond max_entries, returning how many were removed."""
+    entries = []
+    for dirpath, _, names in os.walk(self.directory):
+      for name in names:
+        path = os.path.join(dirpath, name)
+        entries.append((os.stat(path).st_mtime_ns, path))
+    entries.sort()
+    stale = entries[:max(0, len(entries) - max_entries)]
+    for _, path in stale:
+      os.remove(path)
+    return len(stale)
+
+  def clear(self):
+    if os.path.exists(self.directory):
+      shutil.rmtree(self.directory)
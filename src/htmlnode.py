@@ -1,47 +1,143 @@
+import sys
+
+URL_PROPS = ("href", "src")
+
+
+class Basepath(str):
+  """A basepath that also maps static files to their fingerprinted names.
+
+  Compares and formats like the plain basepath string, so it can be
+  passed anywhere one is expected. assets maps paths relative to the
+  site root (images/tom.png) to the name the file was written under
+  (images/tom.3f9a1c0b.png); key identifies the mapping, for caches.
+  """
+  def __new__(cls, basepath, assets):
+    self = super().__new__(cls, basepath)
+    self.assets = dict(assets)
+    self.key = hash(tuple(sorted(self.assets.items())))
+    return self
+
+  def __reduce__(self):
+    return (Basepath, (str(self), self.assets))
+
+  def asset_url(self, url):
+    """Return a root-relative URL with its path replaced by the fingerprinted one, if any."""
+    end = len(url)
+    for separator in "?#":
+      index = url.find(separator, 1, end)
+      if index != -1:
+        end = index
+    name = self.assets.get(url[1:end])
+    if name is None:
+      return url
+    return f"/{name}{url[end:]}"
+
+
+def rebase_url(key, value, basepath):
+  """Prefix a root-relative URL attribute with basepath, fingerprinting static files."""
+  if key in URL_PROPS and value.startswith("/") and not value.startswith("//"):
+    if getattr(basepath, "assets", None):
+      value = basepath.asset_url(value)
+    return basepath + value[1:]
+  return value
+
+
+def props_to_html(props, basepath=None):
+  """Format a props dict as HTML attributes, rebasing root-relative URLs."""
+  if props:
+    if basepath and (basepath != "/" or getattr(basepath, "assets", None)):
+      return " ".join([f'{key}="{rebase_url(key, value, basepath)}"' for key, value in props.items()])
+    return " ".join([f'{key}="{value}"' for key, value in props.items()])
+  return ""
+
+
 class HTMLNode:
+  __slots__ = ("tag", "value", "children", "props")
+
   def __init__(self, tag=None, value=None, children=None, props=None):
-    self.tag = tag
+    self.tag = sys.intern(tag) if tag is not None else None
     self.value = value
     self.children = children
     self.props = props
 
-  def to_html(self):
+  def to_html(self, basepath=None):
     raise NotImplementedError()
 
-  def props_to_html(self):
+  def iter_html(self, basepath=None):
+    """Yield the node's HTML in chunks, without building the whole string.
+
+    If basepath is given, root-relative href and src values are moved under it.
+    """
+    raise NotImplementedError()
+
+  def write_html(self, fp, basepath=None):
+    """Stream the node's HTML into a text file object."""
+    fp.writelines(self.iter_html(basepath))
+
+  def props_to_html(self, basepath=None):
+    return props_to_html(self.props, basepath)
+
+  def iter_urls(self):
+    """Yield the href and src values of this node and its descendants, before rebasing."""
     if self.props:
-      return " ".join([f'{key}="{value}"' for key, value in self.props.items()])
-    return ""
+      for key in URL_PROPS:
+        if key in self.props:
+          yield self.props[key]
+    for child in self.children or ():
+      yield from child.iter_urls()
+
+  def iter_text(self):
+    """Yield the text values of this node's leaves, in document order."""
+    if self.value:
+      yield self.value
+    for child in self.children or ():
+      yield from child.iter_text()
 
   def __repr__(self):
     return f"HTMLNode({self.tag}, {self.value}, {self.children}, {self.props})"
 
 
 class LeafNode(HTMLNode):
+  __slots__ = ()
+
   def __init__(self, tag, value, props=None):
     super().__init__(tag, value, None, props)
 
-  def to_html(self):
+  def to_html(self, basepath=None):
     if self.value is None:
       raise ValueError("Leaf nodes must have a value")
     if self.tag is None:
       return self.value
     if self.props:
-      return f"<{self.tag} {self.props_to_html()}>{self.value}</{self.tag}>"
+      return f"<{self.tag} {self.props_to_html(basepath)}>{self.value}</{self.tag}>"
     return f"<{self.tag}>{self.value}</{self.tag}>"
 
+  def iter_html(self, basepath=None):
+    yield self.to_html(basepath)
+
 
 class ParentNode(HTMLNode):
+  __slots__ = ()
+
   def __init__(self, tag, children, props=None):
     super().__init__(tag, None, children, props)
 
-  def to_html(self):
+  def to_html(self, basepath=None):
+    return "".join(self.iter_html(basepath))
+
+  def iter_html(self, basepath=None):
     if self.tag is None:
       raise ValueError("Parent nodes must have a tag")
     if self.children is None or len(self.children) == 0:
       raise ValueError("Parent nodes must have children")
     if self.props:
-      return f"<{self.tag} {self.props_to_html()}>{''.join([child.to_html() for child in self.children])}</{self.tag}>"
-    return f"<{self.tag}>{''.join([child.to_html() for child in self.children])}</{self.tag}>"
-
-
+      yield f"<{self.tag} {self.props_to_html(basepath)}>"
+    else:
+      yield f"<{self.tag}>"
+    for child in self.children:
+      if type(child) is LeafNode:
+        # Leaves serialize to one string; skip the generator they would wrap it in.
+        yield child.to_html(basepath)
+      else:
+        yield from child.iter_html(basepath)
+    yield f"</{self.tag}>"
@@ -0,0 +1,74 @@
+import logging
+import pickle
+from collections import OrderedDict
+
+from store import atomic_write
+
+logger = logging.getLogger(__name__)
+
+# Bump when the inline parser's output changes, so persisted caches are dropped.
+CACHE_VERSION = 1
+
+
+class InlineCache:
+  """Bounded LRU cache from raw inline markdown to its rendered leaf nodes.
+
+  Values are tuples of LeafNodes and are shared between every page that
+  uses the same fragment. Nodes are never mutated after parsing, so
+  sharing is safe. They still go through the serializer, so the basepath
+  is applied per build.
+  """
+  def __init__(self, maxsize=4096):
+    self.maxsize = maxsize
+    self.entries = OrderedDict()
+    self.hits = 0
+    self.misses = 0
+
+  def __len__(self):
+    return len(self.entries)
+
+  def get(self, key):
+    value = self.entries.get(key)
+    if value is None:
+      self.misses += 1
+      return None
+    self.entries.move_to_end(key)
+    self.hits += 1
+    return value
+
+  def put(self, key, value):
+    self.entries[key] = value
+    self.entries.move_to_end(key)
+    if len(self.entries) > self.maxsize:
+      self.entries.popitem(last=False)
+
+  def stats(self):
+    lookups = self.hits + self.misses
+    return {
+      "hits": self.hits,
+      "misses": self.misses,
+      "size": len(self.entries),
+      "maxsize": self.maxsize,
+      "hit_rate": self.hits / lookups if lookups else 0.0,
+    }
+
+  @classmethod
+  def load(cls, path, maxsize=4096):
+    """Load a persisted cache, or return an empty one if missing or outdated."""
+    cache = cls(maxsize)
+    try:
+      with open(path, "rb") as f:
+        version, entries = pickle.load(f)
+    except FileNotFoundError:
+      return cache
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError) as e:
+      logger.warning("Ignoring unreadable inline cache %s: %s", path, e)
+      return cache
+    if version == CACHE_VERSION:
+      for key, value in list(entries)[-maxsize:]:
+        cache.entries[key] = value
+    return cache
+
+  def save(self, path):
+    with atomic_write(path, "wb") as f:
+      pickle.dump((CACHE_VERSION, list(self.entries.items())), f, protocol=pickle.HIGHEST_PROTOCOL)
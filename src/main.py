@@ -1,14 +1,290 @@
+import argparse
+import logging
+import os
+import shutil
 import sys
+import time
 
-from util import copy_files_from_to_directory, generate_pages_recursive
+from assets import ASSET_MANIFEST, LINK_MODES, is_in_sync, load_asset_manifest, place_file, write_asset_manifest
+from ast_cache import AstCache
+from depgraph import DependencyGraph, output_key
+from dirindex import DirectoryIndex
+from feeds import SiteIndex
+from highlight import HighlightCache, set_highlight_cache
+from htmlnode import Basepath
+from inline_cache import InlineCache
+from manifest import Manifest
+from profiler import Profiler
+from server import SiteWatcher, serve
+from shards import merge_shards, parse_shard, write_shard_file
+import util
 
-def main(basepath):
-  copy_files_from_to_directory("static", "docs")
-  generate_pages_recursive("content", "template.html", "docs", basepath)
+MANIFEST_PATH = os.path.join(".ssg-cache", "manifest.json")
+PROFILE_PATH = os.path.join(".ssg-cache", "profile.json")
+INLINE_CACHE_PATH = os.path.join(".ssg-cache", "inline-cache.pickle")
+AST_CACHE_DIR = os.path.join(".ssg-cache", "ast")
+HIGHLIGHT_CACHE_DIR = os.path.join(".ssg-cache", "highlight")
+GRAPH_PATH = os.path.join(".ssg-cache", "deps.json")
+SITE_INDEX_PATH = os.path.join(".ssg-cache", "site-index.json")
+DIR_INDEX_PATH = os.path.join(".ssg-cache", "dirindex.json")
+ASSET_MANIFEST_PATH = os.path.join("docs", ASSET_MANIFEST)
 
+logger = logging.getLogger(__name__)
 
 
+def configure_logging(verbosity):
+  """Set up console logging: -1 is quiet, 0 normal, 1 or more debug."""
+  if verbosity < 0:
+    level = logging.WARNING
+  elif verbosity == 0:
+    level = logging.INFO
+  else:
+    level = logging.DEBUG
+  logging.basicConfig(level=level, format="%(message)s")
+
+
+def main(basepath, clean=False, jobs=1, profile=None, profile_top=10, **build_options):
+  if profile is not None:
+    if jobs > 1:
+      logger.warning("Profiling times the build in this process only; ignoring --jobs %d", jobs)
+    with Profiler() as profiler:
+      cache_stats = build(basepath, clean, **build_options)
+    if cache_stats is not None:
+      profiler.counters["inline_cache"] = cache_stats
+    logger.info(profiler.report(profile_top))
+    profiler.write_json(profile, profile_top)
+    logger.info("Wrote profile to %s", profile)
+  else:
+    build(basepath, clean, jobs, **build_options)
+
+
+def build(
+  basepath, clean=False, jobs=1, link_mode="copy", verify_hash=False, copy_workers=8, inline_cache_size=4096,
+  persist_inline_cache=False, use_ast_cache=True, pipeline_depth=0, site_url=None, search_index=False, fingerprint=False,
+  shard=None,
+):
+  """Build the site into docs/, returning the inline cache stats (None if disabled).
+
+  With shard, an (index, count) pair, only that shard's pages are built,
+  and docs/ is left as a partial output tree for merge() to combine.
+  """
+  start = time.perf_counter()
+  index = DirectoryIndex.scan(["content", "static"], DirectoryIndex(DIR_INDEX_PATH) if clean else DirectoryIndex.load(DIR_INDEX_PATH))
+  manifest = Manifest(MANIFEST_PATH) if clean else Manifest.load(MANIFEST_PATH)
+  graph = DependencyGraph(GRAPH_PATH) if clean else DependencyGraph.load(GRAPH_PATH)
+  site_index = None
+  if site_url is not None or search_index:
+    site_index = SiteIndex(SITE_INDEX_PATH) if clean else SiteIndex.load(SITE_INDEX_PATH)
+  cache = None
+  if inline_cache_size > 0:
+    if persist_inline_cache and not clean:
+      cache = InlineCache.load(INLINE_CACHE_PATH, inline_cache_size)
+    else:
+      cache = InlineCache(inline_cache_size)
+  previous_cache = util.set_inline_cache(cache)
+  ast_cache = AstCache(AST_CACHE_DIR) if use_ast_cache else None
+  if ast_cache is not None and clean:
+    ast_cache.clear()
+  highlight_cache = HighlightCache(HIGHLIGHT_CACHE_DIR)
+  if clean:
+    highlight_cache.clear()
+  if not manifest.entries and os.path.exists("docs"):
+    # Without a manifest we can't tell stale outputs apart, so start clean.
+    shutil.rmtree("docs")
+
+  assets = load_asset_manifest(ASSET_MANIFEST_PATH) if fingerprint else None
+  copied = util.copy_files_from_to_directory(
+    "static", "docs", manifest=manifest, link_mode=link_mode, verify_hash=verify_hash, workers=copy_workers,
+    assets=assets, index=index,
+  )
+  if assets is not None:
+    write_asset_manifest(ASSET_MANIFEST_PATH, assets)
+    basepath = Basepath(basepath, assets)
+  elif os.path.exists(ASSET_MANIFEST_PATH):
+    os.remove(ASSET_MANIFEST_PATH)
+  previous_highlight_cache = set_highlight_cache(highlight_cache)
+  try:
+    generated = util.generate_pages_recursive(
+      "content", "template.html", "docs", basepath, manifest=manifest, jobs=jobs, ast_cache=ast_cache, graph=graph,
+      pipeline_depth=pipeline_depth, site_index=site_index, shard=shard, index=index,
+    )
+  finally:
+    util.set_inline_cache(previous_cache)
+    set_highlight_cache(previous_highlight_cache)
+  up_to_date = len(manifest.seen) - generated - copied
+  if shard is None and site_index is not None:
+    written = site_index.write("docs", basepath, site_url, search_index, manifest)
+    site_index.save()
+    logger.debug("Updated %d sitemap, feed and search index files", written)
+  removed = manifest.prune("docs")
+  for path in removed:
+    logger.debug("Removed stale output: %s", path)
+  if shard is None:
+    # Other shards may share these caches, and only a full build knows every page.
+    if ast_cache is not None:
+      pages = [entry["hash"] for entry in manifest.entries.values() if entry["config"] is not None]
+      logger.debug("Evicted %d AST cache entries", ast_cache.prune(pages))
+    logger.debug("Evicted %d highlight cache entries", highlight_cache.prune())
+  manifest.save()
+  graph.save()
+  index.save()
+  if shard is not None:
+    # Site-wide files and reference checks need every shard; merge() does them.
+    if site_index is not None:
+      site_index.save()
+    write_shard_file("docs", shard, manifest, graph, site_index)
+    logger.info("Built shard %d/%d", *shard)
+  else:
+    check_references(manifest, graph, assets)
+
+  logger.info(
+    "Generated %d pages, copied %d files, removed %d stale outputs (%d up to date, %d changed on disk) in %.2fs",
+    generated, copied, len(removed), up_to_date, len(manifest.changed),
+    time.perf_counter() - start,
+  )
+  if ast_cache is not None:
+    logger.debug("AST cache: %d hits, %d misses", ast_cache.hits, ast_cache.misses)
+  logger.debug("Highlight cache: %d hits, %d misses", highlight_cache.hits, highlight_cache.misses)
+  if cache is None:
+    return None
+  # With --jobs the pages are parsed in worker processes, so these only cover this one.
+  stats = cache.stats()
+  logger.info(
+    "Inline cache: %d hits, %d misses (%.0f%% hit rate), %d entries",
+    stats["hits"], stats["misses"], stats["hit_rate"] * 100, stats["size"],
+  )
+  if persist_inline_cache:
+    cache.save(INLINE_CACHE_PATH)
+  return stats
+
+
+def check_references(manifest, graph, assets=None):
+  """Warn about every root-relative reference that no output in docs/ serves."""
+  outputs = {output_key(key, "docs") for key in manifest.entries}
+  if assets is not None:
+    # Pages refer to static files by their original names.
+    outputs.update(assets)
+  for owner, target in graph.check(outputs):
+    logger.warning("Broken reference in %s: %s", owner, target)
+
+
+def merge(shard_dirs, basepath="/", link_mode="copy", site_url=None, search_index=False):
+  """Combine the docs/ trees of every shard of a build (see build's shard) into docs/.
+
+  Also writes the merged manifest and dependency graph, so later builds
+  are incremental, and the sitemap, feed and search index if asked for.
+  """
+  start = time.perf_counter()
+  manifest = Manifest.load(MANIFEST_PATH)
+  graph = DependencyGraph(GRAPH_PATH)
+  site_index = SiteIndex(SITE_INDEX_PATH) if site_url is not None or search_index else None
+  placed = merge_shards(shard_dirs, "docs", manifest, graph, site_index, link_mode)
+
+  assets = None
+  shard_assets = os.path.join(shard_dirs[0], ASSET_MANIFEST)
+  if os.path.exists(shard_assets):
+    if not is_in_sync(shard_assets, ASSET_MANIFEST_PATH):
+      place_file(shard_assets, ASSET_MANIFEST_PATH, link_mode)
+    assets = load_asset_manifest(ASSET_MANIFEST_PATH)
+  elif os.path.exists(ASSET_MANIFEST_PATH):
+    os.remove(ASSET_MANIFEST_PATH)
+
+  if site_index is not None:
+    site_index.write("docs", basepath, site_url, search_index, manifest)
+    site_index.save()
+  removed = manifest.prune("docs")
+  manifest.save()
+  graph.save()
+  check_references(manifest, graph, assets)
+  logger.info(
+    "Merged %d shards: placed %d files, removed %d stale outputs in %.2fs",
+    len(shard_dirs), placed, len(removed), time.perf_counter() - start,
+  )
+
+
+def shard_arg(spec):
+  try:
+    return parse_shard(spec)
+  except ValueError as e:
+    raise argparse.ArgumentTypeError(str(e)) from e
+
+
+def parse_args(argv=None):
+  parser = argparse.ArgumentParser(description="Build the static site into docs/.")
+  parser.add_argument("basepath", nargs="?", default="/", help="URL prefix the site is served under")
+  parser.add_argument("--clean", action="store_true", help="ignore the build manifest and caches and rebuild everything")
+  parser.add_argument("-j", "--jobs", type=int, default=1, help="render pages in N worker processes (0 uses every CPU)")
+  parser.add_argument("--link-mode", choices=LINK_MODES, default="copy", help="how static files are placed in docs/: full copies, hardlinks, or reflinks ('auto' clones when the filesystem allows)")
+  parser.add_argument("--verify-hash", action="store_true", help="hash static files even when size and mtime are unchanged")
+  parser.add_argument("--copy-workers", type=int, default=8, metavar="N", help="threads copying static files")
+  parser.add_argument("--inline-cache-size", type=int, default=4096, metavar="N", help="remember the parsed nodes of the N most recent inline fragments (0 disables)")
+  parser.add_argument("--persist-inline-cache", action="store_true", help=f"keep the inline cache between builds in {INLINE_CACHE_PATH}")
+  parser.add_argument("--no-ast-cache", dest="use_ast_cache", action="store_false", help=f"always parse markdown instead of reusing parsed pages from {AST_CACHE_DIR}")
+  parser.add_argument("--pipeline", dest="pipeline_depth", nargs="?", type=int, const=32, default=0, metavar="DEPTH", help="overlap reading sources, rendering and writing outputs, with up to DEPTH pages queued between stages (default 32)")
+  parser.add_argument("--site-url", metavar="URL", help="public origin of the site (e.g. https://example.com); writes sitemap.xml and feed.xml")
+  parser.add_argument("--search-index", action="store_true", help="write a prefix-sharded search index to docs/search/")
+  parser.add_argument("--shard", type=shard_arg, metavar="INDEX/COUNT", help="build only shard INDEX of COUNT size-balanced parts of content/ (e.g. 3/16); combine the docs/ trees with 'main.py merge'")
+  parser.add_argument("--fingerprint", action="store_true", help=f"also copy static files under content-hashed names (index.3f9a1c0b.css), point page and template references at them and list them in docs/{ASSET_MANIFEST}")
+  parser.add_argument("--profile", nargs="?", const=PROFILE_PATH, metavar="PATH", help=f"time each build stage and page, writing a JSON report (default {PROFILE_PATH})")
+  parser.add_argument("--profile-top", type=int, default=10, metavar="N", help="number of slowest pages to report")
+  verbosity = parser.add_mutually_exclusive_group()
+  verbosity.add_argument("-q", "--quiet", dest="verbosity", action="store_const", const=-1, default=0, help="only report warnings and errors")
+  verbosity.add_argument("-v", "--verbose", dest="verbosity", action="store_const", const=1, help="log every file processed")
+  args = parser.parse_args(argv)
+  if args.jobs == 0:
+    args.jobs = os.cpu_count() or 1
+  return args
+
+
+def parse_serve_args(argv):
+  parser = argparse.ArgumentParser(prog="main.py serve", description="Build the site, serve docs/ and rebuild on changes.")
+  parser.add_argument("basepath", nargs="?", default="/", help="URL prefix the site is served under")
+  parser.add_argument("--port", type=int, default=8888, help="port to serve on")
+  parser.add_argument("--watch", action="store_true", help="poll content/, static/ and the template and rebuild what changed")
+  parser.add_argument("--interval", type=float, default=0.2, help="seconds between polls")
+  parser.add_argument("-v", "--verbose", dest="verbosity", action="store_const", const=1, default=0, help="log every file processed")
+  return parser.parse_args(argv)
+
+
+def parse_merge_args(argv):
+  parser = argparse.ArgumentParser(prog="main.py merge", description="Combine the docs/ trees of a sharded build into docs/.")
+  parser.add_argument("shard_dirs", nargs="+", metavar="SHARD_DIR", help="docs/ directory of each shard build")
+  parser.add_argument("--basepath", default="/", help="URL prefix the site is served under")
+  parser.add_argument("--link-mode", choices=LINK_MODES, default="copy", help="how shard outputs are placed in docs/")
+  parser.add_argument("--site-url", metavar="URL", help="public origin of the site; writes sitemap.xml and feed.xml")
+  parser.add_argument("--search-index", action="store_true", help="write a prefix-sharded search index to docs/search/")
+  parser.add_argument("-v", "--verbose", dest="verbosity", action="store_const", const=1, default=0, help="log every file processed")
+  return parser.parse_args(argv)
+
+
+def run_server(args):
+  watcher = SiteWatcher(
+    Manifest.load(MANIFEST_PATH), args.basepath, ast_cache=AstCache(AST_CACHE_DIR), graph=DependencyGraph.load(GRAPH_PATH)
+  )
+  serve(watcher, args.port, args.watch, args.interval)
+
 
 if __name__ == "__main__":
-  basepath = sys.argv[1] if len(sys.argv) > 1 else "/"
-  main(basepath=basepath)
\ No newline at end of file
+  if sys.argv[1:2] == ["serve"]:
+    args = parse_serve_args(sys.argv[2:])
+    configure_logging(args.verbosity)
+    run_server(args)
+    sys.exit()
+  if sys.argv[1:2] == ["merge"]:
+    args = parse_merge_args(sys.argv[2:])
+    configure_logging(args.verbosity)
+    try:
+      merge(args.shard_dirs, args.basepath, args.link_mode, args.site_url, args.search_index)
+    except ValueError as e:
+      sys.exit(f"merge failed: {e}")
+    sys.exit()
+
+  args = parse_args()
+  configure_logging(args.verbosity)
+  main(
+    basepath=args.basepath, clean=args.clean, jobs=args.jobs, profile=args.profile, profile_top=args.profile_top,
+    link_mode=args.link_mode, verify_hash=args.verify_hash, copy_workers=args.copy_workers,
+    inline_cache_size=args.inline_cache_size, persist_inline_cache=args.persist_inline_cache,
+    use_ast_cache=args.use_ast_cache, pipeline_depth=args.pipeline_depth,
+    site_url=args.site_url, search_index=args.search_index, fingerprint=args.fingerprint, shard=args.shard,
+  )
@@ -0,0 +1,128 @@
+import hashlib
+import os
+
+from store import JsonStore
+
+
+def hash_file(path):
+  """Return the sha256 hex digest of a file's contents."""
+  digest = hashlib.sha256()
+  with open(path, "rb") as f:
+    for chunk in iter(lambda: f.read(1 << 16), b""):
+      digest.update(chunk)
+  return digest.hexdigest()
+
+
+def hash_text(text):
+  """Return the sha256 hex digest of a string."""
+  return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class Manifest(JsonStore):
+  """Persistent record of the source behind every generated output.
+
+  Entries are keyed by output path and hold the source path, its size,
+  mtime and content hash, and a config hash (template and basepath for
+  pages, None for static files). An output is fresh when the source stat
+  still matches, or when only the mtime moved but the content did not.
+  changed collects the outputs whose bytes this build actually rewrote.
+  """
+  VERSION = 1
+  FIELDS = ("entries",)
+
+  def __init__(self, path=None, entries=None):
+    self.path = path
+    self.entries = entries if entries is not None else {}
+    self.seen = set()
+    self.changed = set()
+
+  def is_fresh(self, src_path, dest_path, config=None, verify_hash=False, mark=True, src_stat=None):
+    """Return True if dest_path is up to date with src_path and config.
+
+    Also marks dest_path as produced by this build so prune() keeps it,
+    unless mark is False. With verify_hash, the source is hashed even if
+    its stat is unchanged. src_stat is the source's [size, mtime_ns] if
+    already known (see DirectoryIndex.stat), saving a stat call.
+    """
+    key = os.path.relpath(dest_path)
+    if mark:
+      self.seen.add(key)
+    entry = self.entries.get(key)
+    if entry is None or entry["source"] != os.path.relpath(src_path) or entry["config"] != config:
+      return False
+    if not os.path.exists(dest_path):
+      return False
+
+    if src_stat is not None:
+      size, mtime_ns = src_stat
+    else:
+      stat = os.stat(src_path)
+      size, mtime_ns = stat.st_size, stat.st_mtime_ns
+    if size != entry["size"]:
+      return False
+    if mtime_ns == entry["mtime"] and not verify_hash:
+      return True
+    if hash_file(src_path) != entry["hash"]:
+      return False
+    entry["mtime"] = mtime_ns
+    return True
+
+  def record(self, src_path, dest_path, config=None, changed=True):
+    """Record that dest_path was just generated from src_path.
+
+    changed is False when the output was regenerated but its bytes came
+    out identical, so the file on disk was left alone.
+    """
+    key = os.path.relpath(dest_path)
+    stat = os.stat(src_path)
+    self.seen.add(key)
+    if changed:
+      self.changed.add(key)
+    self.entries[key] = {
+      "source": os.path.relpath(src_path),
+      "size": stat.st_size,
+      "mtime": stat.st_mtime_ns,
+      "hash": hash_file(src_path),
+      "config": config,
+    }
+
+  def record_output(self, dest_path, changed=True):
+    """Record an output built from the whole site (a sitemap, a feed) rather than one source.
+
+    Such an entry has no source, so is_fresh never reports it up to date.
+    It only keeps prune from deleting the output while builds still
+    produce it, and lets prune delete it once they stop.
+    """
+    key = os.path.relpath(dest_path)
+    self.seen.add(key)
+    if changed:
+      self.changed.add(key)
+    self.entries[key] = {"source": None, "size": None, "mtime": None, "hash": None, "config": None}
+
+  def remove(self, dest_path, dest_dir):
+    """Forget an output and delete it, along with directories it leaves empty."""
+    key = os.path.relpath(dest_path)
+    self.entries.pop(key, None)
+    self.seen.discard(key)
+    dest_dir = os.path.abspath(dest_dir)
+    dest_path = os.path.abspath(dest_path)
+    if os.path.exists(dest_path):
+      os.remove(dest_path)
+
+    parent = os.path.dirname(dest_path)
+    while parent.startswith(dest_dir + os.sep) and os.path.isdir(parent) and not os.listdir(parent):
+      os.rmdir(parent)
+      parent = os.path.dirname(parent)
+
+  def prune(self, dest_dir):
+    """Delete outputs whose source disappeared since the last build.
+
+    Directories under dest_dir left empty by the deletion are removed too.
+
+    Returns:
+        List of removed output paths.
+    """
+    removed = sorted(set(self.entries) - self.seen)
+    for key in removed:
+      self.remove(key, dest_dir)
+    return removed
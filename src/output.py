@@ -0,0 +1,108 @@
+import os
+
+COPY_CHUNK = 1 << 16
+# Characters of text collected before they are encoded and compared in one go.
+WRITE_BUFFER = 1 << 16
+
+
+class OutputFile:
+  """Text sink that atomically replaces dest_path, but only if its bytes change.
+
+  Written text is compared with the existing file as it arrives, and
+  nothing touches the disk while it still matches. At the first
+  difference a temporary file is started from the matching prefix. On
+  close it replaces dest_path with os.replace, so readers (such as the
+  dev server) see the old file or the new one, never a partial write.
+  An identical output keeps its mtime, so rsync and CDN syncs skip it.
+
+  Text is collected in a buffer and encoded WRITE_BUFFER characters at a
+  time, so serializers can write many small chunks without paying for an
+  encode and a comparison on each. write_bytes takes already encoded data.
+
+  Use as a context manager: an exception discards the temporary file and
+  leaves dest_path untouched. changed is set once the output is closed.
+  """
+  def __init__(self, dest_path, encoding="utf-8"):
+    self.dest_path = dest_path
+    self.encoding = encoding
+    self.tmp_path = f"{dest_path}.{os.getpid()}.tmp"
+    self.tmp = None
+    self.matched = 0
+    self.changed = None
+    self.pending = []
+    self.pending_size = 0
+    try:
+      self.existing = open(dest_path, "rb")
+    except FileNotFoundError:
+      self.existing = None
+
+  def write(self, text):
+    self.pending.append(text)
+    self.pending_size += len(text)
+    if self.pending_size >= WRITE_BUFFER:
+      self.flush()
+
+  def writelines(self, chunks):
+    # chunks may be a whole page's worth (FlatDocument.write_html), so never join them.
+    for chunk in chunks:
+      self.write(chunk)
+
+  def flush(self):
+    """Encode and compare or write the buffered text."""
+    if self.pending:
+      data = "".join(self.pending).encode(self.encoding)
+      self.pending.clear()
+      self.pending_size = 0
+      self.write_bytes(data)
+
+  def write_bytes(self, data):
+    if self.pending:
+      self.flush()
+    if self.tmp is None:
+      if self.existing is not None and self.existing.read(len(data)) == data:
+        self.matched += len(data)
+        return
+      self.start_tmp()
+    self.tmp.write(data)
+
+  def start_tmp(self):
+    self.tmp = open(self.tmp_path, "wb")
+    if self.matched:
+      self.existing.seek(0)
+      remaining = self.matched
+      while remaining:
+        chunk = self.existing.read(min(COPY_CHUNK, remaining))
+        self.tmp.write(chunk)
+        remaining -= len(chunk)
+
+  def close(self):
+    """Finish the output, returning True if dest_path was replaced."""
+    self.flush()
+    if self.tmp is None and self.existing is not None and not self.existing.read(1):
+      self.existing.close()
+      self.changed = False
+      return False
+    if self.tmp is None:
+      self.start_tmp()
+    self.tmp.close()
+    if self.existing is not None:
+      self.existing.close()
+    os.replace(self.tmp_path, self.dest_path)
+    self.changed = True
+    return True
+
+  def discard(self):
+    if self.existing is not None:
+      self.existing.close()
+    if self.tmp is not None:
+      self.tmp.close()
+      os.remove(self.tmp_path)
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    if exc_type is None:
+      self.close()
+    else:
+      self.discard()
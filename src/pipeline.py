@@ -0,0 +1,117 @@
+import queue
+import threading
+from collections import deque
+
+DONE = object()
+FAILED = object()
+POLL_SECONDS = 0.1
+
+
+def run_pipeline(items, read, render, write, executor=None, depth=32):
+  """Run items through read, render and write stages that overlap.
+
+  read(item) runs on a reader thread and write(item, rendered) on a writer
+  thread, so file I/O on either side overlaps rendering. render(item, data)
+  runs on the calling thread, or in executor's workers if one is given (it
+  must then be picklable). The queues between stages, and the number of
+  renders in flight, hold at most depth items, so memory stays bounded
+  however many items there are. The first exception raised by any stage
+  stops the pipeline and is re-raised here.
+
+  Yields:
+      (item, result of write) for each item, in the order they are written.
+  """
+  stop = threading.Event()
+  read_queue = queue.Queue(depth)
+  write_queue = queue.Queue(depth)
+  done_queue = queue.Queue()
+
+  def put(target, value):
+    while not stop.is_set():
+      try:
+        target.put(value, timeout=POLL_SECONDS)
+        return
+      except queue.Full:
+        continue
+
+  def reader():
+    try:
+      for item in items:
+        if stop.is_set():
+          return
+        put(read_queue, (item, read(item)))
+    except BaseException as e:
+      put(read_queue, (FAILED, e))
+      return
+    put(read_queue, (DONE, None))
+
+  def writer():
+    while not stop.is_set():
+      try:
+        item, rendered = write_queue.get(timeout=POLL_SECONDS)
+      except queue.Empty:
+        continue
+      if item is DONE:
+        done_queue.put((DONE, None))
+        return
+      try:
+        done_queue.put((item, write(item, rendered)))
+      except BaseException as e:
+        done_queue.put((FAILED, e))
+        stop.set()
+        return
+
+  def completed(block=False):
+    while True:
+      try:
+        item, result = done_queue.get(block)
+      except queue.Empty:
+        return
+      if item is FAILED:
+        raise result
+      if item is DONE:
+        return
+      yield item, result
+
+  if executor is not None:
+    # A process pool forks its workers on the first submit. Do that before
+    # the reader and writer threads exist, so no worker is forked while one
+    # of them holds a lock.
+    executor.submit(int).result()
+
+  threads = [threading.Thread(target=reader, daemon=True), threading.Thread(target=writer, daemon=True)]
+  for thread in threads:
+    thread.start()
+
+  pending = deque()
+  try:
+    while True:
+      try:
+        item, data = read_queue.get(timeout=POLL_SECONDS)
+      except queue.Empty:
+        yield from completed()
+        continue
+      if item is FAILED:
+        raise data
+      if item is DONE:
+        break
+      if executor is None:
+        put(write_queue, (item, render(item, data)))
+      else:
+        pending.append((item, executor.submit(render, item, data)))
+        if len(pending) >= depth:
+          item, future = pending.popleft()
+          put(write_queue, (item, future.result()))
+      yield from completed()
+
+    while pending:
+      item, future = pending.popleft()
+      put(write_queue, (item, future.result()))
+    put(write_queue, (DONE, None))
+    yield from completed(block=True)
+  finally:
+    stop.set()
+    for _, future in pending:
+      future.cancel()
+    for thread in threads:
+      thread.join()
@@ -0,0 +1,124 @@
+import functools
+import json
+import os
+import threading
+import time
+
+import assets
+import template
+import util
+
+# (module or class, attribute, stage name, whether the first argument names a page,
+# as a path or a (source, output) pair)
+DEFAULT_STAGES = [
+  (util, "read_page_header", "read_header", False),
+  (util, "markdown_to_html_node", "markdown_to_html_node", False),
+  (util, "classify_lines", "classify_block", False),
+  (util, "block_lines_to_html_node", "convert_block", False),
+  (util, "lines_to_textnodes", "tokenize_inline", False),
+  (template.Template, "render_to", "render_and_write", False),
+  (util, "generate_page", "generate_page", True),
+  (util, "render_page_source", "render_page", True),
+  (assets, "place_file", "copy_file", False),
+  (util, "copy_files_from_to_directory", "copy_static", False),
+]
+
+
+class Profiler:
+  """Records wall time and call counts per build stage and per page.
+
+  Stages are timed by temporarily wrapping the module functions that
+  implement them, so nothing is measured unless a profiler is installed.
+  Stage times are inclusive: markdown_to_html_node contains the time of
+  classify_block and convert_block, which contains tokenize_inline. Recursive
+  calls are only timed at the outermost level. Stages running on several
+  threads at once (file copies) add up thread time, not wall time.
+  """
+  def __init__(self, stages=None):
+    self.stage_specs = DEFAULT_STAGES if stages is None else stages
+    self.stages = {}
+    self.pages = {}
+    self.counters = {}
+    self.patches = []
+    self.started = None
+    self.elapsed = 0.0
+
+  def wrap(self, owner, attribute, stage, per_page=False):
+    original = getattr(owner, attribute)
+    totals = self.stages.setdefault(stage, {"calls": 0, "seconds": 0.0})
+    active = threading.local()
+    lock = threading.Lock()
+
+    @functools.wraps(original)
+    def timed(*args, **kwargs):
+      if getattr(active, "running", False):
+        return original(*args, **kwargs)
+      active.running = True
+      start = time.perf_counter()
+      try:
+        return original(*args, **kwargs)
+      finally:
+        elapsed = time.perf_counter() - start
+        active.running = False
+        with lock:
+          totals["calls"] += 1
+          totals["seconds"] += elapsed
+          if per_page:
+            page = args[0][0] if isinstance(args[0], tuple) else args[0]
+            self.pages[os.path.relpath(page)] = elapsed
+
+    setattr(owner, attribute, timed)
+    self.patches.append((owner, attribute, original))
+
+  def install(self):
+    for owner, attribute, stage, per_page in self.stage_specs:
+      self.wrap(owner, attribute, stage, per_page)
+    self.started = time.perf_counter()
+
+  def uninstall(self):
+    if self.started is not None:
+      self.elapsed = time.perf_counter() - self.started
+    for owner, attribute, original in reversed(self.patches):
+      setattr(owner, attribute, original)
+    self.patches = []
+
+  def __enter__(self):
+    self.install()
+    return self
+
+  def __exit__(self, *exc_info):
+    self.uninstall()
+
+  def slowest_pages(self, top=10):
+    """Return the top (path, seconds) pairs, slowest first."""
+    return sorted(self.pages.items(), key=lambda item: item[1], reverse=True)[:top]
+
+  def to_dict(self, top=10):
+    return {
+      "total_seconds": self.elapsed,
+      "stages": self.stages,
+      "pages": self.pages,
+      "slowest_pages": [{"path": path, "seconds": seconds} for path, seconds in self.slowest_pages(top)],
+      "counters": self.counters,
+    }
+
+  def write_json(self, path, top=10):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+      json.dump(self.to_dict(top), f, indent=2, sort_keys=True)
+
+  def report(self, top=10):
+    """Format a human-readable table of stage timings and the slowest pages."""
+    lines = [f"Build profile ({self.elapsed:.3f}s total)", f"  {'stage':<24}{'calls':>10}{'seconds':>12}{'per call':>14}"]
+    for stage, totals in sorted(self.stages.items(), key=lambda item: item[1]["seconds"], reverse=True):
+      calls = totals["calls"]
+      per_call = totals["seconds"] / calls if calls else 0.0
+      lines.append(f"  {stage:<24}{calls:>10}{totals['seconds']:>12.4f}{per_call * 1000:>12.3f}ms")
+    for name, values in sorted(self.counters.items()):
+      lines.append(f"  {name}: " + ", ".join(f"{key}={value:.3g}" if isinstance(value, float) else f"{key}={value}" for key, value in values.items()))
+    slowest = self.slowest_pages(top)
+    if slowest:
+      lines.append(f"Slowest {len(slowest)} pages")
+      for path, seconds in slowest:
+        lines.append(f"  {seconds * 1000:10.3f}ms  {path}")
+    return "\n".join(lines)
@@ -0,0 +1,175 @@
+import functools
+import logging
+import os
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import util
+from assets import place_file
+from depgraph import DependencyGraph, output_key
+
+logger = logging.getLogger(__name__)
+
+
+def scan_tree(path):
+  """Map every file under path (or path itself, if a file) to its (mtime, size)."""
+  path = os.path.abspath(path)
+  if os.path.isfile(path):
+    stat = os.stat(path)
+    return {path: (stat.st_mtime_ns, stat.st_size)}
+
+  files = {}
+  for dirpath, _, filenames in os.walk(path):
+    for filename in filenames:
+      file_path = os.path.join(dirpath, filename)
+      try:
+        stat = os.stat(file_path)
+      except FileNotFoundError:
+        continue
+      files[file_path] = (stat.st_mtime_ns, stat.st_size)
+  return files
+
+
+def diff_snapshots(before, after):
+  """Return (changed or added paths, removed paths) between two scan_tree results."""
+  changed = [path for path, stat in after.items() if before.get(path) != stat]
+  removed = [path for path in before if path not in after]
+  return changed, removed
+
+
+class SiteWatcher:
+  """Keeps a site build in memory and re-renders only what changed.
+
+  The manifest and compiled template stay loaded between rebuilds. Each
+  poll stats content/, static/ and the template. Only the pages and assets
+  whose files changed are regenerated, copied or deleted; a template
+  change re-renders the pages the dependency graph says use it. With an
+  AST cache, those pages are re-rendered without being parsed again.
+  """
+  def __init__(self, manifest, basepath="/", content="content", static="static", template="template.html", dest="docs", ast_cache=None, graph=None):
+    self.manifest = manifest
+    self.basepath = basepath
+    self.content = os.path.abspath(content)
+    self.static = os.path.abspath(static)
+    self.template = os.path.abspath(template)
+    self.dest = os.path.abspath(dest)
+    self.ast_cache = ast_cache
+    self.graph = graph if graph is not None else DependencyGraph()
+    self.snapshot = {}
+
+  def scan(self):
+    snapshot = scan_tree(self.content)
+    snapshot.update(scan_tree(self.static))
+    snapshot.update(scan_tree(self.template))
+    return snapshot
+
+  def full_build(self):
+    self.snapshot = self.scan()
+    self.manifest.seen = set()
+    copied = util.copy_files_from_to_directory(self.static, self.dest, manifest=self.manifest)
+    generated = util.generate_pages_recursive(
+      self.content, self.template, self.dest, self.basepath, manifest=self.manifest, ast_cache=self.ast_cache, graph=self.graph
+    )
+    self.manifest.prune(self.dest)
+    self.save()
+    return generated + copied
+
+  def save(self):
+    self.manifest.save()
+    if self.graph.path is not None:
+      self.graph.save()
+    self.check()
+
+  def check(self):
+    """Log references to site paths that no output provides."""
+    outputs = {output_key(key, self.dest) for key in self.manifest.entries}
+    broken = self.graph.check(outputs)
+    for owner, target in broken:
+      logger.warning("Broken reference in %s: %s", owner, target)
+    return broken
+
+  def poll(self):
+    """Apply any changes made since the last poll.
+
+    Returns:
+        Number of outputs regenerated, copied or removed.
+    """
+    snapshot = self.scan()
+    changed, removed = diff_snapshots(self.snapshot, snapshot)
+    self.snapshot = snapshot
+    if not changed and not removed:
+      return 0
+
+    pages = set()
+    if self.template in changed:
+      self.graph.record_template(self.template)
+      pages.update(os.path.abspath(page) for page in self.graph.dependents(self.template))
+
+    updated = 0
+    for path in changed:
+      if path.startswith(self.content + os.sep) and path.endswith(".md"):
+        pages.add(path)
+      elif path.startswith(self.static + os.sep):
+        dest_path = os.path.join(self.dest, os.path.relpath(path, self.static))
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        place_file(path, dest_path)
+        self.manifest.record(path, dest_path)
+        updated += 1
+
+    config = util.page_config(self.template, self.basepath)
+    for path in sorted(pages):
+      if path not in snapshot:
+        continue
+      dest_path = util.page_output_path(path, self.content, self.dest)
+      try:
+        result = util.generate_page_job(path, self.template, dest_path, self.basepath, self.ast_cache)
+      except util.PageGenerationError as e:
+        logger.error("%s", e)
+        continue
+      self.manifest.record(path, dest_path, config, result.changed)
+      self.graph.record_page(path, dest_path, self.dest, self.template, result.urls)
+      updated += 1
+
+    for path in removed:
+      if path.startswith(self.content + os.sep) and path.endswith(".md"):
+        self.manifest.remove(util.page_output_path(path, self.content, self.dest), self.dest)
+        self.graph.remove_page(path)
+        updated += 1
+      elif path.startswith(self.static + os.sep):
+        self.manifest.remove(os.path.join(self.dest, os.path.relpath(path, self.static)), self.dest)
+        updated += 1
+
+    self.save()
+    return updated
+
+
+def serve(watcher, port=8888, watch=True, interval=0.2):
+  """Serve the build directory over HTTP, rebuilding on changes if watch is set."""
+  start = time.perf_counter()
+  watcher.full_build()
+  logger.info("Built site in %.2fs", time.perf_counter() - start)
+
+  handler = functools.partial(SimpleHTTPRequestHandler, directory=watcher.dest)
+  httpd = ThreadingHTTPServer(("", port), handler)
+  thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+  thread.start()
+  logger.info("Serving %s at http://localhost:%d%s", watcher.dest, port, watcher.basepath)
+
+  try:
+    while True:
+      time.sleep(interval)
+      if not watch:
+        continue
+      start = time.perf_counter()
+      try:
+        updated = watcher.poll()
+      except Exception as e:
+        logger.error("Rebuild failed: %s", e)
+        continue
+      if updated:
+        logger.info("Rebuilt %d outputs in %.1fms", updated, (time.perf_counter() - start) * 1000)
+  except KeyboardInterrupt:
+    pass
+  finally:
+    httpd.shutdown()
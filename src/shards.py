@@ -0,0 +1,136 @@
+import heapq
+import json
+import os
+
+from assets import is_in_sync, place_file
+
+SHARD_FILE = ".ssg-shard.json"
+SHARD_VERSION = 1
+
+
+def parse_shard(spec):
+  """Parse a shard spec such as "3/16" into (index, count), with index counted from 1."""
+  index, separator, count = spec.partition("/")
+  try:
+    index, count = int(index), int(count)
+  except ValueError:
+    raise ValueError(f"Invalid shard {spec!r}, expected INDEX/COUNT such as 3/16") from None
+  if not separator or count < 1 or not 1 <= index <= count:
+    raise ValueError(f"Invalid shard {spec!r}, expected INDEX/COUNT with 1 <= INDEX <= COUNT")
+  return index, count
+
+
+def partition_pages(pages, count, dir_path_content, index=None):
+  """Split (markdown path, html path) pairs into count lists of similar total source size.
+
+  Pages are taken largest first and each goes to the currently lightest
+  shard. Ties are broken by path, so every machine that sees the same
+  content tree computes the same partition, whatever order the files
+  were listed in. Sizes come from index (a DirectoryIndex) if given.
+  """
+  def size(path):
+    stat = index.stat(path) if index is not None else None
+    return stat[0] if stat is not None else os.path.getsize(path)
+
+  weighted = sorted(
+    (-size(from_path), os.path.relpath(from_path, dir_path_content).replace(os.sep, "/"), from_path, dest_path)
+    for from_path, dest_path in pages
+  )
+  shards = [[] for _ in range(count)]
+  loads = [(0, index) for index in range(count)]
+  for size, _, from_path, dest_path in weighted:
+    load, index = heapq.heappop(loads)
+    shards[index].append((from_path, dest_path))
+    heapq.heappush(loads, (load - size, index))
+  return shards
+
+
+def select_shard(pages, shard, dir_path_content, index=None):
+  """Return the pages that belong to shard, an (index, count) pair from parse_shard."""
+  number, count = shard
+  return partition_pages(pages, count, dir_path_content, index)[number - 1]
+
+
+def write_shard_file(dest_dir, shard, manifest, graph, site_index=None):
+  """Describe a shard build's partial output tree for merge_shards.
+
+  The shard's manifest entries are stored relative to dest_dir, together
+  with its dependency graph and site index entries.
+  """
+  dest_dir = os.path.abspath(dest_dir)
+  data = {
+    "version": SHARD_VERSION,
+    "shard": list(shard),
+    "outputs": {
+      os.path.relpath(os.path.abspath(key), dest_dir).replace(os.sep, "/"): entry
+      for key, entry in manifest.entries.items()
+    },
+    "graph": {"pages": graph.pages, "templates": graph.templates},
+    "site_index": site_index.pages if site_index is not None else None,
+  }
+  with open(os.path.join(dest_dir, SHARD_FILE), "w") as f:
+    json.dump(data, f, sort_keys=True)
+
+
+def load_shard_file(shard_dir):
+  try:
+    with open(os.path.join(shard_dir, SHARD_FILE), "r") as f:
+      data = json.load(f)
+  except (FileNotFoundError, json.JSONDecodeError) as e:
+    raise ValueError(f"{shard_dir} is not a shard build output: {e}") from e
+  if data.get("version") != SHARD_VERSION:
+    raise ValueError(f"{shard_dir} was built by an incompatible version")
+  return data
+
+
+def merge_shards(shard_dirs, dest_dir, manifest, graph, site_index=None, link_mode="copy"):
+  """Combine the partial output trees of every shard of a build into dest_dir.
+
+  Files are placed into dest_dir unless an identical copy is already
+  there, and the shards' manifest entries, graph edges and site index
+  entries are added to manifest, graph and site_index. Static files that
+  every shard copied must agree. Outputs in the manifest that no shard
+  produced are left for manifest.prune.
+
+  Raises:
+      ValueError: If a directory isn't a shard output, the shards come
+          from different splits or some are missing, or two shards
+          produced the same output from different sources.
+
+  Returns:
+      Number of files placed.
+  """
+  shards = [(shard_dir, load_shard_file(shard_dir)) for shard_dir in shard_dirs]
+  counts = {data["shard"][1] for _, data in shards}
+  if len(counts) != 1:
+    raise ValueError(f"Shards come from different splits: {sorted(counts)}")
+  count = counts.pop()
+  missing = sorted(set(range(1, count + 1)) - {data["shard"][0] for _, data in shards})
+  if missing:
+    raise ValueError(f"Missing shards of {count}: {', '.join(map(str, missing))}")
+
+  owners = {}
+  placed = 0
+  for shard_dir, data in shards:
+    for output, entry in data["outputs"].items():
+      key = os.path.relpath(os.path.join(dest_dir, output))
+      identity = (entry["source"], entry["hash"], entry["config"])
+      if key in owners and owners[key][1] != identity:
+        raise ValueError(f"Shards {owners[key][0]} and {data['shard'][0]} both produced {output} differently")
+      owners[key] = (data["shard"][0], identity)
+
+      src_path = os.path.join(shard_dir, output)
+      dest_path = os.path.join(dest_dir, output)
+      if not is_in_sync(src_path, dest_path):
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        place_file(src_path, dest_path, link_mode)
+        manifest.changed.add(key)
+        placed += 1
+      manifest.entries[key] = entry
+      manifest.seen.add(key)
+
+    graph.pages.update(data["graph"]["pages"])
+    graph.templates.update(data["graph"]["templates"])
+    if site_index is not None and data["site_index"] is not None:
+      site_index.pages.update(data["site_index"])
+  return placed
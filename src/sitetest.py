@@ -0,0 +1,47 @@
+"""Fixtures shared by the tests: file helpers and a throwaway site tree."""
+import os
+import tempfile
+import unittest
+
+TEMPLATE = "<title>{{ Title }}</title>{{ Content }}"
+
+
+def write(path, text):
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+  with open(path, "w") as f:
+    f.write(text)
+
+
+def read(path):
+  with open(path, "r") as f:
+    return f.read()
+
+
+class TempDirTestCase(unittest.TestCase):
+  """Runs each test with a fresh temporary directory at self.root."""
+  def setUp(self):
+    tmp = tempfile.TemporaryDirectory()
+    self.addCleanup(tmp.cleanup)
+    self.root = tmp.name
+
+
+class SiteTestCase(TempDirTestCase):
+  """Runs each test against a site under self.root.
+
+  self.content, self.static and self.dest are its content/, static/ and
+  docs/ directories, and self.template its template.html, holding
+  template_text. pages maps paths under content/ to the markdown written
+  there before each test.
+  """
+  template_text = TEMPLATE
+  pages = {}
+
+  def setUp(self):
+    super().setUp()
+    self.content = os.path.join(self.root, "content")
+    self.static = os.path.join(self.root, "static")
+    self.dest = os.path.join(self.root, "docs")
+    self.template = os.path.join(self.root, "template.html")
+    write(self.template, self.template_text)
+    for name, text in self.pages.items():
+      write(os.path.join(self.content, *name.split("/")), text)
@@ -0,0 +1,51 @@
+import contextlib
+import json
+import os
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode="w"):
+  """Open a temporary file beside path, and replace path with it once the block finishes.
+
+  Readers, including other worker processes, see the old file or the new
+  one, never a partial write. If the block raises, path is left alone and
+  the temporary file is removed.
+  """
+  os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+  tmp_path = f"{path}.{os.getpid()}.tmp"
+  try:
+    with open(tmp_path, mode) as f:
+      yield f
+    os.replace(tmp_path, path)
+  finally:
+    if os.path.exists(tmp_path):
+      os.remove(tmp_path)
+
+
+class JsonStore:
+  """Base for the build state kept as a versioned JSON file under .ssg-cache.
+
+  Subclasses set VERSION and FIELDS, the attributes stored in the file,
+  and take them after path in their constructor. A file that is missing,
+  unreadable or from another VERSION loads as an empty store, so a format
+  change just costs one full build.
+  """
+  VERSION = 1
+  FIELDS = ()
+
+  @classmethod
+  def load(cls, path):
+    """Load the store at path, or return an empty one if missing or outdated."""
+    try:
+      with open(path, "r") as f:
+        data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+      return cls(path)
+    if data.get("version") != cls.VERSION:
+      return cls(path)
+    return cls(path, *(data[field] for field in cls.FIELDS))
+
+  def save(self):
+    """Atomically write the store back to its path."""
+    with atomic_write(self.path) as f:
+      json.dump({"version": self.VERSION, **{field: getattr(self, field) for field in self.FIELDS}}, f, sort_keys=True)
@@ -0,0 +1,81 @@
+import functools
+import os
+import re
+
+from htmlnode import rebase_url
+
+SLOT_PATTERN = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+ROOT_URL_PATTERN = re.compile(r'\b(href|src)="(/[^"]*)"')
+
+
+def rewrite_root_urls(html, basepath):
+  """Point root-relative href and src attributes at basepath (and at fingerprinted assets).
+
+  Protocol-relative URLs (//cdn.example.com/...) are left alone, as in
+  node props.
+  """
+  if basepath == "/" and not getattr(basepath, "assets", None):
+    return html
+  return ROOT_URL_PATTERN.sub(lambda m: f'{m.group(1)}="{rebase_url(m.group(1), m.group(2), basepath)}"', html)
+
+
+class Template:
+  """An HTML template compiled into literal segments and named slots.
+
+  Slots are written as {{ Name }} and looked up case-insensitively, so
+  {{ Title }}, {{ Date }} or {{ Nav }} all work. The basepath is applied
+  to the literals once at compile time; node slot values get it
+  applied to their href and src attributes while they are serialized.
+  """
+  def __init__(self, literals, slots, basepath="/"):
+    self.literals = literals
+    self.slots = slots
+    self.basepath = basepath
+
+  @classmethod
+  def compile(cls, text, basepath="/"):
+    literals = []
+    slots = []
+    last_end = 0
+    for match in SLOT_PATTERN.finditer(text):
+      literals.append(rewrite_root_urls(text[last_end:match.start()], basepath))
+      slots.append(match.group(1).lower())
+      last_end = match.end()
+    literals.append(rewrite_root_urls(text[last_end:], basepath))
+    return cls(literals, slots, basepath)
+
+  def render_to(self, fp, context):
+    """Write the template to fp, filling slots from context.
+
+    Args:
+        fp: Text file object to write to.
+        context: Mapping of lowercase slot name to a string, or to
+            anything with write_html (an HTMLNode or FlatDocument).
+            Missing slots render as empty strings.
+    """
+    for literal, slot in zip(self.literals, self.slots):
+      fp.write(literal)
+      value = context.get(slot, "")
+      if isinstance(value, str):
+        fp.write(value)
+      else:
+        value.write_html(fp, self.basepath)
+    fp.write(self.literals[-1])
+
+
+@functools.lru_cache(maxsize=16)
+def compile_template_file(path, basepath, mtime_ns, assets_key=None):
+  with open(path, "r") as f:
+    return Template.compile(f.read(), basepath)
+
+
+def load_template(path, basepath="/"):
+  """Return the compiled template at path, compiling it at most once per version.
+
+  Cached per process, so every worker in a build compiles it once, and a
+  changed mtime invalidates the cached copy. A Basepath with fingerprinted
+  assets compares equal to the plain string, so its key is part of the
+  cache key too.
+  """
+  path = os.path.abspath(path)
+  return compile_template_file(path, basepath, os.stat(path).st_mtime_ns, getattr(basepath, "key", None))
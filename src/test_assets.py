@@ -0,0 +1,128 @@
+import os
+import unittest
+
+from assets import fingerprint_name, is_in_sync, place_file, sync_directory
+from manifest import Manifest
+from sitetest import TempDirTestCase, read, write
+
+
+class TestPlaceFile(TempDirTestCase):
+  def setUp(self):
+    super().setUp()
+    self.src = os.path.join(self.root, "src.css")
+    self.dest = os.path.join(self.root, "dest.css")
+    write(self.src, "body {}")
+    write(self.dest, "old contents")
+
+  def test_copy_is_independent(self):
+    place_file(self.src, self.dest, "copy")
+    self.assertEqual(read(self.dest), "body {}")
+    self.assertNotEqual(os.stat(self.src).st_ino, os.stat(self.dest).st_ino)
+
+  def test_hardlink_shares_inode(self):
+    place_file(self.src, self.dest, "hardlink")
+    self.assertEqual(os.stat(self.src).st_ino, os.stat(self.dest).st_ino)
+
+  def test_replaces_without_leaving_temporary_files(self):
+    for link_mode in ("copy", "hardlink", "hardlink", "reflink"):
+      place_file(self.src, self.dest, link_mode)
+      self.assertEqual(read(self.dest), "body {}")
+      self.assertEqual(sorted(os.listdir(self.root)), ["dest.css", "src.css"])
+
+  def test_reflink_preserves_contents_and_mtime(self):
+    for mode in ("reflink", "auto"):
+      place_file(self.src, self.dest, mode)
+      self.assertEqual(read(self.dest), "body {}")
+      self.assertEqual(os.stat(self.src).st_mtime_ns, os.stat(self.dest).st_mtime_ns)
+      self.assertTrue(is_in_sync(self.src, self.dest))
+
+
+class TestSyncDirectory(TempDirTestCase):
+  def setUp(self):
+    super().setUp()
+    self.static = os.path.join(self.root, "static")
+    self.docs = os.path.join(self.root, "docs")
+    for i in range(10):
+      write(os.path.join(self.static, "images", f"image{i}.png"), f"image {i}")
+    write(os.path.join(self.static, "index.css"), "body {}")
+
+  def test_copies_only_changed_files(self):
+    self.assertEqual(sync_directory(self.static, self.docs, workers=4), 11)
+    self.assertEqual(sync_directory(self.static, self.docs, workers=4), 0)
+    write(os.path.join(self.static, "index.css"), "body { margin: 0 }")
+    self.assertEqual(sync_directory(self.static, self.docs, workers=4), 1)
+    self.assertEqual(read(os.path.join(self.docs, "index.css")), "body { margin: 0 }")
+
+  def test_removes_files_without_source(self):
+    sync_directory(self.static, self.docs)
+    write(os.path.join(self.docs, "stray.txt"), "stray")
+    os.remove(os.path.join(self.static, "images", "image0.png"))
+    sync_directory(self.static, self.docs)
+    self.assertFalse(os.path.exists(os.path.join(self.docs, "stray.txt")))
+    self.assertFalse(os.path.exists(os.path.join(self.docs, "images", "image0.png")))
+
+  def test_verify_hash_catches_same_size_edits(self):
+    sync_directory(self.static, self.docs)
+    dest = os.path.join(self.docs, "index.css")
+    stat = os.stat(dest)
+    write(dest, "body [[")
+    os.utime(dest, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    self.assertEqual(sync_directory(self.static, self.docs), 0)
+    self.assertEqual(sync_directory(self.static, self.docs, verify_hash=True), 1)
+    self.assertEqual(read(dest), "body {}")
+
+  def test_with_manifest(self):
+    manifest = Manifest()
+    self.assertEqual(sync_directory(self.static, self.docs, manifest, link_mode="hardlink"), 11)
+    self.assertEqual(len(manifest.entries), 11)
+    manifest.seen = set()
+    self.assertEqual(sync_directory(self.static, self.docs, manifest, link_mode="hardlink"), 0)
+    self.assertEqual(len(manifest.seen), 11)
+
+  def test_fingerprinted_names(self):
+    self.assertEqual(fingerprint_name("images/tom.png", "66709e99abcdef"), "images/tom.66709e99.png")
+    self.assertEqual(fingerprint_name("LICENSE", "66709e99abcdef"), "LICENSE.66709e99")
+
+  def test_fingerprint(self):
+    manifest = Manifest()
+    assets = {}
+    self.assertEqual(sync_directory(self.static, self.docs, manifest, assets=assets), 22)
+    css = assets["index.css"]
+    self.assertRegex(css, r"^index\.[0-9a-f]{8}\.css$")
+    self.assertEqual(read(os.path.join(self.docs, css)), "body {}")
+    # The original name stays for references nothing rewrites, such as CSS url().
+    self.assertEqual(read(os.path.join(self.docs, "index.css")), "body {}")
+    self.assertEqual(len(assets), 11)
+
+    manifest.seen = set()
+    self.assertEqual(sync_directory(self.static, self.docs, manifest, assets=assets), 0)
+    self.assertEqual(assets["index.css"], css)
+
+    manifest.seen = set()
+    write(os.path.join(self.static, "index.css"), "body { margin: 0 }")
+    os.remove(os.path.join(self.static, "images", "image0.png"))
+    self.assertEqual(sync_directory(self.static, self.docs, manifest, assets=assets), 2)
+    self.assertNotEqual(assets["index.css"], css)
+    self.assertNotIn("images/image0.png", assets)
+    self.assertEqual(read(os.path.join(self.docs, "index.css")), "body { margin: 0 }")
+    # Old names are left for the manifest to prune.
+    removed = manifest.prune(self.docs)
+    self.assertEqual(len(removed), 3)
+    self.assertIn(os.path.relpath(os.path.join(self.docs, css)), removed)
+
+  def test_fingerprint_without_manifest_removes_old_names(self):
+    assets = {}
+    sync_directory(self.static, self.docs, assets=assets)
+    css = assets["index.css"]
+    write(os.path.join(self.static, "index.css"), "body { margin: 0 }")
+    sync_directory(self.static, self.docs, assets=assets)
+    self.assertFalse(os.path.exists(os.path.join(self.docs, css)))
+    self.assertTrue(os.path.exists(os.path.join(self.docs, assets["index.css"])))
+
+  def test_unknown_link_mode(self):
+    with self.assertRaises(ValueError):
+      sync_directory(self.static, self.docs, link_mode="symlink")
+
+
+if __name__ == "__main__":
+  unittest.main()
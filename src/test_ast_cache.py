@@ -0,0 +1,121 @@
+import os
+import unittest
+from unittest import mock
+
+import util
+from ast_cache import AstCache, decode_entry, encode_entry
+from manifest import Manifest
+from sitetest import SiteTestCase, read, write
+from util import generate_page, generate_pages_recursive, markdown_to_html_node
+
+
+PAGE = """---
+date: 2024-01-01
+---
+# Hello
+
+Some **bold** [link](/blog) and ![img](/images/a.png)
+
+- one
+- two
+"""
+
+
+class TestAstCache(SiteTestCase):
+  template_text = "<title>{{ Title }}</title>{{ Date }}{{ Content }}"
+  pages = {"index.md": PAGE, "blog/post.md": "# Post\n\nText with `code`\n"}
+
+  def setUp(self):
+    super().setUp()
+    self.cache = AstCache(os.path.join(self.root, "ast"))
+
+  def test_encode_decode_roundtrip(self):
+    document = markdown_to_html_node(PAGE.split("---\n", 2)[2], flat=True)
+    context, decoded = decode_entry(encode_entry({"title": "Hello"}, document))
+    self.assertEqual(context, {"title": "Hello"})
+    self.assertEqual(decoded.to_html("/base/"), document.to_html("/base/"))
+
+  def test_cached_output_matches_streamed(self):
+    src = os.path.join(self.content, "index.md")
+    streamed = os.path.join(self.root, "streamed.html")
+    generate_page(src, self.template, streamed, "/site/")
+    cached = os.path.join(self.root, "cached.html")
+    generate_page(src, self.template, cached, "/site/", self.cache)
+    generate_page(src, self.template, cached, "/site/", self.cache)
+    self.assertEqual(self.cache.hits, 1)
+    self.assertEqual(read(cached), read(streamed))
+    self.assertIn('href="/site/blog"', read(cached))
+
+  def test_large_sources_are_mapped(self):
+    src = os.path.join(self.content, "crlf.md")
+    with open(src, "wb") as f:
+      f.write(b"# Windows\r\n\r\nline one\r\nline two\r\n")
+    streamed = os.path.join(self.root, "streamed.html")
+    generate_page(src, self.template, streamed, "/")
+    mapped = os.path.join(self.root, "mapped.html")
+    with mock.patch.object(util, "MMAP_THRESHOLD", 1):
+      generate_page(src, self.template, mapped, "/", self.cache)
+      generate_page(src, self.template, mapped, "/", self.cache)
+    self.assertEqual(self.cache.hits, 1)
+    self.assertEqual(read(mapped), read(streamed))
+    self.assertIn("<p>line one line two</p>", read(mapped))
+
+  def test_oversized_sources_are_streamed(self):
+    src = os.path.join(self.content, "index.md")
+    streamed = os.path.join(self.root, "streamed.html")
+    generate_page(src, self.template, streamed, "/")
+    uncached = os.path.join(self.root, "uncached.html")
+    with mock.patch.object(util, "AST_CACHE_MAX_SOURCE", 1):
+      with mock.patch.object(util, "load_parsed_page", side_effect=AssertionError("parsed into a FlatDocument")):
+        generate_page(src, self.template, uncached, "/", self.cache)
+    self.assertEqual(read(uncached), read(streamed))
+
+  def test_template_change_skips_parsing(self):
+    generate_pages_recursive(self.content, self.template, self.dest, "/", ast_cache=self.cache)
+    write(self.template, "<h1>{{ Title }}</h1>{{ Content }}")
+    with mock.patch.object(util, "markdown_to_html_node", side_effect=AssertionError("parsed again")):
+      generate_pages_recursive(self.content, self.template, self.dest, "/other/", ast_cache=self.cache)
+    self.assertEqual(self.cache.hits, 2)
+    self.assertTrue(read(os.path.join(self.dest, "index.html")).startswith("<h1>Hello</h1><div>"))
+
+  def test_changed_source_misses(self):
+    src = os.path.join(self.content, "blog", "post.md")
+    dest = os.path.join(self.dest, "post.html")
+    generate_page(src, self.template, dest, "/", self.cache)
+    write(src, "# Post\n\nNew text\n")
+    generate_page(src, self.template, dest, "/", self.cache)
+    self.assertEqual((self.cache.hits, self.cache.misses), (0, 2))
+    self.assertIn("<p>New text</p>", read(dest))
+
+  def test_prune_keeps_only_current_sources(self):
+    manifest = Manifest()
+    generate_pages_recursive(self.content, self.template, self.dest, "/", manifest=manifest, ast_cache=self.cache)
+    write(os.path.join(self.content, "blog", "post.md"), "# Post\n\nEdited\n")
+    generate_pages_recursive(self.content, self.template, self.dest, "/", manifest=manifest, ast_cache=self.cache)
+    self.assertEqual(self.cache.prune(entry["hash"] for entry in manifest.entries.values()), 1)
+
+    # What's left is exactly what the next build needs.
+    generate_pages_recursive(self.content, self.template, self.dest, "/other/", manifest=manifest, ast_cache=self.cache)
+    self.assertEqual(self.cache.misses, 3)
+    self.assertEqual(self.cache.hits, 2)
+
+  def test_corrupt_entry_is_reparsed(self):
+    src = os.path.join(self.content, "blog", "post.md")
+    with open(src, "rb") as f:
+      key = self.cache.key(f.read())
+    write(self.cache.path_for(key), "garbage")
+    dest = os.path.join(self.dest, "post.html")
+    with self.assertLogs("ast_cache", level="WARNING"):
+      generate_page(src, self.template, dest, "/", self.cache)
+    self.assertIn("<code>code</code>", read(dest))
+
+  def test_parallel_workers_share_cache(self):
+    generate_pages_recursive(self.content, self.template, self.dest, "/", jobs=2, ast_cache=self.cache)
+    expected = read(os.path.join(self.dest, "index.html"))
+    generate_pages_recursive(self.content, self.template, self.dest, "/", jobs=2, ast_cache=self.cache)
+    self.assertEqual(read(os.path.join(self.dest, "index.html")), expected)
+    self.assertEqual(len(os.listdir(self.cache.directory)), 2)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,49 @@
+import os
+import tempfile
+import unittest
+
+from bench import CorpusGenerator, find_missed_targets, find_regressions, parse_block_mix
+from util import extract_title, generate_pages_recursive, markdown_to_html_node
+
+
+class TestCorpusGenerator(unittest.TestCase):
+  def test_documents_parse(self):
+    generator = CorpusGenerator(inline_density=0.5, seed=7)
+    for i in range(20):
+      document = generator.document(f"Doc {i}")
+      self.assertEqual(extract_title(document), f"Doc {i}")
+      self.assertTrue(markdown_to_html_node(document).to_html().startswith("<div><h1>"))
+
+  def test_same_seed_same_corpus(self):
+    self.assertEqual(CorpusGenerator(seed=3).document(), CorpusGenerator(seed=3).document())
+
+  def test_block_mix(self):
+    generator = CorpusGenerator(block_mix=parse_block_mix("code=1"), blocks_per_page=5)
+    html = markdown_to_html_node(generator.document()).to_html()
+    self.assertEqual(html.count("<pre>"), 5)
+
+  def test_write_site_builds(self):
+    with tempfile.TemporaryDirectory() as root:
+      CorpusGenerator(blocks_per_page=5).write_site(root, pages=12, depth=2, assets=3)
+      generated = generate_pages_recursive(
+        os.path.join(root, "content"), os.path.join(root, "template.html"), os.path.join(root, "docs"), "/"
+      )
+      self.assertEqual(generated, 12)
+      self.assertEqual(len(os.listdir(os.path.join(root, "static", "images"))), 3)
+
+
+class TestFindRegressions(unittest.TestCase):
+  def test_flags_drops_beyond_threshold(self):
+    previous = {"metrics": {"a": 100.0, "b": 100.0, "c": 100.0}}
+    current = {"metrics": {"a": 95.0, "b": 80.0, "c": 120.0, "d": 1.0}}
+    self.assertEqual(find_regressions(previous, current, threshold=0.1), [("b", 100.0, 80.0)])
+
+
+class TestFindMissedTargets(unittest.TestCase):
+  def test_flags_metrics_below_target(self):
+    result = {"metrics": {"a": 90.0, "b": 200.0}}
+    self.assertEqual(find_missed_targets(result, {"a": 100.0, "b": 100.0, "c": 1.0}), [("a", 100.0, 90.0)])
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,122 @@
+import re
+import unittest
+
+import util
+from ast_cache import AstCache
+from blocks import BlockHandler
+from htmlnode import LeafNode, ParentNode
+from util import BlockType, block_lines_to_html_node, block_to_html_node, markdown_to_html_node
+
+
+class TableHandler(BlockHandler):
+  block_type = "table"
+  first_chars = "|"
+
+  def __init__(self):
+    self.calls = 0
+
+  def match(self, lines):
+    self.calls += 1
+    if not all(line.startswith("|") and line.endswith("|") for line in lines):
+      return None
+    return [[cell.strip() for cell in line.strip("|").split("|")] for line in lines]
+
+  def to_html_node(self, lines, rows):
+    return ParentNode("table", [ParentNode("tr", [LeafNode("td", cell) for cell in row]) for row in rows])
+
+
+class NoteHandler(BlockHandler):
+  block_type = "note"
+
+  def match(self, lines):
+    return True if lines[0] == "!!! note" else None
+
+  def to_html_node(self, lines, match):
+    return ParentNode("aside", children=util.lines_to_children(lines[1:]))
+
+
+class TestBlockRegistry(unittest.TestCase):
+  def setUp(self):
+    self.registered = []
+
+  def tearDown(self):
+    for handler in self.registered:
+      util.BLOCK_HANDLERS.unregister(handler)
+
+  def register(self, handler, first=False):
+    util.register_block_handler(handler, first)
+    self.registered.append(handler)
+    return handler
+
+  def test_builtin_blocks_keep_their_match(self):
+    blocks = list(util.iter_blocks(["# Title", "", "1. one", "2. two", "", "plain"]))
+    self.assertEqual([block.match for block in blocks], [1, [3, 3], True])
+
+  def test_custom_block_type(self):
+    table = self.register(TableHandler())
+    html = markdown_to_html_node("| a | b |\n| c | d |\n\n# Heading\n\nSome text").to_html()
+    self.assertEqual(
+      html,
+      "<div><table><tr><td>a</td><td>b</td></tr><tr><td>c</td><td>d</td></tr></table>"
+      "<h1>Heading</h1><p>Some text</p></div>",
+    )
+    # Only the block starting with "|" was offered to the table handler.
+    self.assertEqual(table.calls, 1)
+    self.assertEqual(util.block_type_from_lines(["| x |"]), "table")
+    self.assertEqual(repr(next(util.iter_blocks(["| x |"]))), "Block(table, ['| x |'])")
+
+  def test_unmatched_custom_block_falls_back_to_paragraph(self):
+    self.register(TableHandler())
+    self.assertEqual(markdown_to_html_node("| not a table").to_html(), "<div><p>| not a table</p></div>")
+
+  def test_handler_for_any_first_char(self):
+    self.register(NoteHandler())
+    html = markdown_to_html_node("!!! note\nMind **this**\n\n- item").to_html()
+    self.assertEqual(html, "<div><aside>Mind <b>this</b></aside><ul><li>item</li></ul></div>")
+
+  def test_first_overrides_builtin(self):
+    class LoudHeading(util.HeadingHandler):
+      def to_html_node(self, lines, level):
+        return LeafNode(f"h{level}", lines[0].lstrip("# ").upper())
+
+    self.register(LoudHeading(), first=True)
+    self.assertEqual(markdown_to_html_node("## quiet").to_html(), "<div><h2>QUIET</h2></div>")
+
+  def test_override_converts_only_its_own_matches(self):
+    class AnchoredHeading(util.HeadingHandler):
+      def match(self, lines):
+        found = re.match(r"^(#{1,6}) (.*) \{#([\w-]+)\}$", lines[0])
+        return found.groups() if len(lines) == 1 and found else None
+
+      def to_html_node(self, lines, match):
+        hashes, text, anchor = match
+        return LeafNode(f"h{len(hashes)}", text, {"id": anchor})
+
+    self.register(AnchoredHeading(), first=True)
+    self.assertEqual(
+      markdown_to_html_node("## x {#id}\n\n## plain").to_html(),
+      '<div><h2 id="id">x</h2><h2>plain</h2></div>',
+    )
+    self.assertEqual(markdown_to_html_node("## plain", flat=True).to_html(), "<div><h2>plain</h2></div>")
+
+  def test_unregister_restores_builtins(self):
+    handler = self.register(TableHandler())
+    util.BLOCK_HANDLERS.unregister(handler)
+    self.registered.remove(handler)
+    self.assertEqual(util.block_type_from_lines(["| a |"]), BlockType.PARAGRAPH)
+    self.assertIsNone(block_lines_to_html_node("table", ["| a |"]))
+
+  def test_forced_type_must_match(self):
+    self.assertEqual(block_to_html_node("> quoted", BlockType.QUOTE).to_html(), "<blockquote>quoted</blockquote>")
+    with self.assertRaises(ValueError):
+      block_to_html_node("not a heading", BlockType.HEADING)
+
+  def test_registry_is_part_of_ast_cache_key(self):
+    cache = AstCache("unused")
+    before = cache.key(b"# Page")
+    self.register(TableHandler())
+    self.assertNotEqual(cache.key(b"# Page"), before)
+
+
+if __name__ == "__main__":
+  unittest.main()
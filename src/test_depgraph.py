@@ -0,0 +1,101 @@
+import os
+import unittest
+
+from depgraph import DependencyGraph, url_target
+from htmlnode import Basepath, LeafNode, ParentNode
+from manifest import Manifest
+from sitetest import SiteTestCase
+from util import generate_pages_recursive, markdown_to_html_node
+
+
+class TestUrls(unittest.TestCase):
+  def test_url_target(self):
+    self.assertEqual(url_target("/blog/tom#top"), "blog/tom")
+    self.assertEqual(url_target("/images/a.png?v=2"), "images/a.png")
+    self.assertEqual(url_target("/"), "")
+    self.assertIsNone(url_target("https://www.boot.dev"))
+    self.assertIsNone(url_target("//cdn.example.com/a.js"))
+    self.assertIsNone(url_target("relative.html"))
+
+  def test_node_and_flat_urls_match(self):
+    markdown = "[a](/a) and ![b](/b.png)\n\n- [c](https://c.example)"
+    self.assertEqual(list(markdown_to_html_node(markdown).iter_urls()), ["/a", "/b.png", "https://c.example"])
+    self.assertEqual(list(markdown_to_html_node(markdown, flat=True).iter_urls()), ["/a", "/b.png", "https://c.example"])
+
+  def test_iter_urls_reads_props_before_rebasing(self):
+    node = ParentNode("p", [LeafNode("a", "x", {"href": "/x", "title": "t"}), LeafNode(None, "y")])
+    self.assertEqual(list(node.iter_urls()), ["/x"])
+
+
+class TestDependencyGraph(SiteTestCase):
+  template_text = '<link href="/index.css"><title>{{ Title }}</title>{{ Content }}'
+  pages = {
+    "index.md": "# Home\n\n[post](/blog/post) ![logo](/images/logo.png) [gone](/missing)",
+    "blog/post.md": "# Post\n\n[home](/) [out](https://example.com)",
+  }
+
+  def setUp(self):
+    super().setUp()
+    self.graph = DependencyGraph(os.path.join(self.root, "deps.json"))
+    generate_pages_recursive(self.content, self.template, self.dest, "/", graph=self.graph)
+    self.index = os.path.join(self.content, "index.md")
+    self.post = os.path.join(self.content, "blog", "post.md")
+    self.outputs = {"index.html", "blog/post.html", "images/logo.png", "index.css"}
+
+  def test_records_edges(self):
+    entry = self.graph.pages[os.path.relpath(self.index)]
+    self.assertEqual(entry["output"], "index.html")
+    self.assertEqual(entry["template"], os.path.relpath(self.template))
+    self.assertEqual(entry["refs"], ["blog/post", "images/logo.png", "missing"])
+    self.assertEqual(self.graph.templates[os.path.relpath(self.template)], ["index.css"])
+
+  def test_check_finds_broken_references(self):
+    self.assertEqual(self.graph.check(self.outputs), [(os.path.relpath(self.index), "/missing")])
+    self.assertEqual(
+      self.graph.check({"index.html", "images/logo.png"}),
+      [
+        (os.path.relpath(self.index), "/blog/post"),
+        (os.path.relpath(self.index), "/missing"),
+        (os.path.relpath(self.template), "/index.css"),
+      ],
+    )
+
+  def test_dependents(self):
+    self.assertEqual(self.graph.dependents(self.template), sorted([os.path.relpath(self.index), os.path.relpath(self.post)]))
+    self.assertEqual(self.graph.dependents(os.path.join(self.root, "other.html")), [])
+
+  def test_removed_pages_are_dropped(self):
+    os.remove(self.post)
+    generate_pages_recursive(self.content, self.template, self.dest, "/", graph=self.graph)
+    self.assertEqual(list(self.graph.pages), [os.path.relpath(self.index)])
+
+  def test_pages_missing_from_graph_are_rendered(self):
+    manifest = Manifest(os.path.join(self.root, "manifest.json"))
+    generate_pages_recursive(self.content, self.template, self.dest, "/", manifest=manifest)
+    graph = DependencyGraph()
+    self.assertEqual(generate_pages_recursive(self.content, self.template, self.dest, "/", manifest=manifest, graph=graph), 2)
+    self.assertEqual(generate_pages_recursive(self.content, self.template, self.dest, "/", manifest=manifest, graph=graph), 0)
+
+  def test_fingerprinted_assets_rebuild_only_their_pages(self):
+    manifest = Manifest(os.path.join(self.root, "manifest.json"))
+    assets = {"images/logo.png": "images/logo.aaaaaaaa.png", "index.css": "index.11111111.css"}
+    self.assertEqual(generate_pages_recursive(self.content, self.template, self.dest, Basepath("/", assets), manifest=manifest, jobs=2, graph=self.graph), 2)
+    with open(os.path.join(self.dest, "index.html")) as f:
+      self.assertIn('<link href="/index.11111111.css"><title>Home</title><div><h1>Home</h1><p><a href="/blog/post">post</a> <img src="/images/logo.aaaaaaaa.png"', f.read())
+    self.assertEqual(generate_pages_recursive(self.content, self.template, self.dest, Basepath("/", assets), manifest=manifest, graph=self.graph), 0)
+    assets["images/logo.png"] = "images/logo.bbbbbbbb.png"
+    self.assertEqual(generate_pages_recursive(self.content, self.template, self.dest, Basepath("/", assets), manifest=manifest, graph=self.graph), 1)
+    # The template references the stylesheet, so every page changes with it.
+    assets["index.css"] = "index.22222222.css"
+    self.assertEqual(generate_pages_recursive(self.content, self.template, self.dest, Basepath("/", assets), manifest=manifest, graph=self.graph), 2)
+
+  def test_save_and_load(self):
+    self.graph.save()
+    loaded = DependencyGraph.load(self.graph.path)
+    self.assertEqual(loaded.pages, self.graph.pages)
+    self.assertEqual(loaded.templates, self.graph.templates)
+    self.assertEqual(DependencyGraph.load(os.path.join(self.root, "none.json")).pages, {})
+
+
+if __name__ == "__main__":
+  unittest.main()
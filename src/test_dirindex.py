@@ -0,0 +1,64 @@
+import os
+import unittest
+from unittest import mock
+
+from dirindex import DirectoryIndex
+from manifest import Manifest
+from sitetest import TempDirTestCase, write
+from util import collect_pages, generate_pages_recursive
+
+
+class TestDirectoryIndex(TempDirTestCase):
+  def setUp(self):
+    super().setUp()
+    self.addCleanup(os.chdir, os.getcwd())
+    os.chdir(self.root)
+    write(os.path.join("content", "index.md"), "# Home\n")
+    write(os.path.join("content", "blog", "post.md"), "# Post\n\ntext\n")
+    write(os.path.join("content", "blog", "notes.txt"), "not a page")
+    write(os.path.join("static", "index.css"), "body {}")
+
+  def test_scan_matches_walk(self):
+    index = DirectoryIndex.scan(["content", "static", "missing"])
+    walked = {
+      os.path.join(dirpath, name): [os.stat(os.path.join(dirpath, name)).st_size, os.stat(os.path.join(dirpath, name)).st_mtime_ns]
+      for root in ("content", "static") for dirpath, _, names in os.walk(root) for name in names
+    }
+    self.assertEqual(index.files, walked)
+    self.assertEqual(index.dirs["content"]["dirs"], ["blog"])
+    self.assertEqual(list(index.walk(os.path.abspath("content"))), [
+      (os.path.abspath("content"), ["index.md"]),
+      (os.path.join(os.path.abspath("content"), "blog"), ["notes.txt", "post.md"]),
+    ])
+
+  def test_collect_pages_from_index(self):
+    index = DirectoryIndex.scan(["content"])
+    self.assertEqual(sorted(collect_pages("content", "docs", index)), sorted(collect_pages("content", "docs")))
+
+  def test_unchanged_directories_are_not_listed_again(self):
+    path = os.path.join(self.root, "index.json")
+    DirectoryIndex.scan(["content", "static"], DirectoryIndex(path)).save()
+    write(os.path.join("content", "blog", "post.md"), "# Post\n\nedited in place, and longer\n")
+    with mock.patch("os.scandir", side_effect=AssertionError("listed again")):
+      index = DirectoryIndex.scan(["content", "static"], DirectoryIndex.load(path))
+    self.assertEqual(index.stat(os.path.join("content", "blog", "post.md"))[0], os.path.getsize(os.path.join("content", "blog", "post.md")))
+
+    # Adding a file changes its directory's mtime, so that one is listed again.
+    write(os.path.join("content", "blog", "new.md"), "# New\n")
+    stat = os.stat(os.path.join("content", "blog"))
+    os.utime(os.path.join("content", "blog"), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    index = DirectoryIndex.scan(["content", "static"], index)
+    self.assertIsNotNone(index.stat(os.path.join("content", "blog", "new.md")))
+
+  def test_build_uses_index_stats(self):
+    write(os.path.join(self.root, "template.html"), "{{ Content }}")
+    index = DirectoryIndex.scan(["content"])
+    manifest = Manifest()
+    self.assertEqual(generate_pages_recursive("content", "template.html", "docs", "/", manifest=manifest, index=index), 2)
+    with mock.patch("os.stat", wraps=os.stat) as stat:
+      self.assertEqual(generate_pages_recursive("content", "template.html", "docs", "/", manifest=manifest, index=index), 0)
+    self.assertFalse([call for call in stat.call_args_list if str(call.args[0]).endswith(".md")])
+
+
+if __name__ == "__main__":
+  unittest.main()
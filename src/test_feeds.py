@@ -0,0 +1,127 @@
+import json
+import os
+import unittest
+
+from feeds import SiteIndex, index_terms, page_url, search_shard
+from manifest import Manifest
+from sitetest import SiteTestCase, read, write
+from util import generate_pages_recursive
+
+
+class TestHelpers(unittest.TestCase):
+  def test_index_terms(self):
+    self.assertEqual(index_terms("The Hobbit, the *Élan* of a_b 42"), ["42", "hobbit", "of", "the", "élan"])
+
+  def test_search_shard(self):
+    self.assertEqual(search_shard("hobbit"), "ho")
+    self.assertEqual(search_shard("élan"), "_l")
+
+  def test_page_url(self):
+    self.assertEqual(page_url("index.html", "/site/"), "/site/")
+    self.assertEqual(page_url("blog/tom/index.html", "/site/"), "/site/blog/tom/")
+    self.assertEqual(page_url("about.html"), "/about.html")
+
+
+class TestSiteIndex(SiteTestCase):
+  pages = {
+    "index.md": "# Fan Club\n\nWelcome, hobbits",
+    "blog/tom/index.md": "---\ndate: 2024-03-01\ndescription: On Tom & Goldberry\n---\n# Tom\n\nTom Bombadil sings `hey dol`",
+    "blog/ring.md": "---\ndate: 2023-12-25\n---\n# Ring\n\nOne **ring** to rule them",
+  }
+
+  def setUp(self):
+    super().setUp()
+    self.index = SiteIndex(os.path.join(self.root, "site-index.json"))
+
+  def build(self, jobs=1, **kwargs):
+    manifest = Manifest()
+    generate_pages_recursive(self.content, self.template, self.dest, "/site/", manifest=manifest, jobs=jobs, site_index=self.index, **kwargs)
+    return self.index.write(self.dest, "/site/", "https://example.com/", search=True)
+
+  def test_records_metadata_and_terms(self):
+    self.build()
+    entry = self.index.pages[os.path.relpath(os.path.join(self.content, "blog", "tom", "index.md"))]
+    self.assertEqual(entry["output"], "blog/tom/index.html")
+    self.assertEqual(entry["metadata"], {"date": "2024-03-01", "description": "On Tom & Goldberry", "title": "Tom"})
+    self.assertEqual(entry["terms"], ["bombadil", "dol", "hey", "sings", "tom"])
+
+  def test_sitemap_and_feed(self):
+    self.build()
+    sitemap = read(os.path.join(self.dest, "sitemap.xml"))
+    self.assertIn("<loc>https://example.com/site/blog/tom/</loc>", sitemap)
+    self.assertIn("<loc>https://example.com/site/blog/ring.html</loc>", sitemap)
+    self.assertIn("<lastmod>2024-03-01</lastmod>", sitemap)
+
+    feed = read(os.path.join(self.dest, "feed.xml"))
+    self.assertIn("<title>Fan Club</title>", feed)
+    self.assertLess(feed.index("<title>Tom</title>"), feed.index("<title>Ring</title>"))
+    self.assertIn("<description>On Tom &amp; Goldberry</description>", feed)
+    self.assertIn("<pubDate>Fri, 01 Mar 2024 00:00:00 +0000</pubDate>", feed)
+    self.assertNotIn("Welcome", feed)
+
+  def test_search_index(self):
+    self.build()
+    search = os.path.join(self.dest, "search")
+    index = json.loads(read(os.path.join(search, "index.json")))
+    self.assertEqual([url for url, _ in index["pages"]], ["/site/", "/site/blog/ring.html", "/site/blog/tom/"])
+    self.assertIn("ri", index["shards"])
+    self.assertEqual(json.loads(read(os.path.join(search, "ri.json"))), {"ring": [1]})
+    self.assertEqual(json.loads(read(os.path.join(search, "to.json"))), {"to": [1], "tom": [2]})
+    self.assertEqual(sorted(os.listdir(search)), sorted(["index.json"] + [f"{shard}.json" for shard in index["shards"]]))
+
+  def test_same_results_with_ast_cache_and_workers(self):
+    from ast_cache import AstCache
+    self.build()
+    expected = dict(self.index.pages)
+    self.index = SiteIndex()
+    self.build(jobs=2, ast_cache=AstCache(os.path.join(self.root, "ast")))
+    self.assertEqual(self.index.pages, expected)
+    self.index = SiteIndex()
+    self.build(pipeline_depth=2)
+    self.assertEqual(self.index.pages, expected)
+
+  def test_incremental_builds_keep_skipped_pages_and_drop_stale_shards(self):
+    manifest = Manifest()
+    generate_pages_recursive(self.content, self.template, self.dest, "/", manifest=manifest, site_index=self.index)
+    self.index.write(self.dest, "/", search=True, manifest=manifest)
+    self.index.save()
+
+    os.remove(os.path.join(self.content, "blog", "ring.md"))
+    index = SiteIndex.load(self.index.path)
+    manifest.seen = set()
+    self.assertEqual(generate_pages_recursive(self.content, self.template, self.dest, "/", manifest=manifest, site_index=index), 0)
+    self.assertGreater(index.write(self.dest, "/", search=True, manifest=manifest), 0)
+    manifest.prune(self.dest)
+    self.assertEqual(len(index.pages), 2)
+    self.assertFalse(os.path.exists(os.path.join(self.dest, "search", "ri.json")))
+    self.assertFalse(os.path.exists(os.path.join(self.dest, "sitemap.xml")))
+    self.assertEqual(index.write(self.dest, "/", search=True), 0)
+
+  def test_pages_under_search_are_kept(self):
+    write(os.path.join(self.content, "search", "index.md"), "# Search\n\nFind things")
+    manifest = Manifest()
+    generate_pages_recursive(self.content, self.template, self.dest, "/", manifest=manifest, site_index=self.index)
+    self.index.write(self.dest, "/", "https://example.com", search=True, manifest=manifest)
+    manifest.prune(self.dest)
+    self.assertIn("Find things", read(os.path.join(self.dest, "search", "index.html")))
+
+    manifest.seen = set()
+    self.assertEqual(generate_pages_recursive(self.content, self.template, self.dest, "/", manifest=manifest, site_index=self.index), 0)
+
+
+  def test_outputs_are_pruned_once_no_longer_asked_for(self):
+    manifest = Manifest()
+    generate_pages_recursive(self.content, self.template, self.dest, "/", manifest=manifest, site_index=self.index)
+    self.index.write(self.dest, "/", "https://example.com", search=True, manifest=manifest)
+    self.assertEqual(len(manifest.prune(self.dest)), 0)
+    self.assertTrue(os.path.exists(os.path.join(self.dest, "feed.xml")))
+
+    # A build without --site-url and --search-index writes none of them.
+    manifest.seen = set()
+    generate_pages_recursive(self.content, self.template, self.dest, "/", manifest=manifest, site_index=self.index)
+    manifest.prune(self.dest)
+    self.assertEqual(sorted(os.listdir(self.dest)), ["blog", "index.html"])
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,68 @@
+import io
+import unittest
+
+from flat import CLOSE, LEAF, OPEN, FlatDocumentBuilder
+from htmlnode import LeafNode, ParentNode
+from template import Template
+from util import markdown_to_html_node
+
+MARKDOWN = """# Title
+
+A paragraph with **bold**, _italic_, `code`, a [link](/blog/post) and ![an image](/images/a.png).
+
+- one
+- [two](https://example.com)
+
+```
+code block
+```
+"""
+
+
+class TestFlatDocument(unittest.TestCase):
+  def test_matches_tree_html(self):
+    tree = markdown_to_html_node(MARKDOWN)
+    flat = markdown_to_html_node(MARKDOWN, flat=True)
+    self.assertEqual(flat.to_html(), tree.to_html())
+    self.assertEqual(flat.to_html("/site/"), tree.to_html("/site/"))
+
+  def test_to_node_roundtrip(self):
+    flat = markdown_to_html_node(MARKDOWN, flat=True)
+    self.assertEqual(flat.to_node().to_html(), markdown_to_html_node(MARKDOWN).to_html())
+
+  def test_arrays(self):
+    builder = FlatDocumentBuilder()
+    builder.append_node(ParentNode("p", [LeafNode(None, "Hi "), LeafNode("a", "there", {"href": "/x", "title": "t"})]))
+    flat = builder.build()
+    self.assertEqual(list(flat.kinds), [OPEN, LEAF, LEAF, CLOSE])
+    self.assertEqual([flat.names[tag] for tag in flat.tags], ["p", None, "a", "p"])
+    self.assertEqual(list(flat.iter_props()), [(2, {"href": "/x", "title": "t"})])
+    self.assertEqual(flat.to_html(), '<p>Hi <a href="/x" title="t">there</a></p>')
+
+  def test_invalid_nodes_raise(self):
+    with self.assertRaises(ValueError):
+      FlatDocumentBuilder().append_node(ParentNode("div", []))
+    with self.assertRaises(ValueError):
+      FlatDocumentBuilder().append_node(LeafNode("p", None))
+    with self.assertRaises(ValueError):
+      markdown_to_html_node("", flat=True)
+
+  def test_renders_in_template(self):
+    template = Template.compile("<main>{{ Content }}</main>", "/site/")
+    fp = io.StringIO()
+    template.render_to(fp, {"content": markdown_to_html_node("[home](/)", flat=True)})
+    self.assertEqual(fp.getvalue(), '<main><div><p><a href="/site/">home</a></p></div></main>')
+
+
+class TestCompactNodes(unittest.TestCase):
+  def test_nodes_have_no_instance_dict(self):
+    for node in (LeafNode("b", "x"), ParentNode("p", [LeafNode(None, "x")])):
+      self.assertFalse(hasattr(node, "__dict__"))
+
+  def test_tags_are_interned(self):
+    level = 2
+    self.assertIs(ParentNode(f"h{level}", []).tag, ParentNode("h2", []).tag)
+
+
+if __name__ == "__main__":
+  unittest.main()
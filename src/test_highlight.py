@@ -0,0 +1,98 @@
+import os
+import unittest
+from unittest import mock
+
+import highlight
+from highlight import PYTHON, HighlightCache, Lexer, highlight_tokens, register_lexer, set_highlight_cache
+from sitetest import TempDirTestCase
+from util import markdown_to_html_node
+
+
+class TestLexer(unittest.TestCase):
+  def test_tokens_cover_the_code(self):
+    code = 'def f(x):\n    return "a" + 1  # done\n'
+    tokens = PYTHON.tokenize(code)
+    self.assertEqual("".join(text for _, text in tokens), code)
+    self.assertIn(("k", "def"), tokens)
+    self.assertIn(("s", '"a"'), tokens)
+    self.assertIn(("m", "1"), tokens)
+    self.assertIn(("c", "# done"), tokens)
+
+  def test_earliest_token_wins(self):
+    self.assertEqual(PYTHON.tokenize('x = "a # b"'), [(None, "x = "), ("s", '"a # b"')])
+    self.assertEqual(PYTHON.tokenize("# 'quoted'"), [("c", "# 'quoted'")])
+
+  def test_keywords_inside_names_are_not_highlighted(self):
+    self.assertEqual(PYTHON.tokenize("define = format"), [(None, "define = format")])
+
+
+class TestCodeBlocks(unittest.TestCase):
+  def setUp(self):
+    highlight_tokens.cache_clear()
+
+  def test_language_class_and_escaping(self):
+    html = markdown_to_html_node("```python\nif a < b: pass\n```").to_html()
+    self.assertEqual(
+      html,
+      '<div><pre><code class="language-python"><span class="k">if</span> a &lt; b: '
+      '<span class="k">pass</span>\n</code></pre></div>',
+    )
+
+  def test_unknown_language_is_escaped_but_not_highlighted(self):
+    html = markdown_to_html_node("```brainfuck\n+[-->]\n```").to_html()
+    self.assertEqual(html, '<div><pre><code class="language-brainfuck">+[--&gt;]\n</code></pre></div>')
+
+  def test_unlabeled_block_is_unchanged(self):
+    html = markdown_to_html_node("```\nif a:\npass\n```").to_html()
+    self.assertEqual(html, "<div><pre><code>if a:\npass\n</code></pre></div>")
+
+  def test_register_lexer(self):
+    self.addCleanup(highlight.LEXERS.pop, "ini", None)
+    register_lexer(["INI"], Lexer([("na", r"^\w+(?= =)"), ("c", r";[^\n]*")]))
+    html = markdown_to_html_node("```ini\nname = value ; note\n```").to_html()
+    self.assertEqual(
+      html,
+      '<div><pre><code class="language-ini"><span class="na">name</span> = value '
+      '<span class="c">; note</span>\n</code></pre></div>',
+    )
+
+
+class TestHighlightCache(TempDirTestCase):
+  def setUp(self):
+    super().setUp()
+    highlight_tokens.cache_clear()
+    self.addCleanup(highlight_tokens.cache_clear)
+
+  def test_snippets_are_tokenized_once(self):
+    previous = set_highlight_cache(HighlightCache(self.root))
+    self.addCleanup(set_highlight_cache, previous)
+    expected = highlight_tokens("python", "return 1")
+
+    # A new build: the process cache is cold, but the disk cache has the tokens.
+    highlight_tokens.cache_clear()
+    cache = HighlightCache(self.root)
+    set_highlight_cache(cache)
+    with mock.patch.object(PYTHON, "tokenize", side_effect=AssertionError("tokenized again")):
+      self.assertEqual(highlight_tokens("python", "return 1"), expected)
+    self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+  def test_prune_drops_least_recently_used(self):
+    cache = HighlightCache(self.root)
+    for i, code in enumerate(["a", "b", "c"]):
+      key = cache.key("python", code)
+      cache.put(key, [[None, code]])
+      os.utime(cache.path_for(key), ns=(i, i))
+    cache.get(cache.key("python", "a"))
+    self.assertEqual(cache.prune(max_entries=2), 1)
+    self.assertIsNone(cache.get(cache.key("python", "b")))
+    self.assertIsNotNone(cache.get(cache.key("python", "a")))
+    self.assertIsNotNone(cache.get(cache.key("python", "c")))
+
+  def test_key_depends_on_language_and_code(self):
+    cache = HighlightCache(self.root)
+    keys = {cache.key("python", "x"), cache.key("python", "y"), cache.key("bash", "x")}
+    self.assertEqual(len(keys), 3)
+
+
+if __name__ == "__main__":
+  unittest.main()
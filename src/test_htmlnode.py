@@ -1,3 +1,4 @@
+import io
 import unittest
 
 from htmlnode import HTMLNode, LeafNode, ParentNode
@@ -66,4 +67,21 @@ class TestParentNode(unittest.TestCase):
     child2 = LeafNode("p", "Goodbye, world!")
     parent = ParentNode("div", children=[child1, child2])
     node = ParentNode("div", children=[parent])
-    self.assertEqual(node.to_html(), "<div><div><p>Hello, world!</p><p>Goodbye, world!</p></div></div>")
\ No newline at end of file
+    self.assertEqual(node.to_html(), "<div><div><p>Hello, world!</p><p>Goodbye, world!</p></div></div>")
+
+  def test_iter_html_streams_chunks(self):
+    node = ParentNode("ul", children=[LeafNode("li", "Item 1"), LeafNode("li", "Item 2")])
+    self.assertEqual(list(node.iter_html()), ["<ul>", "<li>Item 1</li>", "<li>Item 2</li>", "</ul>"])
+
+  def test_write_html_matches_to_html(self):
+    inner = ParentNode("p", children=[LeafNode(None, "Hello "), LeafNode("a", "link", props={"href": "/x"})])
+    node = ParentNode("div", children=[inner], props={"class": "content"})
+    fp = io.StringIO()
+    node.write_html(fp)
+    self.assertEqual(fp.getvalue(), node.to_html())
+    self.assertEqual(fp.getvalue(), '<div class="content"><p>Hello <a href="/x">link</a></p></div>')
+
+  def test_iter_html_no_children(self):
+    node = ParentNode("div", children=[])
+    with self.assertRaises(ValueError):
+      list(node.iter_html())
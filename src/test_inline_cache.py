@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+
+import util
+from inline_cache import InlineCache
+from util import markdown_to_html_node
+
+
+class TestInlineCache(unittest.TestCase):
+  def setUp(self):
+    self.previous = util.set_inline_cache(InlineCache(maxsize=8))
+
+  def tearDown(self):
+    util.set_inline_cache(self.previous)
+
+  def test_repeated_fragments_hit(self):
+    markdown = "Read the [docs](/docs) **now**\n\n- one\n- two\n\nRead the [docs](/docs) **now**"
+    util.inline_cache.hits = util.inline_cache.misses = 0
+    markdown_to_html_node(markdown)
+    self.assertEqual(util.inline_cache.hits, 1)
+    self.assertEqual(util.inline_cache.misses, 3)
+
+  def test_cached_output_matches_and_rebases(self):
+    markdown = "See [home](/index) and ![logo](/logo.png)\n\nSee [home](/index) and ![logo](/logo.png)"
+    cached = markdown_to_html_node(markdown).to_html("/site/")
+    util.set_inline_cache(None)
+    self.assertEqual(markdown_to_html_node(markdown).to_html("/site/"), cached)
+    self.assertIn('href="/site/index"', cached)
+
+  def test_errors_are_not_cached(self):
+    with self.assertRaises(ValueError):
+      markdown_to_html_node("unclosed **bold")
+    self.assertEqual(len(util.inline_cache), 0)
+
+  def test_evicts_least_recently_used(self):
+    cache = InlineCache(maxsize=2)
+    cache.put("a", (1,))
+    cache.put("b", (2,))
+    cache.get("a")
+    cache.put("c", (3,))
+    self.assertIsNone(cache.get("b"))
+    self.assertEqual(cache.get("a"), (1,))
+    self.assertEqual(cache.stats()["size"], 2)
+
+  def test_save_and_load(self):
+    with tempfile.TemporaryDirectory() as root:
+      path = os.path.join(root, "cache", "inline.pickle")
+      markdown_to_html_node("Some **bold** text")
+      util.inline_cache.save(path)
+      loaded = InlineCache.load(path)
+      self.assertEqual(len(loaded), 1)
+      util.set_inline_cache(loaded)
+      self.assertEqual(markdown_to_html_node("Some **bold** text").to_html(), "<div><p>Some <b>bold</b> text</p></div>")
+      self.assertEqual(loaded.hits, 1)
+
+  def test_load_missing_or_corrupt(self):
+    with tempfile.TemporaryDirectory() as root:
+      path = os.path.join(root, "inline.pickle")
+      self.assertEqual(len(InlineCache.load(path)), 0)
+      with open(path, "wb") as f:
+        f.write(b"not a pickle")
+      with self.assertLogs("inline_cache", level="WARNING"):
+        self.assertEqual(len(InlineCache.load(path)), 0)
+
+
+if __name__ == "__main__":
+  unittest.main()
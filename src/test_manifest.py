@@ -0,0 +1,156 @@
+import os
+import unittest
+from unittest import mock
+
+import highlight
+import util
+from highlight import Lexer
+from manifest import Manifest, hash_file
+from sitetest import SiteTestCase, TempDirTestCase, read, write
+from util import copy_files_from_to_directory, generate_pages_recursive
+
+
+class TestManifest(TempDirTestCase):
+  def setUp(self):
+    super().setUp()
+    self.src = os.path.join(self.root, "src.txt")
+    self.dest = os.path.join(self.root, "out", "dest.txt")
+    write(self.src, "hello")
+    write(self.dest, "hello")
+
+  def test_unknown_output_is_stale(self):
+    manifest = Manifest()
+    self.assertFalse(manifest.is_fresh(self.src, self.dest))
+
+  def test_recorded_output_is_fresh(self):
+    manifest = Manifest()
+    manifest.record(self.src, self.dest)
+    self.assertTrue(manifest.is_fresh(self.src, self.dest))
+
+  def test_changed_source_is_stale(self):
+    manifest = Manifest()
+    manifest.record(self.src, self.dest)
+    write(self.src, "hello, world")
+    self.assertFalse(manifest.is_fresh(self.src, self.dest))
+
+  def test_touched_source_with_same_content_is_fresh(self):
+    manifest = Manifest()
+    manifest.record(self.src, self.dest)
+    stat = os.stat(self.src)
+    os.utime(self.src, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    self.assertTrue(manifest.is_fresh(self.src, self.dest))
+
+  def test_changed_config_is_stale(self):
+    manifest = Manifest()
+    manifest.record(self.src, self.dest, config="a")
+    self.assertFalse(manifest.is_fresh(self.src, self.dest, config="b"))
+
+  def test_missing_output_is_stale(self):
+    manifest = Manifest()
+    manifest.record(self.src, self.dest)
+    os.remove(self.dest)
+    self.assertFalse(manifest.is_fresh(self.src, self.dest))
+
+  def test_save_and_load_roundtrip(self):
+    path = os.path.join(self.root, "cache", "manifest.json")
+    manifest = Manifest(path)
+    manifest.record(self.src, self.dest, config="a")
+    manifest.save()
+    loaded = Manifest.load(path)
+    self.assertEqual(manifest.entries, loaded.entries)
+    self.assertTrue(loaded.is_fresh(self.src, self.dest, config="a"))
+
+  def test_load_missing_file_is_empty(self):
+    manifest = Manifest.load(os.path.join(self.root, "missing.json"))
+    self.assertEqual(manifest.entries, {})
+
+  def test_prune_removes_unseen_outputs(self):
+    manifest = Manifest()
+    manifest.record(self.src, self.dest)
+    next_build = Manifest(entries=manifest.entries)
+    removed = next_build.prune(os.path.join(self.root, "out"))
+    self.assertEqual(removed, [os.path.relpath(self.dest)])
+    self.assertFalse(os.path.exists(self.dest))
+    self.assertTrue(os.path.isdir(os.path.join(self.root, "out")))
+    self.assertEqual(next_build.entries, {})
+
+
+class TestIncrementalBuild(SiteTestCase):
+  pages = {"index.md": "# Home\n\nWelcome", "blog/post.md": "# Post\n\nHello"}
+
+  def setUp(self):
+    super().setUp()
+    write(os.path.join(self.static, "index.css"), "body {}")
+
+  def build(self, manifest, basepath="/"):
+    manifest.seen = set()
+    copy_files_from_to_directory(self.static, self.dest, manifest=manifest)
+    generate_pages_recursive(self.content, self.template, self.dest, basepath, manifest=manifest)
+    manifest.prune(self.dest)
+
+  def test_unchanged_pages_are_skipped(self):
+    manifest = Manifest()
+    self.build(manifest)
+    post = os.path.join(self.dest, "blog", "post.html")
+    write(post, "untouched")
+    self.build(manifest)
+    self.assertEqual(read(post), "untouched")
+
+  def test_changed_page_is_regenerated(self):
+    manifest = Manifest()
+    self.build(manifest)
+    write(os.path.join(self.content, "blog", "post.md"), "# Post\n\nGoodbye")
+    self.build(manifest)
+    self.assertIn("Goodbye", read(os.path.join(self.dest, "blog", "post.html")))
+
+  def test_template_change_regenerates_pages(self):
+    manifest = Manifest()
+    self.build(manifest)
+    write(self.template, "<h1>{{ Title }}</h1>{{ Content }}")
+    self.build(manifest)
+    self.assertTrue(read(os.path.join(self.dest, "index.html")).startswith("<h1>Home</h1>"))
+
+  def test_basepath_change_regenerates_pages(self):
+    manifest = Manifest()
+    write(os.path.join(self.content, "index.md"), "# Home\n\n[post](/blog/post)")
+    self.build(manifest)
+    self.build(manifest, basepath="/site/")
+    self.assertIn('href="/site/blog/post"', read(os.path.join(self.dest, "index.html")))
+
+  def test_renderer_change_regenerates_pages(self):
+    manifest = Manifest()
+    write(os.path.join(self.content, "index.md"), "# Home\n\n```ini\nname = value\n```")
+    self.build(manifest)
+    index = os.path.join(self.dest, "index.html")
+    self.assertNotIn("<span", read(index))
+
+    # A new lexer changes the output of unchanged sources, so they aren't skipped.
+    self.addCleanup(highlight.LEXERS.pop, "ini", None)
+    highlight.register_lexer(["ini"], Lexer([("na", r"^\w+")]))
+    self.build(manifest)
+    self.assertIn('<span class="na">name</span>', read(index))
+
+    write(index, "untouched")
+    with mock.patch.object(util, "PARSER_VERSION", util.PARSER_VERSION + 1):
+      self.build(manifest)
+    self.assertNotEqual(read(index), "untouched")
+
+  def test_deleted_sources_are_pruned(self):
+    manifest = Manifest()
+    self.build(manifest)
+    os.remove(os.path.join(self.content, "blog", "post.md"))
+    os.remove(os.path.join(self.static, "index.css"))
+    self.build(manifest)
+    self.assertFalse(os.path.exists(os.path.join(self.dest, "blog")))
+    self.assertFalse(os.path.exists(os.path.join(self.dest, "index.css")))
+    self.assertTrue(os.path.exists(os.path.join(self.dest, "index.html")))
+
+  def test_assets_are_hashed_in_manifest(self):
+    manifest = Manifest()
+    self.build(manifest)
+    entry = manifest.entries[os.path.relpath(os.path.join(self.dest, "index.css"))]
+    self.assertEqual(entry["hash"], hash_file(os.path.join(self.static, "index.css")))
+
+
+if __name__ == "__main__":
+  unittest.main()
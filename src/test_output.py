@@ -0,0 +1,104 @@
+import os
+import unittest
+from unittest import mock
+
+import output
+from manifest import Manifest
+from output import OutputFile
+from sitetest import SiteTestCase, TempDirTestCase, read, write
+from util import generate_pages_recursive
+
+
+class TestOutputFile(TempDirTestCase):
+  def setUp(self):
+    super().setUp()
+    self.path = os.path.join(self.root, "page.html")
+
+  def render(self, *chunks):
+    with OutputFile(self.path) as f:
+      f.writelines(chunks)
+    self.assertEqual(os.listdir(self.root), ["page.html"])
+    return f.changed
+
+  def test_new_file(self):
+    self.assertTrue(self.render("<p>", "héllo", "</p>"))
+    self.assertEqual(read(self.path), "<p>héllo</p>")
+
+  def test_identical_output_is_not_rewritten(self):
+    self.render("<p>", "hello", "</p>")
+    inode = os.stat(self.path).st_ino
+    os.utime(self.path, ns=(1, 1))
+    self.assertFalse(self.render("<p>hel", "lo</p>"))
+    self.assertEqual(os.stat(self.path).st_mtime_ns, 1)
+    self.assertEqual(os.stat(self.path).st_ino, inode)
+
+  def test_changes_are_replaced_atomically(self):
+    self.render("<p>", "hello", "</p>")
+    inode = os.stat(self.path).st_ino
+    self.assertTrue(self.render("<p>", "help", "</p>"))
+    self.assertEqual(read(self.path), "<p>help</p>")
+    self.assertNotEqual(os.stat(self.path).st_ino, inode)
+
+  def test_longer_and_shorter_outputs(self):
+    self.render("<p>hello</p>")
+    self.assertTrue(self.render("<p>hello</p>", "<p>more</p>"))
+    self.assertEqual(read(self.path), "<p>hello</p><p>more</p>")
+    self.assertTrue(self.render("<p>hello</p>"))
+    self.assertEqual(read(self.path), "<p>hello</p>")
+
+  def test_error_leaves_existing_output(self):
+    self.render("<p>old</p>")
+    with self.assertRaises(RuntimeError):
+      with OutputFile(self.path) as f:
+        f.write("<p>new")
+        raise RuntimeError("render failed")
+    self.assertEqual(read(self.path), "<p>old</p>")
+    self.assertEqual(os.listdir(self.root), ["page.html"])
+
+  def test_small_buffer_compares_in_pieces(self):
+    with mock.patch.object(output, "WRITE_BUFFER", 4):
+      self.render("<p>", "hello", "</p>", "<p>", "world", "</p>")
+      os.utime(self.path, ns=(1, 1))
+      self.assertFalse(self.render("<p>hello</p>", "<p>", "world", "</p>"))
+      self.assertEqual(os.stat(self.path).st_mtime_ns, 1)
+      self.assertTrue(self.render("<p>hello</p>", "<p>", "wor", "ld!</p>"))
+    self.assertEqual(read(self.path), "<p>hello</p><p>world!</p>")
+
+  def test_writelines_streams_its_chunks(self):
+    buffered = []
+    with mock.patch.object(output, "WRITE_BUFFER", 8):
+      with OutputFile(self.path) as f:
+        def chunks():
+          for i in range(100):
+            buffered.append(f.pending_size)
+            yield "<p>x</p>"
+        f.writelines(chunks())
+    self.assertLess(max(buffered), 16)
+    self.assertEqual(read(self.path), "<p>x</p>" * 100)
+
+  def test_write_bytes_follows_buffered_text(self):
+    with OutputFile(self.path) as f:
+      f.write("<p>")
+      f.write_bytes("héllo".encode())
+      f.write("</p>")
+    self.assertEqual(read(self.path), "<p>héllo</p>")
+
+
+class TestUnchangedPages(SiteTestCase):
+  pages = {"a.md": "# A\n\nFirst", "b.md": "# B\n\nSecond"}
+
+  def test_rebuild_reports_and_skips_identical_pages(self):
+    generate_pages_recursive(self.content, self.template, self.dest, "/", manifest=Manifest())
+    os.utime(os.path.join(self.dest, "a.html"), ns=(1, 1))
+
+    # A template edit that doesn't change this page's output re-renders both pages.
+    write(self.template, "<title>{{ Title }}</title>{{ Content }}{{ Date }}")
+    write(os.path.join(self.content, "b.md"), "# B\n\nChanged")
+    manifest = Manifest()
+    self.assertEqual(generate_pages_recursive(self.content, self.template, self.dest, "/", manifest=manifest), 2)
+    self.assertEqual(manifest.changed, {os.path.relpath(os.path.join(self.dest, "b.html"))})
+    self.assertEqual(os.stat(os.path.join(self.dest, "a.html")).st_mtime_ns, 1)
+
+
+if __name__ == "__main__":
+  unittest.main()
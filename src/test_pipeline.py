@@ -0,0 +1,111 @@
+import os
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from pipeline import run_pipeline
+from sitetest import SiteTestCase, read, write
+from util import PageGenerationError, generate_pages_recursive
+
+
+class TestRunPipeline(unittest.TestCase):
+  def test_every_item_passes_through_each_stage(self):
+    written = []
+    results = list(run_pipeline(
+      range(50), lambda item: item * 2, lambda item, data: data + 1,
+      lambda item, rendered: written.append(rendered) or -rendered, depth=4,
+    ))
+    self.assertEqual(sorted(results), [(i, -(i * 2 + 1)) for i in range(50)])
+    self.assertEqual(written, [i * 2 + 1 for i in range(50)])
+
+  def test_with_executor(self):
+    with ThreadPoolExecutor(4) as executor:
+      results = run_pipeline(range(20), str, lambda item, data: data * 2, lambda item, rendered: rendered, executor, depth=3)
+      self.assertEqual(sorted(results), sorted((i, str(i) * 2) for i in range(20)))
+
+  def test_executor_starts_before_threads(self):
+    before = threading.active_count()
+    counts = []
+
+    class RecordingExecutor(ThreadPoolExecutor):
+      def submit(self, *args, **kwargs):
+        counts.append(threading.active_count())
+        return super().submit(*args, **kwargs)
+
+    with RecordingExecutor(2) as executor:
+      list(run_pipeline(range(5), str, lambda item, data: data, lambda item, rendered: rendered, executor, depth=2))
+    self.assertEqual(counts[0], before)
+
+  def test_reads_ahead_at_most_depth(self):
+    reads = []
+    lock = threading.Lock()
+    released = threading.Event()
+
+    def read_item(item):
+      with lock:
+        reads.append(item)
+      return item
+
+    def render(item, data):
+      released.wait()
+      return data
+
+    pipeline = run_pipeline(range(100), read_item, render, lambda item, rendered: rendered, depth=5)
+    thread = threading.Thread(target=lambda: list(pipeline))
+    thread.start()
+    threading.Event().wait(0.3)
+    # One item being rendered, depth queued and one blocked trying to enqueue.
+    self.assertLessEqual(len(reads), 5 + 2)
+    released.set()
+    thread.join()
+    self.assertEqual(len(reads), 100)
+
+  def test_errors_from_each_stage_propagate(self):
+    def fail_on_three(item, *args):
+      if item == 3:
+        raise ValueError("boom")
+      return item
+
+    identity = lambda item, data: data
+    for stages in [
+      (fail_on_three, identity, identity),
+      (lambda item: item, fail_on_three, identity),
+      (lambda item: item, identity, fail_on_three),
+    ]:
+      with self.assertRaisesRegex(ValueError, "boom"):
+        list(run_pipeline(range(10), *stages, depth=2))
+
+  def test_close_stops_threads(self):
+    before = threading.active_count()
+    pipeline = run_pipeline(range(1000), lambda item: item, lambda item, data: data, lambda item, rendered: rendered, depth=2)
+    next(pipeline)
+    pipeline.close()
+    self.assertEqual(threading.active_count(), before)
+
+
+class TestPipelinedPages(SiteTestCase):
+  pages = {f"dir{i % 3}/page{i}.md": f"# Page {i}\n\nSee [home](/) and **bold {i}**\n" for i in range(12)}
+
+  def outputs(self, dest):
+    return {
+      os.path.relpath(os.path.join(dirpath, name), dest): read(os.path.join(dirpath, name))
+      for dirpath, _, names in os.walk(dest) for name in names
+    }
+
+  def test_matches_sequential_build(self):
+    sequential = os.path.join(self.root, "sequential")
+    generate_pages_recursive(self.content, self.template, sequential, "/base/")
+    for jobs in (1, 2):
+      dest = os.path.join(self.root, f"pipelined{jobs}")
+      self.assertEqual(generate_pages_recursive(self.content, self.template, dest, "/base/", jobs=jobs, pipeline_depth=2), 12)
+      self.assertEqual(self.outputs(dest), self.outputs(sequential))
+
+  def test_page_error_names_the_page(self):
+    write(os.path.join(self.content, "broken.md"), "no title here")
+    with self.assertRaises(PageGenerationError) as cm:
+      generate_pages_recursive(self.content, self.template, os.path.join(self.root, "out"), "/", pipeline_depth=4)
+    self.assertTrue(cm.exception.path.endswith("broken.md"))
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,67 @@
+import json
+import os
+import tempfile
+import types
+import unittest
+
+import util
+from profiler import Profiler
+
+
+class TestProfiler(unittest.TestCase):
+  def test_wraps_and_restores_functions(self):
+    original = util.markdown_to_html_node
+    with Profiler() as profiler:
+      self.assertIsNot(util.markdown_to_html_node, original)
+      util.markdown_to_html_node("# Title\n\nSome **bold** text")
+    self.assertIs(util.markdown_to_html_node, original)
+    self.assertEqual(profiler.stages["markdown_to_html_node"]["calls"], 1)
+    self.assertEqual(profiler.stages["classify_block"]["calls"], 2)
+    self.assertEqual(profiler.stages["tokenize_inline"]["calls"], 2)
+    self.assertEqual(profiler.stages["generate_page"]["calls"], 0)
+
+  def test_recursive_calls_timed_once(self):
+    module = types.SimpleNamespace()
+    module.countdown = lambda n: n if n == 0 else module.countdown(n - 1)
+    with Profiler(stages=[(module, "countdown", "countdown", False)]) as profiler:
+      module.countdown(5)
+    self.assertEqual(profiler.stages["countdown"]["calls"], 1)
+
+  def test_per_page_times_and_report(self):
+    module = types.SimpleNamespace(render=lambda path: None)
+    with Profiler(stages=[(module, "render", "render", True)]) as profiler:
+      module.render("a.md")
+      module.render("b.md")
+    self.assertEqual(sorted(profiler.pages), ["a.md", "b.md"])
+    self.assertEqual(len(profiler.slowest_pages(1)), 1)
+    self.assertIn("Slowest 1 pages", profiler.report(top=1))
+
+  def test_pipeline_pages_are_timed(self):
+    with tempfile.TemporaryDirectory() as tmp:
+      template = os.path.join(tmp, "template.html")
+      with open(template, "w") as f:
+        f.write("{{ Content }}")
+      os.makedirs(os.path.join(tmp, "content"))
+      for name in ("a.md", "b.md"):
+        with open(os.path.join(tmp, "content", name), "w") as f:
+          f.write("# Page\n\ntext")
+      with Profiler() as profiler:
+        util.generate_pages_recursive(os.path.join(tmp, "content"), template, os.path.join(tmp, "docs"), "/", pipeline_depth=2)
+    self.assertEqual(profiler.stages["render_page"]["calls"], 2)
+    self.assertEqual(sorted(os.path.basename(path) for path in profiler.pages), ["a.md", "b.md"])
+
+  def test_write_json(self):
+    module = types.SimpleNamespace(render=lambda path: None)
+    with Profiler(stages=[(module, "render", "render", True)]) as profiler:
+      module.render("a.md")
+    with tempfile.TemporaryDirectory() as tmp:
+      path = os.path.join(tmp, "reports", "profile.json")
+      profiler.write_json(path)
+      with open(path) as f:
+        data = json.load(f)
+    self.assertEqual(data["stages"]["render"]["calls"], 1)
+    self.assertEqual(data["slowest_pages"][0]["path"], "a.md")
+
+
+if __name__ == "__main__":
+  unittest.main()
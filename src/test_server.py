@@ -0,0 +1,83 @@
+import os
+import unittest
+
+import sitetest
+from manifest import Manifest
+from server import SiteWatcher, diff_snapshots
+from sitetest import SiteTestCase, read
+
+
+def write(path, text):
+  existed = os.path.exists(path)
+  mtime = os.stat(path).st_mtime_ns if existed else None
+  sitetest.write(path, text)
+  if existed:
+    # Make sure the poll sees a new mtime even on coarse-grained filesystems.
+    os.utime(path, ns=(mtime + 10**9, mtime + 10**9))
+
+
+class TestDiffSnapshots(unittest.TestCase):
+  def test_diff(self):
+    before = {"a": (1, 1), "b": (1, 1), "c": (1, 1)}
+    after = {"a": (1, 1), "b": (2, 1), "d": (1, 1)}
+    self.assertEqual(diff_snapshots(before, after), (["b", "d"], ["c"]))
+
+
+class TestSiteWatcher(SiteTestCase):
+  pages = {"index.md": "# Home\n\nWelcome", "blog/post.md": "# Post\n\nHello"}
+
+  def setUp(self):
+    super().setUp()
+    write(os.path.join(self.static, "index.css"), "body {}")
+    self.watcher = SiteWatcher(
+      Manifest(os.path.join(self.root, "manifest.json")), "/", self.content, self.static, self.template, self.dest
+    )
+    self.watcher.full_build()
+
+  def test_no_changes(self):
+    self.assertEqual(self.watcher.poll(), 0)
+
+  def test_edit_rebuilds_only_that_page(self):
+    index = os.path.join(self.dest, "index.html")
+    write(index, "untouched")
+    write(os.path.join(self.content, "blog", "post.md"), "# Post\n\nGoodbye")
+    self.assertEqual(self.watcher.poll(), 1)
+    self.assertIn("Goodbye", read(os.path.join(self.dest, "blog", "post.html")))
+    self.assertEqual(read(index), "untouched")
+
+  def test_added_and_removed_pages(self):
+    write(os.path.join(self.content, "about.md"), "# About\n\nUs")
+    os.remove(os.path.join(self.content, "blog", "post.md"))
+    self.assertEqual(self.watcher.poll(), 2)
+    self.assertTrue(os.path.exists(os.path.join(self.dest, "about.html")))
+    self.assertFalse(os.path.exists(os.path.join(self.dest, "blog")))
+
+  def test_static_changes(self):
+    write(os.path.join(self.static, "index.css"), "body { margin: 0 }")
+    self.assertEqual(self.watcher.poll(), 1)
+    self.assertEqual(read(os.path.join(self.dest, "index.css")), "body { margin: 0 }")
+
+  def test_template_change_rebuilds_pages(self):
+    write(self.template, "<h1>{{ Title }}</h1>{{ Content }}")
+    self.assertEqual(self.watcher.poll(), 2)
+    self.assertTrue(read(os.path.join(self.dest, "blog", "post.html")).startswith("<h1>Post</h1>"))
+
+  def test_removed_link_target_is_reported(self):
+    write(os.path.join(self.content, "index.md"), "# Home\n\n[post](/blog/post)")
+    self.assertEqual(self.watcher.poll(), 1)
+    index = os.path.join(self.dest, "index.html")
+    write(index, "untouched")
+    os.remove(os.path.join(self.content, "blog", "post.md"))
+    with self.assertLogs("server", level="WARNING") as logs:
+      self.assertEqual(self.watcher.poll(), 1)
+    self.assertIn("/blog/post", logs.output[0])
+    self.assertEqual(read(index), "untouched")
+
+  def test_broken_page_is_skipped(self):
+    write(os.path.join(self.content, "blog", "post.md"), "no title")
+    with self.assertLogs("server", level="ERROR"):
+      self.assertEqual(self.watcher.poll(), 0)
+
+
+if __name__ == "__main__":
+  unittest.main()
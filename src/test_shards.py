@@ -0,0 +1,87 @@
+import os
+import random
+import unittest
+
+from depgraph import DependencyGraph
+from manifest import Manifest
+from shards import SHARD_FILE, merge_shards, parse_shard, partition_pages, write_shard_file
+from sitetest import SiteTestCase, TempDirTestCase, read, write
+from util import collect_pages, generate_pages_recursive
+
+
+class TestPartition(TempDirTestCase):
+  def setUp(self):
+    super().setUp()
+    self.content = os.path.join(self.root, "content")
+    rng = random.Random(5)
+    for i in range(40):
+      write(os.path.join(self.content, f"dir{i % 4}", f"page{i}.md"), f"# Page {i}\n\n" + "word " * rng.randint(1, 500))
+    self.pages = collect_pages(self.content, os.path.join(self.root, "docs"))
+
+  def test_parse_shard(self):
+    self.assertEqual(parse_shard("3/16"), (3, 16))
+    for spec in ("0/16", "17/16", "3", "a/b", "1/0"):
+      with self.assertRaises(ValueError):
+        parse_shard(spec)
+
+  def test_every_page_in_exactly_one_shard(self):
+    shards = partition_pages(self.pages, 6, self.content)
+    self.assertEqual(sorted(page for shard in shards for page in shard), sorted(self.pages))
+
+  def test_deterministic_regardless_of_order(self):
+    shuffled = list(self.pages)
+    random.Random(1).shuffle(shuffled)
+    self.assertEqual(
+      [sorted(shard) for shard in partition_pages(self.pages, 5, self.content)],
+      [sorted(shard) for shard in partition_pages(shuffled, 5, self.content)],
+    )
+
+  def test_balanced_by_size(self):
+    shards = partition_pages(self.pages, 4, self.content)
+    sizes = [sum(os.path.getsize(src) for src, _ in shard) for shard in shards]
+    largest_page = max(os.path.getsize(src) for src, _ in self.pages)
+    self.assertLessEqual(max(sizes) - min(sizes), largest_page)
+
+
+class TestMergeShards(SiteTestCase):
+  pages = {f"dir{i % 3}/page{i}.md": f"# Page {i}\n\n[next](/dir0/page{(i + 1) % 9})\n" for i in range(9)}
+
+  def build_shard(self, index, count):
+    dest = os.path.join(self.root, f"shard{index}of{count}")
+    manifest = Manifest()
+    graph = DependencyGraph()
+    generate_pages_recursive(self.content, self.template, dest, "/", manifest=manifest, graph=graph, shard=(index, count))
+    write_shard_file(dest, (index, count), manifest, graph)
+    return dest
+
+  def test_merged_shards_match_full_build(self):
+    full = os.path.join(self.root, "full")
+    generate_pages_recursive(self.content, self.template, full, "/")
+    shard_dirs = [self.build_shard(index, 3) for index in (1, 2, 3)]
+
+    dest = os.path.join(self.root, "docs")
+    manifest = Manifest()
+    graph = DependencyGraph()
+    self.assertEqual(merge_shards(shard_dirs, dest, manifest, graph), 9)
+    for src, out in collect_pages(self.content, full):
+      self.assertEqual(read(os.path.join(dest, os.path.relpath(out, full))), read(out))
+    self.assertEqual(len(manifest.entries), 9)
+    self.assertEqual(len(graph.pages), 9)
+    self.assertFalse(os.path.exists(os.path.join(dest, SHARD_FILE)))
+
+    # Identical outputs are not placed again.
+    self.assertEqual(merge_shards(shard_dirs, dest, Manifest(), DependencyGraph()), 0)
+
+  def test_missing_or_mismatched_shards(self):
+    first, second = self.build_shard(1, 3), self.build_shard(2, 3)
+    with self.assertRaisesRegex(ValueError, "Missing shards of 3: 3"):
+      merge_shards([first, second], os.path.join(self.root, "docs"), Manifest(), DependencyGraph())
+    other = self.build_shard(1, 1)
+    with self.assertRaisesRegex(ValueError, "different splits"):
+      merge_shards([first, other], os.path.join(self.root, "docs"), Manifest(), DependencyGraph())
+    with self.assertRaisesRegex(ValueError, "not a shard build output"):
+      merge_shards([self.content], os.path.join(self.root, "docs"), Manifest(), DependencyGraph())
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,47 @@
+import json
+import os
+import unittest
+
+from sitetest import TempDirTestCase
+from store import JsonStore, atomic_write
+
+
+class Pair(JsonStore):
+  VERSION = 2
+  FIELDS = ("left", "right")
+
+  def __init__(self, path=None, left=None, right=None):
+    self.path = path
+    self.left = left
+    self.right = right
+
+
+class TestStore(TempDirTestCase):
+  def setUp(self):
+    super().setUp()
+    self.path = os.path.join(self.root, "cache", "pair.json")
+
+  def test_atomic_write_failure_keeps_old_file(self):
+    with atomic_write(self.path) as f:
+      f.write("old")
+    with self.assertRaises(RuntimeError):
+      with atomic_write(self.path) as f:
+        f.write("partial")
+        raise RuntimeError("interrupted")
+    with open(self.path) as f:
+      self.assertEqual(f.read(), "old")
+    self.assertEqual(os.listdir(os.path.dirname(self.path)), ["pair.json"])
+
+  def test_roundtrip_and_outdated_versions(self):
+    Pair(self.path, {"a": 1}, [2]).save()
+    loaded = Pair.load(self.path)
+    self.assertEqual((loaded.left, loaded.right), ({"a": 1}, [2]))
+
+    with open(self.path, "w") as f:
+      json.dump({"version": 1, "left": "old", "right": "old"}, f)
+    self.assertIsNone(Pair.load(self.path).left)
+    self.assertIsNone(Pair.load(os.path.join(self.root, "missing.json")).left)
+
+
+if __name__ == "__main__":
+  unittest.main()
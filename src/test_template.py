@@ -0,0 +1,99 @@
+import io
+import os
+import tempfile
+import unittest
+
+from htmlnode import Basepath, LeafNode, ParentNode
+from template import Template, load_template
+
+
+def render(template, context):
+  fp = io.StringIO()
+  template.render_to(fp, context)
+  return fp.getvalue()
+
+
+class TestTemplate(unittest.TestCase):
+  def test_compile_splits_literals_and_slots(self):
+    template = Template.compile("<title>{{ Title }}</title><body>{{Content}}</body>")
+    self.assertEqual(template.literals, ["<title>", "</title><body>", "</body>"])
+    self.assertEqual(template.slots, ["title", "content"])
+
+  def test_render_fills_slots(self):
+    template = Template.compile("<title>{{ Title }}</title>{{ Content }}")
+    content = ParentNode("p", children=[LeafNode(None, "Hello")])
+    self.assertEqual(render(template, {"title": "Home", "content": content}), "<title>Home</title><p>Hello</p>")
+
+  def test_extra_slots_and_missing_slots(self):
+    template = Template.compile("<time>{{ Date }}</time><meta content=\"{{ Description }}\">")
+    self.assertEqual(render(template, {"date": "2024-01-01"}), "<time>2024-01-01</time><meta content=\"\">")
+
+  def test_basepath_applied_to_literals_at_compile_time(self):
+    template = Template.compile('<link href="/index.css"><img src="/logo.png">', "/site/")
+    self.assertEqual(template.literals, ['<link href="/site/index.css"><img src="/site/logo.png">'])
+
+  def test_protocol_relative_literals_are_not_rebased(self):
+    template = Template.compile('<script src="//cdn.example.com/a.js"></script><a href="/about">', "/site/")
+    self.assertEqual(template.literals, ['<script src="//cdn.example.com/a.js"></script><a href="/site/about">'])
+
+  def test_basepath_applied_to_node_urls(self):
+    template = Template.compile("{{ Content }}", "/site/")
+    content = ParentNode("p", children=[
+      LeafNode("a", "home", props={"href": "/blog"}),
+      LeafNode("a", "cdn", props={"href": "//cdn.example.com/x"}),
+      LeafNode("a", "out", props={"href": "https://example.com"}),
+      LeafNode(None, 'literal href="/x"'),
+    ])
+    self.assertEqual(
+      render(template, {"content": content}),
+      '<p><a href="/site/blog">home</a><a href="//cdn.example.com/x">cdn</a>'
+      '<a href="https://example.com">out</a>literal href="/x"</p>',
+    )
+
+  def test_fingerprinted_assets(self):
+    basepath = Basepath("/", {"index.css": "index.3f9a1c0b.css", "images/tom.png": "images/tom.66709e99.png"})
+    template = Template.compile(
+      '<link href="/index.css?v=2"><a href="//cdn.example.com/index.css">{{ Content }}</a>', basepath
+    )
+    self.assertEqual(
+      template.literals, ['<link href="/index.3f9a1c0b.css?v=2"><a href="//cdn.example.com/index.css">', "</a>"]
+    )
+    content = ParentNode("p", children=[
+      LeafNode("img", "", props={"src": "/images/tom.png", "alt": "Tom"}),
+      LeafNode("a", "page", props={"href": "/images/tom.png#top"}),
+      LeafNode("a", "other", props={"href": "/blog"}),
+    ])
+    self.assertEqual(
+      render(template, {"content": content}),
+      '<link href="/index.3f9a1c0b.css?v=2"><a href="//cdn.example.com/index.css"><p>'
+      '<img src="/images/tom.66709e99.png" alt="Tom"></img><a href="/images/tom.66709e99.png#top">page</a>'
+      '<a href="/blog">other</a></p></a>',
+    )
+    self.assertEqual(
+      Template.compile('<img src="/images/tom.png">', Basepath("/site/", basepath.assets)).literals,
+      ['<img src="/site/images/tom.66709e99.png">'],
+    )
+
+
+class TestLoadTemplate(unittest.TestCase):
+  def test_cached_until_file_changes(self):
+    with tempfile.TemporaryDirectory() as tmp:
+      path = os.path.join(tmp, "template.html")
+      with open(path, "w") as f:
+        f.write("<b>{{ Title }}</b>")
+      first = load_template(path, "/")
+      self.assertIs(first, load_template(path, "/"))
+      self.assertIsNot(first, load_template(path, "/other/"))
+      fingerprinted = load_template(path, Basepath("/", {"a.css": "a.1234.css"}))
+      self.assertIsNot(first, fingerprinted)
+      self.assertIs(fingerprinted, load_template(path, Basepath("/", {"a.css": "a.1234.css"})))
+
+      with open(path, "w") as f:
+        f.write("<i>{{ Title }}</i>")
+      stat = os.stat(path)
+      os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+      self.assertEqual(load_template(path, "/").literals, ["<i>", "</i>"])
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -1,6 +1,11 @@
+import contextlib
+import io
+import os
+import random
 import unittest
 from util import *
 from textnode import TextNode, TextType
+from sitetest import SiteTestCase
 
 
 class TestUtil(unittest.TestCase):
@@ -431,7 +436,208 @@ class TestUtil(unittest.TestCase):
     self.assertEqual(result, "Title")
 
 
+class TestFrontMatter(unittest.TestCase):
+  def test_parses_front_matter(self):
+    metadata, body = parse_front_matter("---\ndate: 2024-05-01\nDescription: A post: with colons\n---\n# Title\n")
+    self.assertEqual(metadata, {"date": "2024-05-01", "description": "A post: with colons"})
+    self.assertEqual(body, "# Title\n")
 
+  def test_without_front_matter(self):
+    self.assertEqual(parse_front_matter("# Title"), ({}, "# Title"))
 
+  def test_unterminated_front_matter_is_content(self):
+    self.assertEqual(parse_front_matter("---\ndate: x\n# Title"), ({}, "---\ndate: x\n# Title"))
 
 
+class TestInlineTokenizer(unittest.TestCase):
+  FRAGMENTS = [
+    "plain words", "more text.", " ", "**bold**", "**two words**", "_italic_",
+    "`code`", "`x = 1`", "[link](https://boot.dev)", "[](https://example.com/empty)",
+    "![image](https://i.imgur.com/a.png)", "![](/images/blank.png)", "(parens)", "[brackets]",
+    "a * star", "!bang",
+  ]
+
+  def test_matches_multipass_output(self):
+    rng = random.Random(1234)
+    for _ in range(500):
+      lines = [
+        "".join(rng.choice(self.FRAGMENTS) for _ in range(rng.randint(1, 8)))
+        for _ in range(rng.randint(1, 3))
+      ]
+      text = "\n".join(lines)
+      self.assertListEqual(text_to_textnodes_multipass(text), text_to_textnodes(text), text)
+
+  def test_image_before_link(self):
+    nodes = text_to_textnodes("![alt](/a.png)[link](/b)")
+    self.assertListEqual([
+      TextNode("alt", TextType.IMAGE, "/a.png"),
+      TextNode("link", TextType.LINK, "/b"),
+    ], nodes)
+
+  def test_underscores_inside_urls_are_not_italic(self):
+    nodes = text_to_textnodes("See [docs](https://example.com/snake_case_page)")
+    self.assertListEqual([
+      TextNode("See ", TextType.TEXT),
+      TextNode("docs", TextType.LINK, "https://example.com/snake_case_page"),
+    ], nodes)
+
+  def test_code_span_keeps_delimiters(self):
+    nodes = text_to_textnodes("Run `a_b **c**` now")
+    self.assertListEqual([
+      TextNode("Run ", TextType.TEXT),
+      TextNode("a_b **c**", TextType.CODE),
+      TextNode(" now", TextType.TEXT),
+    ], nodes)
+
+  def test_unclosed_delimiter_raises(self):
+    with self.assertRaises(ValueError):
+      text_to_textnodes("This is **unclosed")
+
+  def test_lines_are_joined_with_spaces(self):
+    nodes = text_to_textnodes("one\n**two**")
+    self.assertListEqual([TextNode("one ", TextType.TEXT), TextNode("two", TextType.BOLD)], nodes)
+
+
+class TestBlockScanner(unittest.TestCase):
+  def test_iter_blocks_from_file(self):
+    f = io.StringIO("# Title\n\n  Some text\nmore text  \n\n\n\n- a\n- b\n   \n1. one\n2. two\n")
+    self.assertListEqual([
+      Block(BlockType.HEADING, ["# Title"]),
+      Block(BlockType.PARAGRAPH, ["Some text", "more text"]),
+      Block(BlockType.UNORDERED_LIST, ["- a", "- b"]),
+      Block(BlockType.ORDERED_LIST, ["1. one", "2. two"]),
+    ], list(iter_blocks(f)))
+
+  def test_matches_string_splitter(self):
+    md = "# Title\n\nA **paragraph**\nwith lines\n\n> quote\n> more\n\n```\ncode\n```\n\n1. a\n3. b"
+    blocks = list(iter_blocks(md.split("\n")))
+    self.assertEqual(["\n".join(block.lines) for block in blocks], markdown_to_blocks(md))
+    self.assertEqual([block.block_type for block in blocks], [block_to_block_type(block) for block in markdown_to_blocks(md)])
+
+  def test_blocks_are_yielded_lazily(self):
+    consumed = []
+    def lines():
+      for i in range(1000):
+        consumed.append(i)
+        yield f"paragraph {i}\n"
+        yield "\n"
+    first = next(iter_blocks(lines()))
+    self.assertEqual(first.lines, ["paragraph 0"])
+    self.assertLess(len(consumed), 3)
+
+  def test_markdown_content_matches_tree(self):
+    md = "# Title\n\nSee [home](/) and **bold**\n\n- one\n- two\n"
+    fp = io.StringIO()
+    MarkdownContent(io.StringIO(md)).write_html(fp, "/site/")
+    self.assertEqual(fp.getvalue(), markdown_to_html_node(md).to_html("/site/"))
+
+  def test_read_page_header(self):
+    f = io.StringIO("---\ndate: today\n---\nintro\n\n# Title\n\nbody\n")
+    self.assertEqual(read_page_header(f, "page.md"), {"date": "today", "title": "Title"})
+    self.assertEqual(f.read(), "intro\n\n# Title\n\nbody\n")
+
+  def test_read_page_header_without_title(self):
+    with self.assertRaises(ValueError) as context:
+      read_page_header(io.StringIO("no title\n"), "page.md")
+    self.assertIn("page.md", str(context.exception))
+
+
+class TestMarkdownBatch(unittest.TestCase):
+  DOCUMENTS = [
+    "# Title\n\nSee [home](/) and **bold**",
+    "> a quote with ![img](/images/a.png)",
+    "- one\n- _two_\n\n1. three",
+    "```\ncode\n```",
+  ] * 5
+
+  def test_matches_markdown_to_html_node(self):
+    expected = [markdown_to_html_node(md).to_html("/site/") for md in self.DOCUMENTS]
+    self.assertEqual(markdown_to_html_batch(self.DOCUMENTS, "/site/"), expected)
+    self.assertEqual(markdown_to_html_batch(iter(self.DOCUMENTS), "/site/", jobs=2, chunksize=3), expected)
+
+  def test_streams_lazily(self):
+    consumed = []
+    def documents():
+      for i in range(100):
+        consumed.append(i)
+        yield f"item **{i}**"
+    stream = iter_markdown_html(documents())
+    self.assertEqual(next(stream), "<div><p>item <b>0</b></p></div>")
+    self.assertEqual(consumed, [0])
+
+  def test_parallel_streams_lazily(self):
+    consumed = []
+    def documents():
+      for i in range(100):
+        consumed.append(i)
+        yield f"item **{i}**"
+    stream = iter_markdown_html(documents(), jobs=2, chunksize=3)
+    self.assertEqual(next(stream), "<div><p>item <b>0</b></p></div>")
+    # At most jobs * 2 chunks are in flight.
+    self.assertEqual(len(consumed), 2 * 2 * 3)
+    self.assertEqual(list(stream)[-1], "<div><p>item <b>99</b></p></div>")
+    self.assertEqual(len(consumed), 100)
+
+  def test_errors_name_the_item(self):
+    for jobs in (1, 2):
+      with self.assertRaisesRegex(ValueError, "Markdown item 2: Unclosed delimiter"):
+        markdown_to_html_batch(["ok", "fine", "**broken", "ok"], jobs=jobs, chunksize=1)
+    with self.assertRaisesRegex(ValueError, "Markdown item 1: Parent nodes must have children"):
+      markdown_to_html_batch(["ok", "   "])
+
+
+class TestGeneratePages(SiteTestCase):
+  pages = {f"section{i}/index.md": f"# Page {i}\n\nSee [home](/) and **bold** text {i}." for i in range(6)}
+
+  def read_tree(self, root):
+    files = {}
+    for dirpath, _, filenames in os.walk(root):
+      for filename in filenames:
+        path = os.path.join(dirpath, filename)
+        with open(path) as f:
+          files[os.path.relpath(path, root)] = f.read()
+    return files
+
+  def test_parallel_build_matches_serial_build(self):
+    serial = os.path.join(self.root, "serial")
+    parallel = os.path.join(self.root, "parallel")
+    generate_pages_recursive(self.content, self.template, serial, "/site/")
+    generate_pages_recursive(self.content, self.template, parallel, "/site/", jobs=3)
+    self.assertEqual(len(self.read_tree(serial)), 6)
+    self.assertEqual(self.read_tree(serial), self.read_tree(parallel))
+
+  def test_errors_name_the_failing_page(self):
+    broken = os.path.join(self.content, "section3", "index.md")
+    with open(broken, "w") as f:
+      f.write("No title here")
+    for jobs in (1, 3):
+      with self.assertRaises(PageGenerationError) as context:
+        generate_pages_recursive(self.content, self.template, os.path.join(self.root, f"out{jobs}"), "/", jobs=jobs)
+      self.assertEqual(context.exception.path, broken)
+      self.assertIn(broken, str(context.exception))
+
+  def test_content_slot_used_twice(self):
+    from ast_cache import AstCache
+    with open(self.template, "w") as f:
+      f.write("<main>{{ Content }}</main><aside>{{ Content }}</aside>")
+    src = os.path.join(self.content, "section0", "index.md")
+    html = "<div><h1>Page 0</h1><p>See <a href=\"/\">home</a> and <b>bold</b> text 0.</p></div>"
+    expected = f"<main>{html}</main><aside>{html}</aside>"
+    outputs = {
+      "streamed": generate_page(src, self.template, os.path.join(self.root, "streamed.html"), "/"),
+      "cached": generate_page(src, self.template, os.path.join(self.root, "cached.html"), "/", AstCache(os.path.join(self.root, "ast"))),
+    }
+    for name, result in outputs.items():
+      with open(os.path.join(self.root, f"{name}.html")) as f:
+        self.assertEqual(f.read(), expected, name)
+      self.assertEqual(result.urls, ["/"], name)
+    piped = os.path.join(self.root, "piped")
+    generate_pages_recursive(self.content, self.template, piped, "/", pipeline_depth=2)
+    self.assertEqual(self.read_tree(piped)[os.path.join("section0", "index.html")], expected)
+
+  def test_build_is_silent_and_counts_pages(self):
+    stdout = io.StringIO()
+    with contextlib.redirect_stdout(stdout), self.assertNoLogs("util", level="INFO"):
+      generated = generate_pages_recursive(self.content, self.template, os.path.join(self.root, "out"), "/")
+    self.assertEqual(generated, 6)
+    self.assertEqual(stdout.getvalue(), "")
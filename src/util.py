@@ -1,9 +1,43 @@
 from htmlnode import LeafNode, HTMLNode, ParentNode
 from textnode import TextType, TextNode
+from manifest import hash_file, hash_text
+from template import load_template
+from assets import sync_directory
+from flat import FlatDocumentBuilder
+from blocks import BlockHandler, BlockRegistry
+from pipeline import run_pipeline
+from output import OutputFile
+from feeds import index_terms
+from depgraph import output_key
+from shards import select_shard
+from highlight import HIGHLIGHT_VERSION, LEXERS, highlight_tokens
+import io
+import mmap
 import re
 from enum import Enum
 import os
 import shutil
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import functools
+import html
+import itertools
+import logging
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_INTERVAL = 1000
+# Bump whenever the markdown parser's output changes; see renderer_signature.
+PARSER_VERSION = 3
+BATCH_CHUNK_SIZE = 256
+# Sources at least this large are mapped instead of read into memory.
+MMAP_THRESHOLD = 1 << 20
+# Sources larger than this bypass the AST cache and are streamed, since a
+# FlatDocument holds the whole parsed page in memory.
+AST_CACHE_MAX_SOURCE = 4 << 20
+
+# InlineCache shared by text_to_children and lines_to_children, or None.
+inline_cache = None
 
 
 def text_node_to_html_node(text_node):
@@ -113,7 +147,71 @@ def split_nodes_image(old_nodes):
 
   return new_nodes
 
+INLINE_PATTERN = re.compile(
+  r"!\[(?P<alt>[^\[\]]*)\]\((?P<src>[^\(\)]*)\)"
+  r"|\[(?P<anchor>[^\[\]]*)\]\((?P<href>[^\(\)]*)\)"
+  r"|\*\*(?P<bold>.*?)\*\*"
+  r"|_(?P<italic>.*?)_"
+  r"|`(?P<code>.*?)`"
+)
+UNCLOSED_DELIMITERS = ("**", "_", "`")
+
+
+def plain_text_node(text, line):
+  for delimiter in UNCLOSED_DELIMITERS:
+    if delimiter in text:
+      raise ValueError(f"Unclosed delimiter '{delimiter}' in text: {line}")
+  return TextNode(text, TextType.TEXT)
+
+
+def scan_inline(line, nodes):
+  """Append the TextNodes for one line of inline markdown to nodes.
+
+  Images, links, bold, italic and code spans are all matched by a single
+  precompiled pattern in one left-to-right pass; the leftmost span wins.
+  """
+  last_end = 0
+  for match in INLINE_PATTERN.finditer(line):
+    start = match.start()
+    if start > last_end:
+      nodes.append(plain_text_node(line[last_end:start], line))
+    kind = match.lastgroup
+    if kind == "src":
+      nodes.append(TextNode(match.group("alt"), TextType.IMAGE, match.group("src")))
+    elif kind == "href":
+      nodes.append(TextNode(match.group("anchor"), TextType.LINK, match.group("href")))
+    elif kind == "bold":
+      nodes.append(TextNode(match.group("bold"), TextType.BOLD))
+    elif kind == "italic":
+      nodes.append(TextNode(match.group("italic"), TextType.ITALIC))
+    else:
+      nodes.append(TextNode(match.group("code"), TextType.CODE))
+    last_end = match.end()
+
+  if last_end < len(line):
+    nodes.append(plain_text_node(line[last_end:], line))
+
+
+def lines_to_textnodes(lines):
+  """Tokenize already-split lines of inline markdown, joining lines with spaces."""
+  nodes = []
+  last = len(lines) - 1
+  for i, line in enumerate(lines):
+    scan_inline(line if i == last else line + " ", nodes)
+  return nodes
+
+
 def text_to_textnodes(text):
+  if not text:
+    return []
+  return lines_to_textnodes(text.splitlines())
+
+
+def text_to_textnodes_multipass(text):
+  """Reference inline parser built from the split_nodes_* passes.
+
+  Kept for differential tests and benchmarks against text_to_textnodes.
+  """
   nodes = []
   if not text:
     return nodes
@@ -160,169 +258,832 @@ class BlockType(Enum):
   ORDERED_LIST = "ordered_list"
 
 
-def block_to_block_type(block):
-  if re.match(r"^#{1,6} ", block):
-    return BlockType.HEADING
+HEADING_PATTERN = re.compile(r"^(#{1,6}) ")
+CODE_LANGUAGE_PATTERN = re.compile(r"^```([\w+#.-]+)$")
+ORDERED_ITEM_PATTERN = re.compile(r"^(\d+)\. ")
 
-  if block.startswith("```") and block.endswith("```"):
-    return BlockType.CODE
 
-  lines = block.split("\n")
-  if all(line.startswith(">") for line in lines):
-    return BlockType.QUOTE
+class Block:
+  """A markdown block with its type and its stripped lines.
+
+  handler is the BlockHandler that classified the block and match what it
+  found, so the same handler converts it without scanning the lines again.
+  """
+  __slots__ = ("block_type", "lines", "match", "handler")
+
+  def __init__(self, block_type, lines, match=None, handler=None):
+    self.block_type = block_type
+    self.lines = lines
+    self.match = match
+    self.handler = handler
+
+  def __eq__(self, other):
+    return self.block_type == other.block_type and self.lines == other.lines
+
+  def __repr__(self):
+    return f"Block({getattr(self.block_type, 'value', self.block_type)}, {self.lines})"
+
+
+def iter_blocks(lines):
+  """Yield typed Blocks from an iterable of markdown lines, such as an open file.
+
+  Only the current block is held in memory. Each line is stripped once and
+  a block ends at a blank line, so the classifier and the converters work
+  on the same line list without re-splitting.
+  """
+  current = []
+  for line in lines:
+    line = line.strip()
+    if not line:
+      if current:
+        handler, match = classify_lines(current)
+        yield Block(handler.block_type, current, match, handler)
+        current = []
+      continue
+    current.append(line)
+  if current:
+    handler, match = classify_lines(current)
+    yield Block(handler.block_type, current, match, handler)
+
+
+def classify_lines(lines):
+  """Return the (handler, match) of the registered block handler for a block's lines."""
+  return BLOCK_HANDLERS.classify(lines)
 
-  if all(line.startswith("- ") for line in lines):
-    return BlockType.UNORDERED_LIST
 
-  if all(re.match(r"^\d+\. ", line) for line in lines):
-    numbers = [int(re.match(r"^(\d+)\. ", line).group(1)) for line in lines]
-    expected = list(range(1, len(numbers) + 1))
-    if numbers == expected:
-      return BlockType.ORDERED_LIST
+def block_type_from_lines(lines):
+  """Classify a block given as a list of lines."""
+  return classify_lines(lines)[0].block_type
+
+
+def block_to_block_type(block):
+  return block_type_from_lines(block.split("\n"))
+
+
+def set_inline_cache(cache):
+  """Install an InlineCache for inline parsing (None disables it); returns the previous one."""
+  global inline_cache
+  previous = inline_cache
+  inline_cache = cache
+  return previous
 
-  return BlockType.PARAGRAPH
 
 def text_to_children(text):
   """Convert markdown text to a list of HTMLNode objects by parsing inline elements"""
-  text_nodes = text_to_textnodes(text)
-  print(text_nodes)
-  return [text_node_to_html_node(node) for node in text_nodes]
+  if inline_cache is None:
+    return [text_node_to_html_node(node) for node in text_to_textnodes(text)]
+  children = inline_cache.get(text)
+  if children is None:
+    children = tuple(text_node_to_html_node(node) for node in text_to_textnodes(text))
+    inline_cache.put(text, children)
+  return list(children)
+
+
+def lines_to_children(lines):
+  if inline_cache is None:
+    return [text_node_to_html_node(node) for node in lines_to_textnodes(lines)]
+  # Keyed by the tuple of lines so it can't collide with a text_to_children key.
+  key = tuple(lines)
+  children = inline_cache.get(key)
+  if children is None:
+    children = tuple(text_node_to_html_node(node) for node in lines_to_textnodes(lines))
+    inline_cache.put(key, children)
+  return list(children)
+
+
+class ParagraphHandler(BlockHandler):
+  block_type = BlockType.PARAGRAPH
+
+  def match(self, lines):
+    return True
+
+  def to_html_node(self, lines, match):
+    return ParentNode("p", children=lines_to_children(lines))
+
+
+class HeadingHandler(BlockHandler):
+  block_type = BlockType.HEADING
+  first_chars = "#"
+
+  def match(self, lines):
+    match = HEADING_PATTERN.match(lines[0])
+    return len(match.group(1)) if match else None
+
+  def to_html_node(self, lines, level):
+    content = "\n".join(lines).lstrip("# ").strip()
+    return ParentNode(f"h{level}", children=text_to_children(content))
+
+
+class CodeHandler(BlockHandler):
+  block_type = BlockType.CODE
+  first_chars = "`"
+
+  def match(self, lines):
+    return True if lines[0].startswith("```") and lines[-1].endswith("```") else None
+
+  def to_html_node(self, lines, match):
+    """Wrap the code in <pre><code>, highlighted if the opening fence names a known language.
+
+    A language tag (```python) is moved out of the code into a
+    language-* class, and the code is HTML-escaped whether or not the
+    language has a lexer. Highlighted code has each token in a <span>
+    whose class is a Pygments short name (see highlight.Lexer). Untagged
+    blocks keep their original output, which is not escaped.
+    """
+    language = CODE_LANGUAGE_PATTERN.match(lines[0]) if len(lines) > 1 else None
+    if language is not None:
+      lines = lines[1:]
+    code_content = "\n".join(lines).strip("```").strip()
+    if language is None:
+      code_node = text_node_to_html_node(TextNode(code_content + "\n", TextType.TEXT))
+      return ParentNode("pre", children=[ParentNode("code", children=[code_node])])
+
+    language = language.group(1)
+    tokens = highlight_tokens(language, code_content)
+    if tokens is None:
+      children = [LeafNode(None, html.escape(code_content, quote=False) + "\n")]
+    else:
+      children = [
+        LeafNode(None, html.escape(text, quote=False)) if token_class is None
+        else LeafNode("span", html.escape(text, quote=False), {"class": token_class})
+        for token_class, text in tokens
+      ]
+      children.append(LeafNode(None, "\n"))
+    return ParentNode("pre", children=[ParentNode("code", children=children, props={"class": f"language-{language}"})])
 
 
-def markdown_to_html_node(markdown):
-  blocks = markdown_to_blocks(markdown)
-  block_nodes = []
+class QuoteHandler(BlockHandler):
+  block_type = BlockType.QUOTE
+  first_chars = ">"
 
-  for block in blocks:
-    block_type = block_to_block_type(block)
-    html_node = None
-
-    if block_type == BlockType.PARAGRAPH:
-      children = text_to_children(block)
-      html_node = ParentNode("p", children=children)
-
-    elif block_type == BlockType.HEADING:
-      level = len(re.match(r"^(#+)", block).group(1))
-      content = block.lstrip("# ").strip()
-      children = text_to_children(content)
-      html_node = ParentNode(f"h{level}", children=children)
-
-    elif block_type == BlockType.CODE:
-      code_content = block.strip("```").strip()
-      text_node = TextNode(code_content + "\n", TextType.TEXT)
-      code_node = text_node_to_html_node(text_node)
-      html_node = ParentNode("pre", children=[ParentNode("code", children=[code_node])])
-
-    elif block_type == BlockType.QUOTE:
-      lines = block.split("\n")
-      cleaned_lines = [line.lstrip("> ").strip() for line in lines]
-      quote_content = "\n".join(cleaned_lines)
-      children = text_to_children(quote_content)
-      html_node = ParentNode("blockquote", children=children)
-
-    elif block_type == BlockType.UNORDERED_LIST:
-      items = block.split("\n")
-      list_items = []
-      for item in items:
-        item_content = item.lstrip("- ").strip()
-        item_children = text_to_children(item_content)
-        list_items.append(ParentNode("li", children=item_children))
-      html_node = ParentNode("ul", children=list_items)
-
-    elif block_type == BlockType.ORDERED_LIST:
-      items = block.split("\n")
-      list_items = []
-      for item in items:
-        item_content = re.sub(r"^\d+\.\s*", "", item).strip()
-        item_children = text_to_children(item_content)
-        list_items.append(ParentNode("li", children=item_children))
-      html_node = ParentNode("ol", children=list_items)
-
-    if html_node is not None:
-      block_nodes.append(html_node)
-
-  return ParentNode("div", children=block_nodes)
-
-
-def copy_files_from_to_directory(src_dir, dest_dir):
+  def match(self, lines):
+    return True if all(line.startswith(">") for line in lines) else None
+
+  def to_html_node(self, lines, match):
+    cleaned_lines = [line.lstrip("> ").strip() for line in lines]
+    return ParentNode("blockquote", children=lines_to_children(cleaned_lines))
+
+
+class UnorderedListHandler(BlockHandler):
+  block_type = BlockType.UNORDERED_LIST
+  first_chars = "-"
+
+  def match(self, lines):
+    return True if all(line.startswith("- ") for line in lines) else None
+
+  def to_html_node(self, lines, match):
+    list_items = []
+    for item in lines:
+      item_children = text_to_children(item.lstrip("- ").strip())
+      list_items.append(ParentNode("li", children=item_children))
+    return ParentNode("ul", children=list_items)
+
+
+class OrderedListHandler(BlockHandler):
+  block_type = BlockType.ORDERED_LIST
+  first_chars = "0123456789"
+
+  def match(self, lines):
+    """Return where each item's text starts, if the lines are numbered 1, 2, 3..."""
+    starts = []
+    for number, line in enumerate(lines, 1):
+      match = ORDERED_ITEM_PATTERN.match(line)
+      if match is None or int(match.group(1)) != number:
+        return None
+      starts.append(match.end())
+    return starts
+
+  def to_html_node(self, lines, starts):
+    list_items = []
+    for item, start in zip(lines, starts):
+      list_items.append(ParentNode("li", children=text_to_children(item[start:].strip())))
+    return ParentNode("ol", children=list_items)
+
+
+BLOCK_HANDLERS = BlockRegistry(
+  [HeadingHandler(), CodeHandler(), QuoteHandler(), UnorderedListHandler(), OrderedListHandler()],
+  fallback=ParagraphHandler(),
+)
+
+
+def register_block_handler(handler, first=False):
+  """Add a custom BlockHandler (tables, admonitions...) to the markdown parser."""
+  BLOCK_HANDLERS.register(handler, first)
+
+
+def renderer_signature():
+  """Identify how markdown becomes HTML: the parser version, block handlers and lexers.
+
+  Page configs and AST cache keys include it, so a parser change or a
+  newly registered handler rebuilds pages instead of keeping old output.
+  """
+  lexers = ",".join(sorted(LEXERS))
+  return f"{PARSER_VERSION}.{HIGHLIGHT_VERSION}\0{BLOCK_HANDLERS.signature()}\0{lexers}"
+
+
+def block_lines_to_html_node(block_type, lines, match=None, handler=None):
+  """Convert a block's lines to its HTMLNode, or None if it produces nothing.
+
+  handler and match are the handler that classified the lines and its
+  result, if known. Otherwise the handler is looked up by block_type, so
+  a handler registered first for a built-in type only converts the
+  blocks it matched itself.
+  """
+  if handler is None:
+    handler = BLOCK_HANDLERS.handler_for(block_type)
+  if handler is None:
+    return None
+  if match is None:
+    match = handler.match(lines)
+    if match is None:
+      raise ValueError(f"Block is not of type {getattr(block_type, 'value', block_type)}: {lines}")
+  return handler.to_html_node(lines, match)
+
+
+def block_to_html_node(block, block_type=None):
+  """Convert one markdown block to its HTMLNode, or None if it produces nothing."""
+  lines = block.split("\n")
+  if block_type is None:
+    handler, match = classify_lines(lines)
+    return block_lines_to_html_node(handler.block_type, lines, match, handler)
+  return block_lines_to_html_node(block_type, lines)
+
+
+def markdown_to_html_node(markdown, flat=False):
+  """Parse a markdown document into a div of block nodes.
+
+  markdown may be a string or any iterable of lines, such as an open file.
+  With flat=True a FlatDocument is returned instead. Each block's nodes
+  are copied into the flat arrays and dropped as soon as the block is
+  converted, so the full node tree never exists at once.
+  """
+  if isinstance(markdown, str):
+    markdown = markdown.strip().split("\n")
+  block_nodes = (
+    block_lines_to_html_node(block.block_type, block.lines, block.match, block.handler) for block in iter_blocks(markdown)
+  )
+
+  if flat:
+    builder = FlatDocumentBuilder()
+    builder.open("div")
+    for html_node in block_nodes:
+      if html_node is not None:
+        builder.append_node(html_node)
+    builder.close()
+    return builder.build()
+
+  return ParentNode("div", children=[html_node for html_node in block_nodes if html_node is not None])
+
+
+def render_markdown_items(documents, basepath=None, start=0):
+  """Yield the HTML of each markdown string, as markdown_to_html_node(...).to_html() would.
+
+  One parts list is reused as the output buffer for every item, and block
+  nodes are serialized into it as they are converted instead of being
+  collected under a root node first. start numbers the items in errors.
+  """
+  parts = []
+  for index, markdown in enumerate(documents, start):
+    parts.clear()
+    parts.append("<div>")
+    try:
+      for block in iter_blocks(markdown.strip().split("\n")):
+        html_node = block_lines_to_html_node(block.block_type, block.lines, block.match, block.handler)
+        if html_node is not None:
+          parts.extend(html_node.iter_html(basepath))
+    except ValueError as e:
+      raise ValueError(f"Markdown item {index}: {e}") from e
+    if len(parts) == 1:
+      raise ValueError(f"Markdown item {index}: Parent nodes must have children")
+    parts.append("</div>")
+    yield "".join(parts)
+
+
+def render_markdown_chunk(documents, basepath, start):
+  return list(render_markdown_items(documents, basepath, start))
+
+
+def iter_markdown_html(documents, basepath=None, jobs=1, chunksize=BATCH_CHUNK_SIZE):
+  """Render an iterable of markdown strings, yielding their HTML in order.
+
+  For rendering many small documents (comments, previews) in one call.
+  Output matches calling markdown_to_html_node(markdown).to_html(basepath)
+  on each item; an item that fails raises ValueError naming its position.
+
+  Args:
+      documents: Iterable of markdown strings, consumed lazily.
+      basepath: Optional basepath for root-relative href and src values.
+      jobs: Number of worker processes. Items are sent to them in chunks
+          of chunksize, at most jobs * 2 chunks ahead of the caller, and
+          results are still yielded in input order.
+  """
+  if jobs <= 1:
+    yield from render_markdown_items(documents, basepath)
+    return
+
+  documents = iter(documents)
+  chunks = iter(lambda: list(itertools.islice(documents, chunksize)), [])
+  executor = ProcessPoolExecutor(max_workers=jobs)
+  # Like run_pipeline, keep a bounded window of chunks in flight rather than
+  # submitting them all up front, so a long stream isn't read into memory.
+  pending = deque()
+  try:
+    for start, chunk in zip(itertools.count(0, chunksize), chunks):
+      pending.append(executor.submit(render_markdown_chunk, chunk, basepath, start))
+      if len(pending) >= jobs * 2:
+        yield from pending.popleft().result()
+    while pending:
+      yield from pending.popleft().result()
+  finally:
+    executor.shutdown(cancel_futures=True)
+
+
+def markdown_to_html_batch(documents, basepath=None, jobs=1, chunksize=BATCH_CHUNK_SIZE):
+  """Render markdown strings to a list of HTML strings (see iter_markdown_html)."""
+  return list(iter_markdown_html(documents, basepath, jobs, chunksize))
+
+
+def copy_files_from_to_directory(src_dir, dest_dir, *, manifest=None, link_mode="copy", verify_hash=False, workers=8, assets=None, index=None):
   """Recursively copy files from source directory to destination directory.
 
-  First deletes all contents of destination directory for a clean copy.
+  Without a manifest, first deletes all contents of destination directory
+  for a clean copy. With a manifest, the destination is kept and only files
+  whose source changed since the last build are copied.
 
   Args:
       src_dir: Source directory path
       dest_dir: Destination directory path
+      manifest: Optional Manifest used for incremental copies
+      link_mode, verify_hash, workers, assets, index: See assets.sync_directory
+
+  Returns:
+      Number of files copied.
   """
-  src_dir = os.path.abspath(src_dir)
-  dest_dir = os.path.abspath(dest_dir)
-  if os.path.exists(dest_dir):
+  if manifest is None and os.path.exists(dest_dir):
     shutil.rmtree(dest_dir)
+  return sync_directory(src_dir, dest_dir, manifest, link_mode, verify_hash, workers, assets, index)
 
-  os.makedirs(dest_dir)
-
-  for item in os.listdir(src_dir):
-    src_path = os.path.join(src_dir, item)
-    dest_path = os.path.join(dest_dir, item)
+def find_title(lines):
+  """Return the first h1 heading in an iterable of lines, or None."""
+  for line in lines:
+    if line.startswith("# "):
+      return line.lstrip("#").strip()
+  return None
 
-    if os.path.isdir(src_path):
-      print(f"Copying directory: {src_path} -> {dest_path}")
-      copy_files_from_to_directory(src_path, dest_path)
-    else:
-      print(f"Copying file: {src_path} -> {dest_path}")
-      shutil.copy2(src_path, dest_path)
 
 def extract_title(markdown):
   """Extract the first h1 heading from markdown text as the title."""
-  lines = markdown.splitlines()
-  for line in lines:
-    if line.startswith("# "):
-      return line.lstrip("#").strip()
-  raise Exception(f"No title found in {markdown}")
+  title = find_title(markdown.splitlines())
+  if title is None:
+    raise Exception(f"No title found in {markdown}")
+  return title
+
+def read_front_matter(readline):
+  """Read an optional front matter block through a readline callable.
+
+  The block is delimited by '---' lines and holds 'key: value' pairs, which
+  fill the matching template slots (e.g. date, description, nav).
+
+  Returns:
+      Dict of lowercase keys to values, or None if the document doesn't
+      start with a complete front matter block.
+  """
+  if readline() != "---\n":
+    return None
+  metadata = {}
+  for line in iter(readline, ""):
+    if line.startswith("---"):
+      return metadata
+    key, sep, value = line.partition(":")
+    if sep:
+      metadata[key.strip().lower()] = value.strip()
+  return None
+
+
+def parse_front_matter(markdown):
+  """Split an optional leading front matter block off a markdown document.
+
+  Returns:
+      Tuple of (dict of lowercase keys to values, remaining markdown).
+  """
+  buffer = io.StringIO(markdown)
+  metadata = read_front_matter(buffer.readline)
+  if metadata is None:
+    return {}, markdown
+  return metadata, buffer.read()
+
+
+def read_page_header(f, from_path):
+  """Read the front matter and title of an open markdown file.
+
+  Leaves f positioned at the start of the markdown body. The title scan
+  stops at the first h1, so only the head of the file is read twice.
+
+  Returns:
+      Dict of template slot values.
+  """
+  context = read_front_matter(f.readline)
+  if context is None:
+    f.seek(0)
+    context = {}
+  body_start = f.tell()
+  if "title" not in context:
+    title = find_title(iter(f.readline, ""))
+    if title is None:
+      raise ValueError(f"No title found in {from_path}")
+    context["title"] = title
+    f.seek(body_start)
+  return context
+
+
+class MarkdownContent:
+  """Template slot value that parses markdown lines as it writes them.
+
+  Blocks are read, converted and written one at a time, so a page of any
+  size is rendered in memory bounded by its largest block. The output is
+  the same as markdown_to_html_node(...).write_html.
+
+  If lines is a file, the content can be written more than once (a
+  template using {{ Content }} twice): each write after the first seeks
+  back to where the body started and parses it again.
+  """
+  def __init__(self, lines, keep_text=False):
+    self.lines = lines
+    self.start = lines.tell() if hasattr(lines, "seek") else None
+    self.written = False
+    self.urls = []
+    self.text = [] if keep_text else None
+
+  def iter_nodes(self):
+    if self.written and self.start is not None:
+      self.lines.seek(self.start)
+    for block in iter_blocks(self.lines):
+      html_node = block_lines_to_html_node(block.block_type, block.lines, block.match, block.handler)
+      if html_node is not None:
+        yield html_node
+
+  def write_html(self, fp, basepath=None):
+    fp.write("<div>")
+    empty = True
+    # URLs and text are gathered once, however many times the content is written.
+    collect = not self.written
+    for html_node in self.iter_nodes():
+      html_node.write_html(fp, basepath)
+      if collect:
+        self.urls.extend(html_node.iter_urls())
+        if self.text is not None:
+          self.text.extend(html_node.iter_text())
+      empty = False
+    if empty:
+      raise ValueError("Parent nodes must have children")
+    self.written = True
+    fp.write("</div>")
+
+
+def decode_source(source):
+  """Return a text stream over raw markdown bytes, decoded a buffer at a time with universal newlines."""
+  return io.TextIOWrapper(io.BytesIO(source), encoding="utf-8", newline=None)
+
+
+def load_parsed_page(from_path, ast_cache, source=None):
+  """Return a page's (context, FlatDocument), parsing it only on an AST cache miss.
+
+  source is the page's raw bytes, read from from_path if not given. Large
+  files are not read into memory: the cache key is hashed from a memory
+  mapping of the file, and on a miss the file itself is decoded
+  incrementally while it is parsed.
+  """
+  if source is None:
+    with open(from_path, "rb") as f:
+      if os.fstat(f.fileno()).st_size < MMAP_THRESHOLD:
+        return load_parsed_page(from_path, ast_cache, f.read())
+      with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        key = ast_cache.key(mapped)
+      entry = ast_cache.get(key)
+      if entry is not None:
+        return entry
+      src = io.TextIOWrapper(f, encoding="utf-8", newline=None)
+      try:
+        return parse_page(from_path, ast_cache, key, src)
+      finally:
+        src.detach()
+  key = ast_cache.key(source)
+  entry = ast_cache.get(key)
+  if entry is not None:
+    return entry
+  return parse_page(from_path, ast_cache, key, decode_source(source))
+
+
+def parse_page(from_path, ast_cache, key, src):
+  """Parse a page from a text stream and store it in the AST cache under key."""
+  context = read_page_header(src, from_path)
+  document = markdown_to_html_node(src, flat=True)
+  ast_cache.put(key, context, document)
+  return context, document
+
+
+class RenderedPage:
+  """What rendering a page reports back to the build.
+
+  changed says whether the output's bytes changed, urls holds the href
+  and src values of the content before rebasing, metadata the page's
+  front matter and title, and terms its search terms (None unless asked for).
+  """
+  __slots__ = ("changed", "urls", "metadata", "terms")
+
+  def __init__(self, changed, urls, metadata, terms=None):
+    self.changed = changed
+    self.urls = urls
+    self.metadata = metadata
+    self.terms = terms
+
 
-def generate_page(from_path, template_path, dest_path, basepath):
+def rendered_page(changed, context, content, collect_terms):
+  """Build the RenderedPage of a page rendered from a MarkdownContent or FlatDocument."""
+  metadata = {key: value for key, value in context.items() if key != "content"}
+  if isinstance(content, MarkdownContent):
+    urls, text = content.urls, content.text
+  else:
+    urls, text = list(content.iter_urls()), (content.iter_text() if collect_terms else None)
+  terms = index_terms(" ".join(text)) if collect_terms else None
+  return RenderedPage(changed, urls, metadata, terms)
+
+
+def generate_page(from_path, template_path, dest_path, basepath, ast_cache=None, collect_terms=False):
   """Generate a page from a markdown file using a template.
 
+  Without an AST cache the markdown is streamed from from_path into
+  dest_path block by block. With one, the parsed page is loaded from the
+  cache when its source is unchanged, and stored there otherwise. Sources
+  over AST_CACHE_MAX_SOURCE bytes are always streamed, so memory stays
+  bounded by the largest block rather than the largest page.
+
   Args:
       from_path: Path to the markdown file.
       template_path: Path to the HTML template file.
       dest_path: Path to save the generated HTML file.
+      ast_cache: Optional AstCache of parsed pages.
+      collect_terms: Whether to gather the page's search terms.
+
+  Returns:
+      RenderedPage.
   """
-  print(f"Generating page: {from_path} -> {dest_path} using template {template_path}")
-  with open(from_path, "r") as f:
-    markdown = f.read()
+  logger.debug("Generating page: %s -> %s using template %s", from_path, dest_path, template_path)
+  template = load_template(template_path, basepath)
 
-  title = extract_title(markdown)
-  html_node = markdown_to_html_node(markdown)
+  if ast_cache is not None and os.path.getsize(from_path) <= AST_CACHE_MAX_SOURCE:
+    cached_context, document = load_parsed_page(from_path, ast_cache)
+    context = dict(cached_context, content=document)
+    changed = write_page(template, context, dest_path)
+    return rendered_page(changed, context, document, collect_terms)
 
-  with open(template_path, "r") as f:
-    template = f.read()
+  with open(from_path, "r") as src:
+    context = read_page_header(src, from_path)
+    content = context["content"] = MarkdownContent(src, collect_terms)
+    changed = write_page(template, context, dest_path)
+  return rendered_page(changed, context, content, collect_terms)
 
-  print(f"html_node: {html_node.to_html()}")
 
-  html_content = template.replace("{{ Title }}", title).replace("{{ Content }}", html_node.to_html())
-  html_content = html_content.replace('href="/', f'href="{basepath}').replace('src="/', f'src="{basepath}')
+def write_page(template, context, dest_path):
+  """Render into dest_path atomically, returning False if its bytes were already identical."""
+  os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+  with OutputFile(dest_path) as f:
+    template.render_to(f, context)
+  return f.changed
 
-  with open(dest_path, "w") as f:
-    f.write(html_content)
 
+def read_page_source(page):
+  """Pipeline read stage: the raw bytes of a (markdown path, html path) pair's source."""
+  try:
+    with open(page[0], "rb") as f:
+      return f.read()
+  except OSError as e:
+    raise PageGenerationError(page[0], f"{type(e).__name__}: {e}") from e
 
-def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, basepath):
-  """Recursively generate pages from markdown files in a directory.
+
+def render_page_source(page, source, template_path, basepath, ast_cache=None, collect_terms=False):
+  """Pipeline render stage: render a page from its raw markdown bytes.
+
+  Module-level so it can be sent to worker processes.
+
+  Returns:
+      Tuple of (page HTML, RenderedPage with changed left unset).
+  """
+  from_path = page[0]
+  try:
+    template = load_template(template_path, basepath)
+    if ast_cache is not None and len(source) <= AST_CACHE_MAX_SOURCE:
+      cached_context, document = load_parsed_page(from_path, ast_cache, source)
+      context = dict(cached_context, content=document)
+    else:
+      src = decode_source(source)
+      context = read_page_header(src, from_path)
+      document = context["content"] = MarkdownContent(src, collect_terms)
+    out = io.StringIO()
+    template.render_to(out, context)
+  except Exception as e:
+    raise PageGenerationError(from_path, f"{type(e).__name__}: {e}") from e
+  return out.getvalue(), rendered_page(None, context, document, collect_terms)
+
+
+def write_page_output(page, rendered):
+  """Pipeline write stage: write a rendered page if it changed and pass its RenderedPage on."""
+  html, result = rendered
+  dest_path = page[1]
+  try:
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    with OutputFile(dest_path) as f:
+      f.write(html)
+  except OSError as e:
+    raise PageGenerationError(page[0], f"{type(e).__name__}: {e}") from e
+  result.changed = f.changed
+  return result
+
+
+def collect_pages(dir_path_content, dest_dir_path, index=None):
+  """Recursively list the markdown files in a directory and their output paths.
 
   Args:
       dir_path_content: Path to the directory containing markdown files.
-      template_path: Path to the HTML template file.
-      dest_dir_path: Path to save the generated HTML files.
+      dest_dir_path: Path the generated HTML files are saved under.
+      index: Optional DirectoryIndex covering dir_path_content, read
+          instead of listing the directories again.
+
+  Returns:
+      List of (markdown path, html path) tuples.
   """
   dir_path_content = os.path.abspath(dir_path_content)
   dest_dir_path = os.path.abspath(dest_dir_path)
 
-  for item in os.listdir(dir_path_content):
-    item_path = os.path.join(dir_path_content, item)
-    if os.path.isdir(item_path):
-      new_dest_dir = os.path.join(dest_dir_path, item)
-      os.makedirs(new_dest_dir, exist_ok=True)
-      generate_pages_recursive(item_path, template_path, new_dest_dir, basepath)
-    elif item.endswith(".md"):
-      dest_file = os.path.join(dest_dir_path, item.replace(".md", ".html"))
-      generate_page(item_path, template_path, dest_file, basepath)
\ No newline at end of file
+  if index is not None:
+    paths = [
+      os.path.join(dirpath, name)
+      for dirpath, filenames in index.walk(dir_path_content)
+      for name in filenames
+      if name.endswith(".md")
+    ]
+    return [(path, page_output_path(path, dir_path_content, dest_dir_path)) for path in paths]
+
+  pages = []
+  with os.scandir(dir_path_content) as entries:
+    for entry in entries:
+      # The entry type comes from the directory listing, so this needs no stat call.
+      if entry.is_dir():
+        pages.extend(collect_pages(entry.path, os.path.join(dest_dir_path, entry.name)))
+      elif entry.name.endswith(".md"):
+        pages.append((entry.path, os.path.join(dest_dir_path, entry.name[:-len(".md")] + ".html")))
+  return pages
+
+
+def page_output_path(from_path, dir_path_content, dest_dir_path):
+  """Return the html path collect_pages maps a markdown file to."""
+  relative = os.path.relpath(os.path.abspath(from_path), os.path.abspath(dir_path_content))
+  return os.path.join(os.path.abspath(dest_dir_path), relative[:-len(".md")] + ".html")
+
+
+def page_config(template_path, basepath):
+  """Hash everything besides the markdown source that a page's output depends on."""
+  config = f"{hash_file(template_path)}\0{basepath}\0{renderer_signature()}"
+  if getattr(basepath, "assets", None):
+    # The template's own asset references are fingerprinted into its literals.
+    config += "\0" + "".join(load_template(template_path, basepath).literals)
+  return hash_text(config)
+
+
+def asset_config(config, basepath, targets=None):
+  """Extend a page config with the fingerprinted names of the static files the page references.
+
+  targets are the site paths the page refers to (see DependencyGraph.refs);
+  None means it may refer to any of them. Without fingerprinted assets the
+  config is returned unchanged.
+  """
+  assets = getattr(basepath, "assets", None)
+  if config is None or not assets:
+    return config
+  if targets is None:
+    names = sorted(assets.values())
+  else:
+    names = [assets[target] for target in targets if target in assets]
+  return hash_text("\0".join([config, *names])) if names else config
+
+
+class PageGenerationError(Exception):
+  """Raised when a page fails to build, carrying the markdown file at fault."""
+  def __init__(self, path, message):
+    super().__init__(path, message)
+    self.path = path
+    self.message = message
+
+  def __str__(self):
+    return f"Error generating {self.path}: {self.message}"
+
+
+def generate_page_job(from_path, template_path, dest_path, basepath, ast_cache=None, collect_terms=False):
+  """Run generate_page, tagging any failure with the page that caused it.
+
+  Module-level so it can be sent to worker processes.
+  """
+  try:
+    return generate_page(from_path, template_path, dest_path, basepath, ast_cache, collect_terms)
+  except Exception as e:
+    raise PageGenerationError(from_path, f"{type(e).__name__}: {e}") from e
+
+
+def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, basepath, *, manifest=None, jobs=1, ast_cache=None, graph=None, pipeline_depth=0, site_index=None, shard=None, index=None):
+  """Recursively generate pages from markdown files in a directory.
+
+  Args:
+      dir_path_content: Path to the directory containing markdown files.
+      template_path: Path to the HTML template file.
+      dest_dir_path: Path to save the generated HTML files.
+      manifest: Optional Manifest; pages whose source, template and basepath
+          are unchanged since the last build are skipped. If basepath is a
+          htmlnode.Basepath with fingerprinted assets, so are the names of
+          the assets each page references (all of them without a graph).
+      jobs: Number of worker processes to render pages with.
+      ast_cache: Optional AstCache, so pages whose markdown is unchanged
+          are re-rendered without being parsed again.
+      graph: Optional DependencyGraph updated with each rendered page's
+          template and references. Pages it has no edges for are
+          rendered even if the manifest says they are fresh.
+      pipeline_depth: If positive, read sources ahead on a thread and write
+          outputs on another while pages render, with at most this many
+          pages queued between stages (see pipeline.run_pipeline).
+      site_index: Optional feeds.SiteIndex updated with each rendered
+          page's metadata and search terms. Like the graph, pages it has
+          no entry for are rendered even if the manifest says they are fresh.
+      shard: Optional (index, count) pair from shards.parse_shard. Only the
+          pages of that part of a size-balanced split of the content tree
+          are built, and the graph and site index keep only those pages.
+      index: Optional dirindex.DirectoryIndex covering dir_path_content,
+          used to find the pages and their sizes and stats without
+          walking the tree again.
+
+  Returns:
+      Number of pages generated.
+  """
+  config = page_config(template_path, basepath) if manifest is not None else None
+
+  all_pages = collect_pages(dir_path_content, dest_dir_path, index)
+  if shard is not None:
+    all_pages = select_shard(all_pages, shard, dir_path_content, index)
+  pages = []
+  for from_path, dest_path in all_pages:
+    if (
+      manifest is None
+      or not manifest.is_fresh(
+        from_path, dest_path, asset_config(config, basepath, graph.refs(from_path) if graph is not None else None),
+        src_stat=index.stat(from_path) if index is not None else None,
+      )
+      or (graph is not None and from_path not in graph)
+      or (site_index is not None and from_path not in site_index)
+    ):
+      pages.append((from_path, dest_path))
+  if graph is not None:
+    graph.retain(from_path for from_path, _ in all_pages)
+    graph.record_template(template_path)
+  if site_index is not None:
+    site_index.retain(from_path for from_path, _ in all_pages)
+  collect_terms = site_index is not None
+
+  executor = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 and len(pages) > 1 else None
+  if pipeline_depth > 0:
+    render = functools.partial(
+      render_page_source, template_path=template_path, basepath=basepath, ast_cache=ast_cache, collect_terms=collect_terms
+    )
+    completed = run_pipeline(pages, read_page_source, render, write_page_output, executor, pipeline_depth)
+  elif executor is not None:
+    results = executor.map(
+      generate_page_job,
+      [from_path for from_path, _ in pages],
+      [template_path] * len(pages),
+      [dest_path for _, dest_path in pages],
+      [basepath] * len(pages),
+      [ast_cache] * len(pages),
+      [collect_terms] * len(pages),
+      chunksize=max(1, len(pages) // (jobs * 4)),
+    )
+    completed = zip(pages, results)
+  else:
+    completed = (
+      ((from_path, dest_path), generate_page_job(from_path, template_path, dest_path, basepath, ast_cache, collect_terms))
+      for from_path, dest_path in pages
+    )
+
+  try:
+    for count, ((from_path, dest_path), result) in enumerate(completed, 1):
+      if graph is not None:
+        graph.record_page(from_path, dest_path, dest_dir_path, template_path, result.urls)
+      if manifest is not None:
+        page_assets = asset_config(config, basepath, graph.refs(from_path) if graph is not None else None)
+        manifest.record(from_path, dest_path, page_assets, result.changed)
+      if site_index is not None:
+        site_index.record(from_path, output_key(dest_path, dest_dir_path), result.metadata, result.terms)
+      if count % PROGRESS_INTERVAL == 0:
+        logger.info("Generated %d/%d pages", count, len(pages))
+  finally:
+    if pipeline_depth > 0:
+      completed.close()
+    if executor is not None:
+      executor.shutdown(cancel_futures=True)
+  return len(pages)